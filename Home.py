@@ -4,19 +4,24 @@ import yaml
 import os
 from dotenv import load_dotenv
 import pandas as pd
-from indicators import indicators, load_indicator_country_data_from_cache
+from indicators_data import indicators, PROFILE_INDICATORS
 from groups import get_group_countries_name, get_iso3_from_name, get_name_from_iso3, get_fips_from_iso3, get_iso2_from_name
-from country_facts import load_country_data, load_factbook_data, country_small_flags, get_small_flag, get_country_description
+from country_facts import load_country_data, country_small_flags, get_small_flag, get_country_description
 from quotes import quotes
 import random
 from maps import create_map_from_dms
 from streamlit_folium import st_folium
-from data_ops import normalize_dictionary, compute_group_aggregate
+from data_ops import normalize_dictionary, load_country_indicators
+from factbook import get_profile
 from css import css_general, css_menu
+import warmup
 
 # ── Page Config (must be first Streamlit call) ────────────────────────────
 st.set_page_config(page_title="Landlinked", page_icon="📊", layout="wide")
 
+# Preload caches in the background on this worker's first page run
+warmup.start()
+
 # Load the configuration file
 with open('config.yaml', 'r') as config_file:
     config = yaml.safe_load(config_file)
@@ -115,10 +120,10 @@ def display_chart(data, title, source):
 
                 cola, colb = st.columns([1, 1])
                 with cola:
-                    st.metric(label=first_year, value=first_value)
+                    st.metric(label=str(first_year), value=first_value)
                 with colb:
                     delta_value = (((latest_value - first_value) / first_value)*100).round(2) if first_value != 0 else 0
-                    st.metric(label=latest_year, value=latest_value, delta=delta_value)
+                    st.metric(label=str(latest_year), value=latest_value, delta=delta_value)
 
                 st.line_chart(df, x ='date', y='value', x_label='Date', y_label='Value')
 
@@ -126,13 +131,23 @@ def display_chart(data, title, source):
             else:
                 st.write("No series data available for this country")
 
+def factbook_text(label, text):
+    # Factbook fields missing for a country are None in the profile table
+    if text:
+        st.markdown(f'<div class="factbook-text"><strong>{label}</strong><br>{text}</div>', unsafe_allow_html=True)
+
+def country_meta_item(label, text):
+    if text:
+        st.markdown(f'<div class="country-meta-item"><strong>{label}</strong>{text}</div>', unsafe_allow_html=True)
+
 if selected_country:
     selected_country_iso2 = get_iso2_from_name(selected_country)
     selected_country_iso3 = get_iso3_from_name(selected_country, group_name.lower())
     selected_country_fips = get_fips_from_iso3(selected_country_iso3)
     selected_country_profile = get_country_description(selected_country_iso3)
     country_data = load_country_data(selected_country_iso3)
-    factbook_data = load_factbook_data(selected_country_fips)
+    factbook_data = get_profile(fips=selected_country_fips) or {}
+    country_indicators = load_country_indicators(selected_country_iso3, PROFILE_INDICATORS)
 
     col1, col2 = st.columns([3, 1], gap="large")
 
@@ -160,107 +175,98 @@ if selected_country:
         # ── Environment ───────────────────────────────────────────────
         st.markdown('<div class="section-header"><h2>Environment</h2></div>', unsafe_allow_html=True)
 
-        st.markdown(f'<div class="factbook-text"><strong>Climate</strong><br>{factbook_data["Environment"]["Climate"]["text"]}</div>', unsafe_allow_html=True)
+        factbook_text("Climate", factbook_data.get("climate"))
 
-        indicator_data = load_indicator_country_data_from_cache("EN.GHG.CO2.PC.CE.AR5", group_name.lower(), selected_country)
+        indicator_data = country_indicators.get("EN.GHG.CO2.PC.CE.AR5")
         display_chart(indicator_data, "Carbon dioxide (CO2) emissions (total) excluding LULUCF (MT CO2e)", "World Bank")
 
-        st.markdown(f'<div class="factbook-text"><strong>Party to environmental international agreements</strong><br>{factbook_data["Environment"]["Environment - international agreements"]["party to"]["text"]}</div>', unsafe_allow_html=True)
+        factbook_text("Party to environmental international agreements", factbook_data.get("environment_agreements"))
 
-        indicator_data = load_indicator_country_data_from_cache("EN.ATM.CO2E.PC", group_name.lower(), selected_country)
+        indicator_data = country_indicators.get("EN.ATM.CO2E.PC")
         display_chart(indicator_data, "CO2 emissions (pc)", "World Bank")
 
         # ── Labor Force ───────────────────────────────────────────────
         st.markdown('<div class="section-header"><h2>Labor Force</h2></div>', unsafe_allow_html=True)
 
-        if 'Economy' in factbook_data and \
-                   'Youth unemployment rate (ages 15-24)' in factbook_data['Economy']:
-            st.markdown(f'<div class="factbook-text"><strong>Youth unemployment rate</strong><br>{factbook_data["Economy"]["Youth unemployment rate (ages 15-24)"]["total"]["text"]}</div>', unsafe_allow_html=True)
+        factbook_text("Youth unemployment rate", factbook_data.get("youth_unemployment"))
 
-        indicator_data = load_indicator_country_data_from_cache("SL.TLF.CACT.FM.ZS", group_name.lower(), selected_country)
+        indicator_data = country_indicators.get("SL.TLF.CACT.FM.ZS")
         display_chart(indicator_data, "Labor force participation rate for ages 15-24 (% of population)", "World Bank")
 
-        if (text := factbook_data.get('Economy', {})
-                        .get('Unemployment rate', {})
-                        .get('Unemployment rate 2023', {})
-                        .get('text')):
-            st.markdown(f'<div class="factbook-text"><strong>Unemployment rate</strong><br>{text}</div>', unsafe_allow_html=True)
+        factbook_text("Unemployment rate", factbook_data.get("unemployment"))
 
-        indicator_data = load_indicator_country_data_from_cache("SL.UEM.TOTL.ZS", group_name.lower(), selected_country)
+        indicator_data = country_indicators.get("SL.UEM.TOTL.ZS")
         display_chart(indicator_data, "Unemployment, total (% of total labor force)", "World Bank")
 
         # ── Population ────────────────────────────────────────────────
         st.markdown('<div class="section-header"><h2>Population</h2></div>', unsafe_allow_html=True)
 
-        if 'Population distribution' in factbook_data['People and Society']:
-            st.markdown(f'<div class="factbook-text"><strong>Population</strong><br>{factbook_data["People and Society"]["Population distribution"]["text"]}</div>', unsafe_allow_html=True)
+        factbook_text("Population", factbook_data.get("population_distribution"))
 
-        indicator_data = load_indicator_country_data_from_cache("SP.POP.TOTL", group_name.lower(), selected_country)
+        indicator_data = country_indicators.get("SP.POP.TOTL")
         display_chart(indicator_data, "Population, total", "World Bank")
 
         # ── Education ─────────────────────────────────────────────────
         st.markdown('<div class="section-header"><h2>Education</h2></div>', unsafe_allow_html=True)
 
-        st.markdown(f'<div class="factbook-text"><strong>Education expenditure</strong><br>{factbook_data["People and Society"]["Education expenditures"]["text"]}</div>', unsafe_allow_html=True)
+        factbook_text("Education expenditure", factbook_data.get("education_expenditure"))
 
-        indicator_data = load_indicator_country_data_from_cache("SE.PRM.NENR", group_name.lower(), selected_country)
+        indicator_data = country_indicators.get("SE.PRM.NENR")
         display_chart(indicator_data, "Net enrollment rate, primary (% of primary school age children)", "World Bank")
 
         # ── Connectivity ──────────────────────────────────────────────
         st.markdown('<div class="section-header"><h2>Connectivity</h2></div>', unsafe_allow_html=True)
 
-        st.markdown(f'<div class="factbook-text"><strong>% connected to internet</strong><br>{factbook_data["Communications"]["Internet users"]["percent of population"]["text"]}</div>', unsafe_allow_html=True)
+        factbook_text("% connected to internet", factbook_data.get("internet_users"))
 
-        st.markdown(f'<div class="factbook-text"><strong>% connected to fixed broadband</strong><br>{factbook_data["Communications"]["Broadband - fixed subscriptions"]["subscriptions per 100 inhabitants"]["text"]}</div>', unsafe_allow_html=True)
+        factbook_text("% connected to fixed broadband", factbook_data.get("broadband"))
 
-        indicator_data = load_indicator_country_data_from_cache("IT.NET.BBND.P2", group_name.lower(), selected_country)
+        indicator_data = country_indicators.get("IT.NET.BBND.P2")
         display_chart(indicator_data, "Fixed broadband subscriptions (per 100 people)", "World Bank")
 
         # ── Economy ───────────────────────────────────────────────────
         st.markdown('<div class="section-header"><h2>Economy</h2></div>', unsafe_allow_html=True)
 
-        st.markdown(f'<div class="factbook-text"><strong>Main manufactured products</strong><br>{factbook_data["Economy"]["Industries"]["text"]}</div>', unsafe_allow_html=True)
+        factbook_text("Main manufactured products", factbook_data.get("industries"))
 
-        st.markdown(f'<div class="factbook-text"><strong>Main agricultural products</strong><br>{factbook_data["Economy"]["Agricultural products"]["text"]}</div>', unsafe_allow_html=True)
+        factbook_text("Main agricultural products", factbook_data.get("agricultural_products"))
 
         st.markdown('<div class="section-header"><h2>Macroeconomic Indicators</h2></div>', unsafe_allow_html=True)
 
-        indicator_data = load_indicator_country_data_from_cache("NY.GDP.MKTP.PP.CD", group_name.lower(), selected_country)
+        indicator_data = country_indicators.get("NY.GDP.MKTP.PP.CD")
         display_chart(indicator_data, "GDP (current US$)", "World Bank")
 
-        indicator_data = load_indicator_country_data_from_cache("NY.GDP.PCAP.PP.CD", group_name.lower(), selected_country)
+        indicator_data = country_indicators.get("NY.GDP.PCAP.PP.CD")
         display_chart(indicator_data, "GDP per capita (current US$)", "World Bank")
 
-        indicator_data = load_indicator_country_data_from_cache("FP.CPI.TOTL.ZG", group_name.lower(), selected_country)
+        indicator_data = country_indicators.get("FP.CPI.TOTL.ZG")
         display_chart(indicator_data, "Inflation, consumer prices (annual %)", "World Bank")
 
         st.markdown('<div class="section-header"><h2>Trade</h2></div>', unsafe_allow_html=True)
 
-        indicator_data = load_indicator_country_data_from_cache("BN.CAB.XOKA.CD", group_name.lower(), selected_country)
+        indicator_data = country_indicators.get("BN.CAB.XOKA.CD")
         display_chart(indicator_data, "Current account balance (current US$)", "World Bank")
 
-        indicator_data = load_indicator_country_data_from_cache("NE.EXP.GNFS.CD", group_name.lower(), selected_country)
+        indicator_data = country_indicators.get("NE.EXP.GNFS.CD")
         display_chart(indicator_data, "Exports of goods and services (current US$)", "World Bank")
 
-        indicator_data = load_indicator_country_data_from_cache("NE.IMP.GNFS.CD", group_name.lower(), selected_country)
+        indicator_data = country_indicators.get("NE.IMP.GNFS.CD")
         display_chart(indicator_data, "Imports of goods and services (current US$)", "World Bank")
 
         st.markdown('<div class="section-header"><h2>Debt and Reserves</h2></div>', unsafe_allow_html=True)
 
-        indicator_data = load_indicator_country_data_from_cache("DT.DOD.DECT.CD", group_name.lower(), selected_country)
+        indicator_data = country_indicators.get("DT.DOD.DECT.CD")
         display_chart(indicator_data, "External debt (current US$)", "World Bank")
 
-        indicator_data = load_indicator_country_data_from_cache("FI.RES.TOTL.CD", group_name.lower(), selected_country)
+        indicator_data = country_indicators.get("FI.RES.TOTL.CD")
         display_chart(indicator_data, "Total reserves (includes gold, current US$)", "World Bank")
 
-        indicator_data = load_indicator_country_data_from_cache("GC.DOD.TOTL.CN", group_name.lower(), selected_country)
+        indicator_data = country_indicators.get("GC.DOD.TOTL.CN")
         display_chart(indicator_data, "Central government debt, total (current LCU)", "World Bank")
 
     with col2:
         st.image(f"https://flagcdn.com/w320/{selected_country_iso2.lower()}.png")
-        geographic_coordinates = factbook_data['Geography']['Geographic coordinates']['text']
-
-        st.markdown(f'<div class="country-meta-item"><strong>Geographic Coordinates</strong>{geographic_coordinates}</div>', unsafe_allow_html=True)
+        country_meta_item("Geographic Coordinates", factbook_data.get("coordinates"))
 
         st.image(f"./cache/maps/{selected_country_iso2.lower()}_256.png")
 
@@ -280,7 +286,7 @@ if selected_country:
         border_countries = [get_name_from_iso3(border) for border in country_data[0]['borders']]
         border_countries.sort()
         st.markdown(f'<div class="country-meta-item"><strong>Borders</strong>{", ".join(border_countries)}</div>', unsafe_allow_html=True)
-        st.markdown(f'<div class="country-meta-item"><strong>Main Export Partners</strong>{factbook_data["Economy"]["Exports - partners"]["text"]}</div>', unsafe_allow_html=True)
-        st.markdown(f'<div class="country-meta-item"><strong>Main Import Partners</strong>{factbook_data["Economy"]["Imports - partners"]["text"]}</div>', unsafe_allow_html=True)
-        st.markdown(f'<div class="country-meta-item"><strong>Main Export Products</strong>{factbook_data["Economy"]["Exports - commodities"]["text"]}</div>', unsafe_allow_html=True)
-        st.markdown(f'<div class="country-meta-item"><strong>Main Import Products</strong>{factbook_data["Economy"]["Imports - commodities"]["text"]}</div>', unsafe_allow_html=True)
+        country_meta_item("Main Export Partners", factbook_data.get("export_partners"))
+        country_meta_item("Main Import Partners", factbook_data.get("import_partners"))
+        country_meta_item("Main Export Products", factbook_data.get("export_commodities"))
+        country_meta_item("Main Import Products", factbook_data.get("import_commodities"))
@@ -1,11 +1,13 @@
 import streamlit as st
 import subprocess
-import os
 import json
 import yaml
 import datetime
 from pathlib import Path
 
+import indicator_store
+import jobs
+import refresh_scheduler
 from story_rendering import list_stories, load_story, save_story, delete_story, render_story
 from indicators_data import indicators
 
@@ -65,14 +67,15 @@ def save_config(config):
 
 config = load_config()
 
-# Groups with indicator data available
-GROUPS_WITH_DATA = [
-    "aosis", "brics", "eu", "g20", "g77",
-    "ldcs", "lics", "lldcs", "lmcs", "oecd", "sids",
-]
+# Groups with indicator data available: the store is keyed by country,
+# so aggregates can be computed for every group in cache/groups
+GROUPS_WITH_DATA = sorted(p.stem for p in Path("cache/groups").glob("*.json"))
 
 FORMAT_OPTIONS = ["number", "currency", "people", "years"]
 
+# Matches DataSourcePlugin's default cache window
+CACHE_MAX_AGE_DAYS = 30
+
 # Tabs for different admin functions
 tab1, tab2, tab3, tab4 = st.tabs(["📊 Data Update", "⚙️ Settings", "📜 Logs", "📖 Stories"])
 
@@ -86,71 +89,164 @@ with tab1:
     with col1:
         st.subheader("Update Indicators")
         
-        groups = ["lldcs", "ldcs", "sids", "g77", "brics", "eu", "oecd", "g20", "aosis", "lmcs", "lics"]
-        selected_groups = st.multiselect("Select groups to update", groups, default=["lldcs"])
+        selected_groups = st.multiselect("Select groups to update", GROUPS_WITH_DATA, default=["lldcs"])
         
+        # Updates run as background jobs (jobs.py): queueing returns at
+        # once, and the job survives reruns, timeouts and closed tabs
         if st.button("🔄 Update Selected Groups", type="primary"):
-            with st.spinner("Updating indicator data..."):
-                try:
-                    # Import and run the update
-                    from indicators import WorldBankAPI
-                    from indicators_data import indicators
-                    
-                    api_client = WorldBankAPI(indicators)
-                    progress_bar = st.progress(0)
-                    
-                    for i, group_code in enumerate(selected_groups):
-                        st.write(f"Processing: {group_code.upper()}")
-                        api_client.download_all_indicators(group_code)
-                        progress_bar.progress((i + 1) / len(selected_groups))
-                    
-                    st.success("✅ Data update completed!")
-                except Exception as e:
-                    st.error(f"❌ Error: {str(e)}")
+            job_id = jobs.enqueue("update", groups=selected_groups, sources=["World Bank"])
+            jobs.ensure_worker()
+            st.success(f"Queued job #{job_id}")
         
         if st.button("🔄 Update All Groups"):
-            with st.spinner("Updating all groups... This may take a while."):
-                try:
-                    result = subprocess.run(
-                        ["/home/exedev/landlinked/venv/bin/python", "data_update.py"],
-                        cwd="/home/exedev/landlinked",
-                        capture_output=True,
-                        text=True,
-                        timeout=600
-                    )
-                    if result.returncode == 0:
-                        st.success("✅ All data updated successfully!")
-                        st.code(result.stdout)
-                    else:
-                        st.error(f"❌ Error: {result.stderr}")
-                except subprocess.TimeoutExpired:
-                    st.error("❌ Update timed out after 10 minutes")
-                except Exception as e:
-                    st.error(f"❌ Error: {str(e)}")
+            job_id = jobs.enqueue("update")
+            jobs.ensure_worker()
+            st.success(f"Queued job #{job_id}")
+
+        # One indicator with the weight series its aggregates depend on
+        refresh_code = st.selectbox(
+            "Refresh one indicator", sorted(indicators),
+            format_func=lambda code: f"{code} — {indicators[code]['description']}",
+        )
+        weights = [c for c in refresh_scheduler.closure([refresh_code]) if c != refresh_code]
+        if weights:
+            st.caption(f"Also refreshes its weight series: {', '.join(weights)}")
+        if st.button("🔄 Refresh Indicator"):
+            job_id = jobs.enqueue("update", codes=[refresh_code])
+            jobs.ensure_worker()
+            st.success(f"Queued job #{job_id}")
+
+        @st.fragment(run_every=3)
+        def job_monitor():
+            st.subheader("Jobs")
+            recent = jobs.list_jobs(limit=10)
+            if not recent:
+                st.write("No jobs yet.")
+                return
+            if not jobs.worker_running() and any(j["state"] == "queued" for j in recent):
+                st.warning("Jobs are queued but no worker is running.")
+                if st.button("Start worker"):
+                    jobs.ensure_worker()
+            st.dataframe([
+                {"job": j["id"], "state": j["state"],
+                 "groups": ", ".join(j["params"].get("groups") or ["all"]),
+                 "sources": ", ".join(j["params"].get("sources") or ["all"]),
+                 "indicators": ", ".join(j["params"].get("codes") or ["all"]),
+                 "created": datetime.datetime.fromtimestamp(j["created"]).strftime('%Y-%m-%d %H:%M'),
+                 "attempts": j["attempts"], "error": j["error"] or ""}
+                for j in recent
+            ], use_container_width=True, hide_index=True)
+
+            by_id = {j["id"]: j for j in recent}
+            job = by_id[st.selectbox("Job", list(by_id), format_func=lambda i: f"#{i} ({by_id[i]['state']})",
+                                     key="admin_job_select")]
+            progress = jobs.job_progress(job["id"])
+            for row in progress["sources"]:
+                finished = row["total"] - row["pending"]
+                eta = (f", ETA {datetime.timedelta(seconds=row['eta_seconds'])}"
+                       if row["eta_seconds"] is not None else "")
+                st.progress(finished / row["total"] if row["total"] else 0.0,
+                            text=f"{row['source']}: {finished}/{row['total']} · "
+                                 f"{row['per_minute']}/min{eta}")
+            if progress["sources"]:
+                st.dataframe(progress["sources"], use_container_width=True, hide_index=True)
+            if progress["indicators"]:
+                with st.expander("Indicators"):
+                    st.dataframe([
+                        {**u, "finished": datetime.datetime.fromtimestamp(u["finished"]).strftime('%H:%M:%S')}
+                        for u in progress["indicators"]
+                    ], use_container_width=True, hide_index=True)
+
+            btn_cols = st.columns(2)
+            with btn_cols[0]:
+                if job["state"] in ("queued", "running") and st.button("⏹ Cancel", key="job_cancel"):
+                    jobs.cancel(job["id"])
+                    st.rerun(scope="fragment")
+            with btn_cols[1]:
+                if job["state"] in jobs.RESUMABLE and st.button("▶ Resume", key="job_resume"):
+                    jobs.resume(job["id"])
+                    jobs.ensure_worker()
+                    st.rerun(scope="fragment")
+            with st.expander("Log"):
+                st.code(jobs.read_log(job["id"]) or "(empty)", language="text")
+
+        job_monitor()
     
     with col2:
         st.subheader("Cache Status")
-        cache_dir = Path("/home/exedev/landlinked/cache/indicators")
-        
-        if cache_dir.exists():
-            files = list(cache_dir.glob("*.json"))
-            st.metric("Cached Files", len(files))
-            
-            if files:
-                newest = max(files, key=os.path.getmtime)
-                oldest = min(files, key=os.path.getmtime)
-                st.write(f"**Newest:** {newest.name}")
-                st.write(f"  *{datetime.datetime.fromtimestamp(newest.stat().st_mtime).strftime('%Y-%m-%d %H:%M')}*")
-                st.write(f"**Oldest:** {oldest.name}")
-                st.write(f"  *{datetime.datetime.fromtimestamp(oldest.stat().st_mtime).strftime('%Y-%m-%d %H:%M')}*")
+        # Read from the store manifest the writers maintain, not by
+        # listing and stat-ing every file
+        entries = indicator_store.manifest_frame()
+        st.metric("Cached Indicators", len(entries))
+
+        if not entries.empty:
+            stale = int((entries["age_days"] > CACHE_MAX_AGE_DAYS).sum())
+            st.write(f"**Size:** {entries['bytes'].sum() / 1024 / 1024:.1f} MB · "
+                     f"**Rows:** {entries['rows'].sum():,} · "
+                     f"**Stale (> {CACHE_MAX_AGE_DAYS} days):** {stale}")
+            newest = entries.loc[entries["fetched_at"].idxmax()]
+            oldest = entries.loc[entries["verified_at"].idxmin()]
+            st.write(f"**Newest:** {newest['indicator']}")
+            st.write(f"  *{datetime.datetime.fromtimestamp(newest['fetched_at']).strftime('%Y-%m-%d %H:%M')}*")
+            st.write(f"**Oldest:** {oldest['indicator']}")
+            st.write(f"  *{datetime.datetime.fromtimestamp(oldest['verified_at']).strftime('%Y-%m-%d %H:%M')}*")
+            st.dataframe(indicator_store.manifest_summary(CACHE_MAX_AGE_DAYS),
+                         use_container_width=True, hide_index=True)
+            with st.expander("Least recently verified"):
+                stalest = entries.nsmallest(20, "verified_at").copy()
+                stalest["age_days"] = stalest["age_days"].round(1)
+                st.dataframe(stalest[["indicator", "source", "age_days", "rows", "source_version",
+                                      "fetch_seconds"]],
+                             use_container_width=True, hide_index=True)
         
         if st.button("🗑️ Clear Cache"):
-            if cache_dir.exists():
-                import shutil
-                shutil.rmtree(cache_dir)
-                cache_dir.mkdir(parents=True)
+            # Publishes an empty store generation; workers reading the
+            # previous one are not cut off mid-read
+            try:
+                indicator_store.clear_store()
                 st.success("Cache cleared!")
                 st.rerun()
+            except RuntimeError as e:
+                st.error(f"❌ {e}")
+
+        st.subheader("Memory Cache")
+        from memory_cache import read_stats
+        worker_stats = read_stats()
+        if worker_stats:
+            budget = config.get("cache", {}).get("budget_mb", 512)
+            used_mb = sum(w["bytes"] for w in worker_stats) / 1024 / 1024
+            st.write(f"**Workers:** {len(worker_stats)} · **Used:** {used_mb:.1f} MB "
+                     f"(budget {budget} MB per worker)")
+            rows = {}
+            for w in worker_stats:
+                for name, c in w["functions"].items():
+                    row = rows.setdefault(name, {"function": name.split(".")[-1], **dict.fromkeys(c, 0)})
+                    for k, v in c.items():
+                        row[k] += v
+            for row in rows.values():
+                lookups = row["hits"] + row["misses"]
+                row["hit rate"] = f"{row['hits'] / lookups:.0%}" if lookups else "-"
+                row["MB"] = round(row.pop("bytes") / 1024 / 1024, 1)
+            st.dataframe(list(rows.values()), use_container_width=True, hide_index=True)
+            flights = {}
+            for w in worker_stats:
+                for name, c in w.get("singleflight", {}).items():
+                    row = flights.setdefault(name, {"computation": name.split(".")[-1],
+                                                    "computed": 0, "coalesced": 0})
+                    row["computed"] += c["computed"]
+                    row["coalesced"] += c["coalesced"]
+            if flights:
+                avoided = sum(row["coalesced"] for row in flights.values())
+                st.write(f"**Duplicate computations avoided:** {avoided}")
+                st.dataframe(list(flights.values()), use_container_width=True, hide_index=True)
+            from shared_cache import get_shared_cache
+            shared = get_shared_cache().stats()
+            if shared:
+                shared_mb = sum(size for _, size in shared.values()) / 1024 / 1024
+                st.write(f"**Shared result cache:** {sum(n for n, _ in shared.values())} entries, "
+                         f"{shared_mb:.1f} MB")
+        else:
+            st.write("No worker has reported cache statistics yet.")
 
 # Tab 2: Settings
 with tab2:
@@ -0,0 +1,506 @@
+"""Group aggregates: live computation and the materialized aggregate table.
+
+``compute_aggregates`` evaluates every (indicator, group, year) aggregate
+for a batch of indicators and groups, as matrix products of a
+group-membership matrix with the memory-mapped cube, falling back to
+the columnar store for indicators the cube cannot serve.
+
+``materialize`` runs it once for every catalogue indicator and every
+group in cache/groups and writes ``aggregates.pq``, a Parquet file
+kept in the store generation (see indicator_store) so it is published
+and rolled back together with the data it was computed from. Each row
+carries the aggregation rule, the weight indicator, the number of
+countries with data and the partial sums the value is derived from
+(``num``/``den``: Σx and the count for sum and mean, Σx·w and Σw for
+weighted). The store file stamp of each indicator and the stamp of
+each group file at build time, (mtime_ns, size) both, travel in the
+schema metadata, so a row is only served while neither its indicator,
+its weight nor its group membership changed since.
+
+After a refresh, ``apply_changes`` folds the store's ChangeSets into the
+partial sums instead of recomputing: only the touched (country, year)
+cells are read, and a change to a weight series is propagated to every
+indicator weighted by it.
+
+Rebuild with:
+
+    python aggregates.py
+"""
+
+import collections
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import indicator_store
+from indicator_cube import open_cube
+from groups import cache_folder, get_group_countries_iso3
+from indicators_data import indicators
+
+AGGREGATES_FILE = "aggregates.pq"
+
+_META_KEY = b"landlinked"
+
+SCHEMA = pa.schema([
+    ("indicator", pa.dictionary(pa.int16(), pa.string())),
+    ("group", pa.dictionary(pa.int16(), pa.string())),
+    ("date", pa.int16()),
+    ("value", pa.float64()),
+    ("n_countries", pa.int32()),
+    ("num", pa.float64()),
+    ("den", pa.float64()),
+    ("agg", pa.dictionary(pa.int8(), pa.string())),
+    ("weight_by", pa.dictionary(pa.int16(), pa.string())),
+])
+
+AGGREGATE_COLUMNS = ["indicator", "group", "date", "value", "n_countries"]
+TABLE_COLUMNS = [field.name for field in SCHEMA]
+
+_RULES = {code: meta["agg"] for code, meta in indicators.items()}
+
+_lock = threading.Lock()
+_table = None
+
+
+def aggregates_path():
+    """The aggregate table of this process's store generation."""
+    return os.path.join(indicator_store.store_dir(), AGGREGATES_FILE)
+
+
+def group_ids():
+    """Every group with a membership file in cache/groups."""
+    return sorted(f[: -len(".json")] for f in os.listdir(cache_folder) if f.endswith(".json"))
+
+
+def group_stamp(group):
+    """Return the group file's (mtime_ns, size), or None if it does not exist."""
+    try:
+        st = os.stat(os.path.join(cache_folder, f"{group}.json"))
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def pair_revision(indicator_id, group):
+    """Cache key for one (indicator, group) aggregate.
+
+    Covers every file the aggregate depends on: the indicator, its weight
+    indicator for weighted rules, and the group's membership file. A
+    refreshed weight (e.g. population) changes the key of every
+    indicator weighted by it and nothing else.
+    """
+    wgt_id = indicators.get(indicator_id, {}).get("weight_by")
+    return (
+        indicator_store.file_stamp(indicator_id),
+        indicator_store.file_stamp(wgt_id) if wgt_id else None,
+        group_stamp(group),
+    )
+
+
+def _stamps(revisions):
+    """{key: stamp} read from JSON, which turned the stamp tuples into lists."""
+    return {key: tuple(stamp) if isinstance(stamp, list) else stamp
+            for key, stamp in revisions.items()}
+
+
+def _empty():
+    return pd.DataFrame(columns=AGGREGATE_COLUMNS + ["num", "den"])
+
+
+def _values(rules, num, den):
+    """Derive aggregate values from partial sums (num alone for 'sum')."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(np.asarray(rules) == "sum", num, num / den)
+
+
+# ───────────────────────────────── Live computation ──────────────────────────
+def _usable_in_cube(cube, indicator_id):
+    """True when the indicator (and its weight series) can be read from the cube."""
+    wgt_id = indicators[indicator_id].get("weight_by")
+    return cube.has(indicator_id) and (wgt_id is None or cube.has(wgt_id))
+
+
+def _cube_aggregates(cube, codes, groups):
+    """
+    Aggregates every (code, group) pair as matrix products of a
+    group-membership matrix M (groups x countries) with the cube planes.
+    Codes are batched by rule, and each weight series is read once for
+    all the indicators it weights.
+    """
+    M = np.stack([cube.country_mask(get_group_countries_iso3(g)) for g in groups]).astype(np.float64)
+
+    batches = {}
+    for code in codes:
+        meta = indicators[code]
+        if meta["agg"] not in ("sum", "mean", "weighted"):
+            raise ValueError(f"Unknown agg rule '{meta['agg']}' for {code}")
+        batches.setdefault((meta["agg"], meta.get("weight_by")), []).append(code)
+
+    parts = []
+    for (rule, wgt_id), batch in batches.items():
+        X = np.stack([cube.plane(code) for code in batch])            # (k, C, Y)
+        valid = ~np.isnan(X)
+
+        if rule == "weighted":
+            W = np.asarray(cube.plane(wgt_id))                        # (C, Y)
+            valid &= ~np.isnan(W)
+            num = np.einsum("gc,kcy->kgy", M, np.where(valid, X * W, 0.0))
+            den = np.einsum("gc,kcy->kgy", M, np.where(valid, W, 0.0))
+            counts = np.einsum("gc,kcy->kgy", M, valid.astype(np.float64))
+        else:
+            num = np.einsum("gc,kcy->kgy", M, np.where(valid, X, 0.0))
+            counts = np.einsum("gc,kcy->kgy", M, valid.astype(np.float64))
+            den = counts
+        values = _values(rule, num, den)
+
+        k, g, y = np.nonzero(counts > 0)
+        parts.append(pd.DataFrame({
+            "indicator":   np.asarray(batch, dtype=object)[k],
+            "group":       np.asarray(groups, dtype=object)[g],
+            "date":        cube.years[y],
+            "value":       values[k, g, y],
+            "n_countries": counts[k, g, y].astype(np.int64),
+            "num":         num[k, g, y],
+            "den":         den[k, g, y],
+        }))
+    return pd.concat(parts, ignore_index=True) if parts else _empty()
+
+
+def _frame_aggregate(indicator_id, group):
+    """Aggregates one pair from the store (used when the cube cannot serve it)."""
+    iso3s = get_group_countries_iso3(group)
+    df = indicator_store.read_frame(indicator_id, iso3s)
+    rule = indicators[indicator_id]["agg"]
+
+    if rule in ("sum", "mean"):
+        grouped = df.groupby("date")["value"]
+        num, counts = grouped.sum(), grouped.count()
+        den = counts.astype(np.float64)
+
+    elif rule == "weighted":
+        wgt_id = indicators[indicator_id]["weight_by"]
+        wdf = indicator_store.read_frame(wgt_id, iso3s)
+        if wdf is None:
+            return _empty()
+        # merge on country & date
+        m = pd.merge(
+            df, wdf[["country_iso3", "date", "value"]],
+            on=["country_iso3", "date"],
+            suffixes=("", "_wgt")
+        )
+        num = (m["value"] * m["value_wgt"]).groupby(m["date"]).sum()
+        den = m.groupby("date")["value_wgt"].sum()
+        counts = m.groupby("date").size()
+
+    else:
+        raise ValueError(f"Unknown agg rule '{rule}' for {indicator_id}")
+
+    num = num.to_numpy(dtype=np.float64)
+    den = den.to_numpy(dtype=np.float64)
+    return pd.DataFrame({
+        "indicator":   indicator_id,
+        "group":       group,
+        "date":        counts.index.astype(np.int16),
+        "value":       _values(rule, num, den),
+        "n_countries": counts.to_numpy(dtype=np.int64),
+        "num":         num,
+        "den":         den,
+    })
+
+
+def compute_aggregates(codes, groups):
+    """
+    Computes every indicator in ``codes`` for every group in ``groups``
+    from the cube (or the store) and returns a tidy DataFrame with
+    columns [indicator, group, date, value, n_countries, num, den].
+    """
+    if not codes or not groups:
+        return _empty()
+    cube = open_cube()
+    in_cube = [c for c in codes if cube is not None and _usable_in_cube(cube, c)]
+    parts = [_cube_aggregates(cube, in_cube, groups)] if in_cube else []
+    for code in codes:
+        if code not in in_cube and indicator_store.exists(code):
+            parts.extend(_frame_aggregate(code, g) for g in groups)
+    return pd.concat(parts, ignore_index=True) if parts else _empty()
+
+
+# ───────────────────────────────── Materialized table ────────────────────────
+class MaterializedAggregates:
+    """Read-only view over the aggregate table and its build revisions."""
+
+    def __init__(self, df, meta):
+        self.df = df
+        self.revisions = _stamps(meta.get("revisions", {}))
+        self.group_revisions = _stamps(meta.get("groups", {}))
+        self.built_at = meta.get("built_at", "")
+        self._index = {
+            key: idx for key, idx in df.groupby(["indicator", "group"], sort=False).indices.items()
+        }
+
+    def _current(self, code):
+        return (
+            code in self.revisions
+            and indicator_store.file_stamp(code) == self.revisions[code]
+        )
+
+    def covers(self, indicator_id, group):
+        """True when the table holds an up-to-date aggregate for the pair.
+
+        A pair with no rows is covered too: it was computed and had no data.
+        """
+        if indicator_id not in indicators or group not in self.group_revisions:
+            return False
+        if group_stamp(group) != self.group_revisions[group]:
+            return False
+        wgt_id = indicators[indicator_id].get("weight_by")
+        return self._current(indicator_id) and (wgt_id is None or self._current(wgt_id))
+
+    def rows(self, pairs):
+        """Return the stored rows for ``pairs`` of (indicator, group)."""
+        idx = [self._index[p] for p in pairs if p in self._index]
+        if not idx:
+            return _empty()
+        return self.df.iloc[np.concatenate(idx)][AGGREGATE_COLUMNS]
+
+
+def _revisions(codes):
+    """Current store file stamps of ``codes`` and their weight indicators."""
+    revisions = {}
+    for code in codes:
+        for dep in (code, indicators[code].get("weight_by")):
+            if dep:
+                revisions[dep] = indicator_store.file_stamp(dep)
+    return revisions
+
+
+def _write(df, revisions, groups):
+    df = df.copy()
+    df["agg"] = df["indicator"].map(_RULES)
+    df["weight_by"] = df["indicator"].map({c: m.get("weight_by") or "" for c, m in indicators.items()})
+    df = df.sort_values(["indicator", "group", "date"], ignore_index=True)[TABLE_COLUMNS]
+
+    meta = {
+        "revisions": revisions,
+        "groups": {g: group_stamp(g) for g in groups},
+        "built_at": pd.Timestamp.now().isoformat(timespec="seconds"),
+    }
+    table = pa.Table.from_pandas(df, schema=SCHEMA, preserve_index=False)
+    table = table.replace_schema_metadata({_META_KEY: json.dumps(meta)})
+    os.makedirs(indicator_store.store_dir(), exist_ok=True)
+    indicator_store.replace_atomic(aggregates_path(), lambda tmp: pq.write_table(table, tmp))
+    return len(df)
+
+
+def materialize(codes=None, groups=None):
+    """Compute and write the aggregate table; returns the number of rows.
+
+    Defaults to every catalogue indicator in the store and every group
+    in cache/groups.
+    """
+    if codes is None:
+        codes = [c for c in indicators if indicator_store.exists(c)]
+    if groups is None:
+        groups = group_ids()
+    revisions = _revisions(codes)
+    return _write(compute_aggregates(codes, groups), revisions, groups)
+
+
+# ───────────────────────────────── Incremental maintenance ───────────────────
+_KEYS = ["country_iso3", "date"]
+
+
+def _collapse(change_sets):
+    """Net change of a chain of ChangeSets: first old value, last new value.
+
+    Taken by position in the chain, NaN included: a cell inserted then
+    updated had no old value, and one updated then withdrawn has no new
+    one.
+    """
+    rows = pd.concat([cs.rows for cs in change_sets], ignore_index=True)
+    old = rows.drop_duplicates(_KEYS, keep="first").set_index(_KEYS)["old_value"]
+    new = rows.drop_duplicates(_KEYS, keep="last").set_index(_KEYS)["new_value"]
+    rows = pd.concat([old, new], axis=1).reset_index()
+    unchanged = rows["old_value"].eq(rows["new_value"]) | (
+        rows["old_value"].isna() & rows["new_value"].isna()
+    )
+    return rows[~unchanged]
+
+
+def _old_and_new(code, cells, net, cube):
+    """Values of ``code`` at ``cells`` before and after the refresh.
+
+    Current values come from the cube when it is up to date for ``code``
+    and from the store otherwise.
+    """
+    if cube is not None and cube.has(code):
+        new = cube.values(code, cells["country_iso3"], cells["date"])
+    else:
+        current = indicator_store.read_frame(code, cells["country_iso3"].unique())
+        if current is None:
+            new = np.full(len(cells), np.nan)
+        else:
+            new = cells.merge(current[_KEYS + ["value"]], on=_KEYS, how="left")["value"].to_numpy()
+    old = new.copy()
+    if code in net:
+        hit = cells.merge(net[code], on=_KEYS, how="left", indicator=True)
+        changed = (hit["_merge"] == "both").to_numpy()
+        old[changed] = hit["old_value"].to_numpy()[changed]
+    return old, new
+
+
+def _contributions(rule, x, w):
+    """Per-cell (num, den, count) contributions of values ``x`` weighted by ``w``."""
+    valid = ~np.isnan(x)
+    if rule == "weighted":
+        valid &= ~np.isnan(w)
+        return np.where(valid, x * w, 0.0), np.where(valid, w, 0.0), valid
+    return np.where(valid, x, 0.0), valid.astype(np.float64), valid
+
+
+def _deltas(code, net, membership, cube):
+    """Partial-sum deltas per (group, date) of ``code`` for the net changes."""
+    wgt_id = indicators[code].get("weight_by")
+    cells = pd.concat(
+        [net[dep][_KEYS] for dep in (code, wgt_id) if dep in net], ignore_index=True
+    ).drop_duplicates(ignore_index=True)
+
+    x_old, x_new = _old_and_new(code, cells, net, cube)
+    if wgt_id:
+        w_old, w_new = _old_and_new(wgt_id, cells, net, cube)
+    else:
+        w_old = w_new = None
+    rule = indicators[code]["agg"]
+    num_old, den_old, valid_old = _contributions(rule, x_old, w_old)
+    num_new, den_new, valid_new = _contributions(rule, x_new, w_new)
+
+    cells = cells.assign(
+        num=num_new - num_old,
+        den=den_new - den_old,
+        n_countries=valid_new.astype(np.int64) - valid_old.astype(np.int64),
+    )
+    deltas = cells.merge(membership, on="country_iso3").groupby(
+        ["group", "date"], as_index=False
+    )[["num", "den", "n_countries"]].sum()
+    deltas["indicator"] = code
+    return deltas
+
+
+def apply_changes(change_sets):
+    """Fold store ChangeSets into the materialized table; returns its row count.
+
+    Every indicator that changed, and every indicator weighted by one
+    that changed, has its partial sums updated from the changed cells
+    only. An indicator is recomputed from scratch instead when the
+    ChangeSets do not form an unbroken chain from the revision the table
+    holds to the current store file (a write this run did not see), and
+    the whole table is rebuilt when there is none yet or group
+    membership changed. Indicators the ChangeSets do not mention are
+    recomputed too when they or their weight series changed since the
+    table was written, e.g. by a run that crashed before applying its
+    ChangeSets and was resumed.
+    """
+    table = open_aggregates()
+    groups = group_ids()
+    if table is None or table.group_revisions != {g: group_stamp(g) for g in groups}:
+        return materialize(groups=groups)
+
+    chains = collections.defaultdict(list)
+    for cs in change_sets:
+        chains[cs.indicator].append(cs)
+
+    net, broken = {}, set()
+    for code, chain in chains.items():
+        # Follow the writes from the revision the table holds
+        by_previous = {cs.previous_revision: cs for cs in chain}
+        ordered, revision = [], table.revisions.get(code)
+        while revision in by_previous:
+            ordered.append(by_previous.pop(revision))
+            revision = ordered[-1].revision
+        if len(ordered) == len(chain) and revision == indicator_store.file_stamp(code):
+            net[code] = _collapse(ordered)
+        else:
+            broken.add(code)
+
+    def _current(dep):
+        return table.revisions.get(dep) == indicator_store.file_stamp(dep)
+
+    def _usable(dep):
+        if dep in chains:
+            return dep in net
+        return _current(dep)
+
+    affected, recompute = [], []
+    for code, meta in indicators.items():
+        deps = [d for d in (code, meta.get("weight_by")) if d]
+        if not indicator_store.exists(code):
+            continue
+        if not any(d in chains for d in deps) and all(_current(d) for d in deps):
+            continue
+        if code in table.revisions and all(_usable(d) for d in deps):
+            affected.append(code)
+        else:
+            recompute.append(code)
+
+    if not affected and not recompute:
+        return len(table.df)
+
+    membership = pd.DataFrame(
+        [(g, iso3) for g in groups for iso3 in get_group_countries_iso3(g)],
+        columns=["group", "country_iso3"],
+    )
+    keys = ["indicator", "group", "date"]
+    cols = ["num", "den", "n_countries"]
+    df = table.df[~table.df["indicator"].isin(recompute)]
+
+    cube = open_cube()
+    deltas = [_deltas(code, net, membership, cube) for code in affected]
+    if deltas:
+        delta = pd.concat(deltas, ignore_index=True).astype({"date": np.int16})
+        df = df.set_index(keys)[cols].add(delta.set_index(keys)[cols], fill_value=0).reset_index()
+        df["n_countries"] = df["n_countries"].round().astype(np.int64)
+        df = df[df["n_countries"] > 0]
+        df["value"] = _values(df["indicator"].map(_RULES), df["num"], df["den"])
+
+    parts = [df[AGGREGATE_COLUMNS + ["num", "den"]]]
+    if recompute:
+        parts.append(compute_aggregates(recompute, groups))
+    revisions = {**table.revisions, **_revisions(affected + recompute)}
+    return _write(pd.concat(parts, ignore_index=True), revisions, groups)
+
+
+def open_aggregates():
+    """Return the shared MaterializedAggregates, or None if none was built.
+
+    The table is reloaded when it is rewritten or another store
+    generation is published.
+    """
+    global _table
+    path = os.path.join(os.path.realpath(indicator_store.store_dir()), AGGREGATES_FILE)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    key = (path, st.st_ino, st.st_mtime_ns)
+    with _lock:
+        if _table is None or _table[0] != key:
+            table = pq.read_table(path)
+            meta = json.loads((table.schema.metadata or {}).get(_META_KEY, b"{}"))
+            df = table.to_pandas()
+            for col in ("indicator", "group", "agg", "weight_by"):
+                df[col] = df[col].astype(str)
+            _table = (key, MaterializedAggregates(df, meta))
+        return _table[1]
+
+
+if __name__ == "__main__":
+    # Rebuilt in a staged generation, so readers of the current one keep
+    # their table until the new one is published
+    with indicator_store.staged_generation() as generation:
+        n = materialize()
+        print(f"Materialized {n} aggregate rows in {generation}")
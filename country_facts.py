@@ -1,11 +1,55 @@
 import requests
 import json
 import os
+import singleflight
 
 # Define the file path for caching
 cache_dir = './cache'
 cache_file = os.path.join(cache_dir, 'country_facts.json')
 
+# Compact cca3-keyed store derived from cache_file: only the fields the UI reads
+facts_file = os.path.join(cache_dir, 'country_facts_compact.json')
+FACT_TRANSLATIONS = ('ara', 'zho', 'fra', 'rus', 'spa')
+FACT_FIELDS = ('capital', 'region', 'subregion', 'area', 'population', 'borders', 'flag')
+
+_facts = None
+_facts_stamp = None
+
+
+def _compact(country):
+    """Keep the REST Countries fields the profile and flag lookups use, in their original shape."""
+    facts = {'cca3': country['cca3'],
+             'name': {'common': country['name'].get('common'), 'official': country['name'].get('official')}}
+    if 'translations' in country:
+        facts['translations'] = {lang: {'official': country['translations'][lang].get('official')}
+                                 for lang in FACT_TRANSLATIONS if lang in country['translations']}
+    if 'demonyms' in country:
+        demonym = country['demonyms'].get('eng')
+        facts['demonyms'] = {'eng': {'m': demonym.get('m')}} if demonym else {}
+    # Absent upstream fields stay absent, as in the full cache
+    for field in FACT_FIELDS:
+        if field in country:
+            facts[field] = country[field]
+    return facts
+
+
+def _write_atomic(path, data, **dump_args):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as file:
+        json.dump(data, file, **dump_args)
+    os.replace(tmp, path)
+
+
+def build_facts_store(countries):
+    """Write the compact store for ``countries`` (first record per cca3 wins)."""
+    facts = {}
+    for country in countries:
+        if country.get('cca3'):
+            facts.setdefault(country['cca3'], _compact(country))
+    _write_atomic(facts_file, facts, ensure_ascii=False, separators=(',', ':'))
+    return facts
+
+
 def fetch_and_cache_countries_data():
     url = "https://restcountries.com/v3.1/all"
     response = requests.get(url)
@@ -14,9 +58,11 @@ def fetch_and_cache_countries_data():
     # Ensure the cache directory exists
     os.makedirs(cache_dir, exist_ok=True)
     
-    # Save data to cache file
-    with open(cache_file, 'w') as file:
-        json.dump(countries, file, indent=4)
+    # Save data to cache file and swap in the new compact store;
+    # readers never see a half-written file
+    _write_atomic(cache_file, countries, indent=4)
+    build_facts_store(countries)
+    get_facts()
     
     return countries
 
@@ -32,13 +78,41 @@ def load_countries_data():
     
     return countries
 
+def _stamp(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def _reload_facts():
+    global _facts, _facts_stamp
+    stamp = _stamp(facts_file)
+    if stamp is None or (_stamp(cache_file) or (0,))[0] > stamp[0]:
+        # Missing or older than the full REST Countries cache: rebuild it
+        build_facts_store(load_countries_data())
+        stamp = _stamp(facts_file)
+    if stamp != _facts_stamp:
+        with open(facts_file, 'r', encoding='utf-8') as file:
+            _facts = json.load(file)
+        _facts_stamp = stamp
+    return _facts
+
+def get_facts():
+    """Return the {cca3: facts} store, loaded once and reloaded only when the file changes."""
+    stamp = _stamp(facts_file)
+    if _facts is not None and stamp == _facts_stamp and \
+            (_stamp(cache_file) or (0,))[0] <= stamp[0]:
+        return _facts
+    # Concurrent sessions share one reload
+    return singleflight.group('country_facts').do('facts', _reload_facts)
+
 def load_countries_group_data(group):
-    data = load_countries_data()
-    return [country for country in data if country['cca3'] in group]
+    return [country for cca3, country in get_facts().items() if cca3 in group]
 
 def load_country_data(country_code):
-    data = load_countries_data()
-    return [country for country in data if country['cca3'] == country_code]
+    country = get_facts().get(country_code)
+    return [country] if country else []
 
 def load_factbook_data(country_code):
     filename = f"{country_code.lower()}.json"
@@ -48,13 +122,11 @@ def load_factbook_data(country_code):
         return data
     
 def load_small_flags():
-    data = load_countries_data()
-    return [{"cca3":country['cca3'], "flag": country['flag']} for country in data]
+    return [{"cca3": cca3, "flag": country['flag']} for cca3, country in get_facts().items()]
 
 def get_small_flag(cca3):
-    for item in country_small_flags:
-        if item['cca3'] == cca3:
-            return item['flag']
+    country = get_facts().get(cca3)
+    return country['flag'] if country else None
         
 def load_country_qualitative_info():
     filename = "countries.json"
@@ -64,10 +136,13 @@ def load_country_qualitative_info():
         return data
 
 def get_country_description(iso3):
-    for item in country_qualitative_data:
-        if item['iso3'] == iso3:
-            return item['profile']
+    return descriptions_by_iso3.get(iso3)
 
 country_qualitative_data = load_country_qualitative_info()
 
-country_small_flags = load_small_flags()
\ No newline at end of file
+country_small_flags = load_small_flags()
+
+# First entry wins, as the old linear scan did
+descriptions_by_iso3 = {}
+for item in country_qualitative_data:
+    descriptions_by_iso3.setdefault(item['iso3'], item.get('profile'))
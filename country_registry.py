@@ -0,0 +1,127 @@
+"""In-memory country reference registry.
+
+Built once per process from ``cache/Countrycodesfull.json`` and the
+group files in ``cache/groups``, then shared read-only by groups.py,
+country_facts.py and plugins.country_mapping. Every lookup that used to
+scan the country list or re-read a group file is a dict or set lookup.
+A group file edited after startup is read again on its next lookup, so
+membership agrees with the group stamps in the aggregate cache keys.
+"""
+
+import json
+import os
+import threading
+from collections import namedtuple
+from types import MappingProxyType
+
+COUNTRY_CODES_PATH = os.path.join(os.path.dirname(__file__), "cache", "Countrycodesfull.json")
+GROUPS_DIR = os.path.join(os.path.dirname(__file__), "cache", "groups")
+
+Country = namedtuple("Country", ["name", "iso2", "iso3", "fips", "m49"])
+
+# A group's members in file order, as the group file names them
+Group = namedtuple("Group", ["gid", "members", "iso3s", "names", "iso3_by_name"])
+
+
+def _group_path(gid):
+    return os.path.join(GROUPS_DIR, f"{gid}.json")
+
+
+def _stamp(path):
+    """(mtime_ns, size) of a file, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _load_group(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    members = tuple(MappingProxyType(dict(c)) for c in data.get("countries", []))
+    gid = os.path.splitext(os.path.basename(path))[0]
+    iso3_by_name = {}
+    for c in members:
+        iso3_by_name.setdefault(c["name"], c["ISO3"])
+    return Group(
+        gid=gid,
+        members=members,
+        iso3s=frozenset(c["ISO3"] for c in members),
+        names=tuple(c["name"] for c in members),
+        iso3_by_name=MappingProxyType(iso3_by_name),
+    )
+
+
+class CountryRegistry:
+    """Immutable hash indexes over the country reference list, plus the
+    groups, each kept with the stamp of the file it was read from."""
+
+    def __init__(self, entries, groups):
+        self.entries = tuple(MappingProxyType(dict(e)) for e in entries)
+        by_name, by_iso2, by_iso3, by_fips, by_m49 = {}, {}, {}, {}, {}
+        for e in self.entries:
+            m49 = e.get("M49", "")
+            country = Country(
+                name=e.get("NAME.EN", ""),
+                iso2=e.get("ISO_3166_2", ""),
+                iso3=e.get("ISO_3166_3", ""),
+                fips=e.get("FIPS_GEC", ""),
+                m49=int(m49) if str(m49).isdigit() else None,
+            )
+            # First entry wins, as the linear scans did
+            for index, key in ((by_name, country.name), (by_iso2, country.iso2),
+                               (by_iso3, country.iso3), (by_fips, country.fips),
+                               (by_m49, country.m49)):
+                if key:
+                    index.setdefault(key, country)
+        self.by_name = MappingProxyType(by_name)
+        self.by_iso2 = MappingProxyType(by_iso2)
+        self.by_iso3 = MappingProxyType(by_iso3)
+        self.by_fips = MappingProxyType(by_fips)
+        self.by_m49 = MappingProxyType(by_m49)
+        # {gid: (file stamp, Group)}, replaced whole when a file changes
+        self._groups = {g.gid: (_stamp(_group_path(g.gid)), g) for g in groups}
+        self._groups_lock = threading.Lock()
+
+    @property
+    def groups(self):
+        """{gid: Group} of the groups read so far."""
+        return MappingProxyType({gid: g for gid, (_, g) in self._groups.items()})
+
+    def group(self, gid):
+        """Return the Group ``gid``, read from disk again when its file
+        changed since it was last read (or was added after startup)."""
+        path = _group_path(gid)
+        stamp = _stamp(path)
+        cached = self._groups.get(gid)
+        # A deleted file keeps the members it was last read with
+        if cached is not None and (cached[0] == stamp or stamp is None):
+            return cached[1]
+        group = _load_group(path)
+        with self._groups_lock:
+            self._groups = {**self._groups, gid: (stamp, group)}
+        return group
+
+    def groups_of(self, iso3):
+        """Ids of every group ``iso3`` belongs to."""
+        return [gid for gid in list(self._groups) if iso3 in self.group(gid).iso3s]
+
+
+_registry = None
+_lock = threading.Lock()
+
+
+def get_registry():
+    """Return the process-wide CountryRegistry, building it on first use."""
+    global _registry
+    with _lock:
+        if _registry is None:
+            with open(COUNTRY_CODES_PATH, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+            groups = [
+                _load_group(os.path.join(GROUPS_DIR, f))
+                for f in sorted(os.listdir(GROUPS_DIR)) if f.endswith(".json")
+            ]
+            _registry = CountryRegistry(entries, groups)
+        return _registry
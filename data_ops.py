@@ -1,64 +1,112 @@
-import json, pandas as pd
-from pathlib import Path
-import streamlit as st
-from indicators_data import indicators
+import pandas as pd
+import indicator_store
+from aggregates import AGGREGATE_COLUMNS, compute_aggregates, group_stamp, open_aggregates, pair_revision
+from indicator_cube import open_cube
+from groups import get_group_countries_iso3
+from memory_cache import bounded_cache
+
+GROUP_DATA_COLUMNS = ["country_iso3", "country_id", "country_name", "date", "value"]
 
 def load_group_data(indicator_id: str, group: str) -> pd.DataFrame:
     """
-    Reads indicator_<group>.json, returns a DataFrame with columns
-    [country_id, country_name, date, value].
-    File-existence check is NOT cached so new downloads are picked up.
+    Reads the indicator's rows for the members of <group> (resolved from
+    cache/groups/<group>.json) from the columnar store and returns a
+    DataFrame with columns
+    [country_iso3, country_id, country_name, date, value] (date is an int year).
+    The cache key includes the (mtime, size) of the store file and the
+    group file, so a refreshed indicator or edited group is re-read.
     """
-    path = Path(f"cache/indicators/{indicator_id}_{group}.json")
-    if not path.exists():
-        return pd.DataFrame(columns=["country_id", "country_name", "date", "value"])
-    return _load_group_data_cached(indicator_id, group)
-
-@st.cache_data
-def _load_group_data_cached(indicator_id: str, group: str) -> pd.DataFrame:
-    path = Path(f"cache/indicators/{indicator_id}_{group}.json")
-    meta, records = json.loads(path.read_text())
-    df = pd.json_normalize(records)
-    df = df.rename(columns={
-        "country.id":   "country_id",
-        "country.value":"country_name",
-        "date":         "date",
-        "value":        "value",
-    })
-    df["value"] = pd.to_numeric(df["value"], errors="coerce")
-    return df.dropna(subset=["value"])
-
-@st.cache_data
-def compute_group_aggregate(indicator_id: str, group: str) -> pd.Series:
-    df = load_group_data(indicator_id, group)
-    rule = indicators[indicator_id]['agg']
+    revision = indicator_store.file_stamp(indicator_id)
+    if revision is None:
+        return pd.DataFrame(columns=GROUP_DATA_COLUMNS)
+    group = group.lower()
+    return _load_group_data_cached(indicator_id, group, (revision, group_stamp(group)))
+
+@bounded_cache
+def _load_group_data_cached(indicator_id: str, group: str, revision: tuple) -> pd.DataFrame:
+    df = indicator_store.read_frame(indicator_id, get_group_countries_iso3(group))
+    return df[GROUP_DATA_COLUMNS]
+
+def load_country_indicators(iso3: str, indicator_ids: list) -> dict:
+    """
+    Returns {indicator_id: records} with one country's series for every
+    indicator in <indicator_ids>, in the legacy World Bank record format
+    (None where the indicator has not been downloaded). The read is one
+    slice of the indicator cube per indicator, falling back to a filtered
+    store read for indicators changed since the cube was built. Cached
+    per country; the store mtimes are part of the key, so a refreshed
+    indicator is re-read.
+    """
+    indicator_ids = tuple(dict.fromkeys(indicator_ids))
+    revisions = tuple(indicator_store.file_stamp(code) for code in indicator_ids)
+    return _load_country_indicators_cached(iso3, indicator_ids, revisions)
+
+@bounded_cache(shared=True)
+def _load_country_indicators_cached(iso3: str, indicator_ids: tuple, revisions: tuple) -> dict:
+    cube = open_cube()
+    result = {}
+    for indicator_id, revision in zip(indicator_ids, revisions):
+        if revision is None:
+            result[indicator_id] = None
+            continue
+        if cube is not None and cube.has(indicator_id):
+            years, values = cube.country_series(indicator_id, iso3)
+            df = indicator_store.add_country_columns(pd.DataFrame({
+                "country_iso3": iso3, "date": years, "value": values,
+            }))
+        else:
+            df = indicator_store.read_frame(indicator_id, [iso3])
+        result[indicator_id] = indicator_store.frame_to_records(df, indicator_id)
+    return result
 
-    if rule == 'sum':
-        result = df.groupby("date")["value"].sum()
+def compute_group_aggregates(codes: list, groups: list) -> pd.DataFrame:
+    """
+    Returns every indicator in <codes> for every group in <groups> as a
+    tidy DataFrame with columns [indicator, group, date, value,
+    n_countries], sorted by indicator, group and date. Group ids are
+    lower-cased.
 
-    elif rule == 'mean':
-        result = df.groupby("date")["value"].mean()
+    Each (indicator, group) pair is cached on its own, keyed on the
+    (mtime, size) of the files it depends on (see
+    aggregates.pair_revision). A refresh therefore recomputes only the
+    pairs of the changed indicator, group or weight indicator.
+    """
+    codes = list(dict.fromkeys(codes))
+    groups = list(dict.fromkeys(g.lower() for g in groups))
+    if not codes or not groups:
+        return pd.DataFrame(columns=AGGREGATE_COLUMNS)
 
-    elif rule == 'weighted':
-        wgt_id = indicators[indicator_id]['weight_by']
-        wdf = load_group_data(wgt_id, group)
-        # merge on country & date
-        m = pd.merge(
-            df, wdf,
-            on=["country_id","country_name","date"],
-            suffixes=("","_wgt")
-        )
-        num = (m["value"] * m["value_wgt"]).groupby(m["date"]).sum()
-        den = m.groupby("date")["value_wgt"].sum()
-        result = num.div(den)
-        result.name = "value"
-        return [result.sort_index()]
+    parts = [
+        _group_aggregate_cached(code, group, pair_revision(code, group))
+        for code in codes for group in groups
+    ]
+    parts = [p for p in parts if not p.empty]
+    if not parts:
+        return pd.DataFrame(columns=AGGREGATE_COLUMNS)
+    result = pd.concat(parts, ignore_index=True)
+    return result.sort_values(["indicator", "group", "date"], ignore_index=True)
 
+@bounded_cache(shared=True)
+def _group_aggregate_cached(indicator_id: str, group: str, revision: tuple) -> pd.DataFrame:
+    # The materialized table answers when it is current for the pair;
+    # otherwise (ad-hoc group, indicator refreshed since the build) compute live
+    table = open_aggregates()
+    if table is not None and table.covers(indicator_id, group):
+        return table.rows([(indicator_id, group)])
+    return compute_aggregates([indicator_id], [group])[AGGREGATE_COLUMNS]
 
-    else:
-        raise ValueError(f"Unknown agg rule '{rule}' for {indicator_id}")
+def aggregate_series(aggregates: pd.DataFrame, indicator_id: str, group: str) -> pd.Series:
+    """Extracts one (indicator, group) series, indexed by year, from a tidy aggregate frame."""
+    rows = aggregates[(aggregates["indicator"] == indicator_id) & (aggregates["group"] == group.lower())]
+    return pd.Series(
+        rows["value"].to_numpy(),
+        index=pd.Index(rows["date"].to_numpy(), name="date"),
+        name="value",
+    )
 
-    return [result.sort_index()]
+def compute_group_aggregate(indicator_id: str, group: str) -> pd.Series:
+    aggregates = compute_group_aggregates([indicator_id], [group])
+    return [aggregate_series(aggregates, indicator_id, group)]
 
 def normalize_dictionary(data):
     # Normalize the nested dictionary data
@@ -73,6 +121,10 @@ def normalize_dictionary(data):
     # Remove rows with None values in the 'date' column
     df = df.dropna(subset=['value'])
 
+    # Typed years and values so min/max and sorting are numeric
+    if not df.empty:
+        df = df.astype({'date': 'int16', 'value': 'float64'})
+
     return df
 
 
@@ -1,39 +1,156 @@
-"""Download indicator data for all groups using the plugin registry.
+"""Download indicator data for every country in cache/groups using the plugin registry.
 
-Each registered data source plugin (World Bank, UN SDG, FAOSTAT)
-fetches, normalizes, and caches its own indicators.
+Each registered data source plugin (World Bank, UN SDG, FAOSTAT, IMF)
+fetches, normalizes, and caches its own indicators; all of them run on
+one asyncio fetch engine so requests to different hosts overlap. The store is keyed
+on (indicator, country, year), so every indicator is fetched once for
+the union of all group members; group aggregates are resolved at query
+time from cache/groups/*.json. The run ends by rebuilding the shared
+cube and folding the changed (indicator, country, year) cells into the
+materialized group aggregates.
+
+Everything is written to a staged store generation, published with the
+cube and the aggregate table in one swap at the end of the run (see
+indicator_store), so the app keeps serving the previous data in full
+while a refresh runs.
+
+Progress is checkpointed unit by unit in a refresh manifest (see
+refresh_manifest.py), so a run that dies halfway can be continued:
+
+    python data_update.py                 # new run over every group and source
+    python data_update.py --resume        # the last run's pending units
+    python data_update.py --only-failed   # the last run's failed units
+    python data_update.py --indicators SH.XPD.CHEX.GD.ZS
+                                          # one indicator and its weight series
+
+Weight series are fetched before the indicators weighted by them (see
+refresh_scheduler.py), and the aggregates of every indicator weighted
+by a series that changed are recomputed.
+
+``run_update`` is also what the background job worker (jobs.py) runs
+for the admin page's update buttons.
 """
 
-import json
+import argparse
+import sys
 from pathlib import Path
 from indicators_data import indicators
+from groups import get_groups_members
+import indicator_store
+from indicator_cube import build_cube
+from aggregates import apply_changes
 from plugins import get_all_plugins
+from plugins.engine import download_all
+from refresh_manifest import MANIFEST_PATH, RefreshManifest
+import refresh_scheduler
+
+GROUPS_DIR = Path("cache/groups")
+
 
-# List of groups to process
-GROUPS = ["lldcs", "ldcs", "sids", "g77", "brics", "eu", "oecd", "g20", "aosis", "lmcs", "lics"]
+def load_all_countries():
+    """Return the de-duplicated member list of every group in cache/groups."""
+    return get_groups_members(sorted(p.stem for p in GROUPS_DIR.glob("*.json")))  # list of {name, ISO, ISO3}
 
-# Instantiate all plugins
-plugins = get_all_plugins(indicators)
 
+def get_plugins(sources=None, codes=None):
+    """Instantiate the plugins, optionally only those whose SOURCE_NAME is in ``sources``.
 
-def load_group_countries(group_code):
-    """Load the country list from the group JSON file."""
-    path = Path("cache/groups") / f"{group_code}.json"
-    data = json.loads(path.read_text())
-    return data["countries"]  # list of {name, ISO, ISO3}
+    With ``codes``, the plugins only hold those indicators and their
+    weight series, and check the requested ones upstream even within
+    their cache window.
+    """
+    if codes is None:
+        plugins = get_all_plugins(indicators)
+    else:
+        wanted = refresh_scheduler.closure(codes)
+        plugins = get_all_plugins({code: indicators[code] for code in wanted})
+        for plugin in plugins:
+            plugin.recheck.update(code for code in codes if code in plugin.indicators)
+    if sources is not None:
+        plugins = [p for p in plugins if p.SOURCE_NAME in sources]
+    return plugins
 
 
-for group_code in GROUPS:
-    countries = load_group_countries(group_code)
-    print(f"\n===== Processing group: {group_code} ({len(countries)} countries) =====")
+def run_update(groups=None, sources=None, manifest=None, codes=None):
+    """Refresh the store, the cube and the aggregates; returns {indicator: succeeded}.
 
+    ``groups`` limits the countries fetched to those groups' members (all
+    groups by default), ``sources`` the plugins run and ``codes`` the
+    indicators, which are refreshed with their weight series. Units are
+    checkpointed in ``manifest``, a new one at MANIFEST_PATH by default;
+    pass a loaded manifest to run only its units in ``run_states``. The
+    cube and the aggregates are brought up to date with whatever was
+    written, also when the run was cancelled part way.
+    """
+    if manifest is None:
+        manifest = RefreshManifest.create(MANIFEST_PATH, groups, sources, codes)
+    if groups is None:
+        countries = load_all_countries()
+        group_code = "all"
+        print(f"\n===== Processing {len(countries)} countries from {GROUPS_DIR} =====")
+    else:
+        countries = get_groups_members(groups)
+        group_code = "+".join(groups)
+        print(f"\n===== Processing {', '.join(g.upper() for g in groups)} "
+              f"({len(countries)} countries) =====")
+
+    plugins = get_plugins(sources, codes)
+    manifest.plan(plugins)
     for plugin in plugins:
-        n = len(plugin.indicators)
-        if n == 0:
-            continue
-        print(f"\n  [{plugin.SOURCE_NAME}] {n} indicators")
-        plugin.download_all_indicators(group_code, countries)
+        todo = sum(manifest.pending(plugin.SOURCE_NAME, code) for code in plugin.indicators)
+        print(f"  [{plugin.SOURCE_NAME}] {todo}/{len(plugin.indicators)} indicators to run")
+
+    with indicator_store.staged_generation():
+        # One engine run for every source, so requests to different hosts overlap
+        results = download_all(plugins, group_code, countries, manifest)
+        print(f"{sum(results.values())}/{len(results)} indicators with data")
+
+        if manifest.cancelled():
+            print("Run cancelled; updating the cube and aggregates with what was written")
+        else:
+            print("All indicator data downloads completed successfully!")
+
+        # Rebuild the shared memory-mapped cube served to the Streamlit workers
+        shape = build_cube()
+        print(f"Built indicator cube {shape} (indicators, countries, years)")
+
+        # Update the materialized aggregates from what this run changed
+        change_sets = [cs for plugin in plugins for cs in plugin.change_sets]
+        n_changed = sum(len(cs.rows) for cs in change_sets)
+        print(f"{n_changed} indicator cells changed in {len(change_sets)} writes")
+        reweighted = refresh_scheduler.dependents({cs.indicator for cs in change_sets if len(cs.rows)})
+        if reweighted:
+            print(f"{len(reweighted)} indicators reaggregated for changed weight series")
+        n_rows = apply_changes(change_sets)
+        print(f"Materialized {n_rows} aggregate rows")
+
+    manifest.set_state("cancelled" if manifest.cancelled() else "complete")
+    counts = manifest.counts()
+    print("Units: " + ", ".join(f"{n} {state}" for state, n in counts.items()))
+    return results
+
 
-    print(f"===== Completed group: {group_code} =====\n")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh the indicator store")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--resume", action="store_true",
+                      help="Run the pending units of the last run")
+    mode.add_argument("--only-failed", action="store_true",
+                      help="Retry the failed units of the last run")
+    parser.add_argument("--groups", nargs="+", help="Only these groups' members (default: all)")
+    parser.add_argument("--sources", nargs="+", help="Only these sources (default: all)")
+    parser.add_argument("--indicators", nargs="+", metavar="CODE",
+                        help="Only these indicators and their weight series (default: all)")
+    args = parser.parse_args()
+    unknown = [code for code in args.indicators or [] if code not in indicators]
+    if unknown:
+        parser.error(f"unknown indicators: {', '.join(unknown)}")
 
-print("All indicator data downloads completed successfully!")
+    if args.resume or args.only_failed:
+        manifest = RefreshManifest.load(MANIFEST_PATH)
+        if manifest is None:
+            sys.exit(f"No refresh manifest at {MANIFEST_PATH} to continue from")
+        manifest.run_states = {"failed"} if args.only_failed else {"pending"}
+        run_update(manifest.groups, manifest.sources, manifest, manifest.codes)
+    else:
+        run_update(args.groups, args.sources, codes=args.indicators)
@@ -0,0 +1,174 @@
+"""Pre-extracted CIA World Factbook profile table.
+
+The country profile reads about fifteen text fields from the raw
+Factbook JSON in ``cache/factbook`` (one 10-100 KB file per FIPS code).
+``build_profiles`` extracts just those fields from every file into
+``cache/factbook_profiles.json``, keyed by lower-case FIPS code, with
+``None`` for any field a country's Factbook entry lacks. Files are
+parsed in parallel, and only files whose mtime or size changed since
+the last build are parsed again.
+
+The table is built in a process of its own: ``python warmup.py`` (the
+app's ExecStartPre) and ``python factbook.py`` extract changed files on
+a process pool. Pages call ``get_profile``, which serves the table from
+memory and, every PROFILES_TTL seconds, re-reads the table file and
+re-checks the source file stamps; a file changed since the last build
+is extracted in the serving process itself, without forking a pool
+from the multi-threaded server.
+"""
+
+import concurrent.futures
+import json
+import os
+import time
+
+import singleflight
+from country_registry import get_registry
+
+FACTBOOK_DIR = "./cache/factbook"
+PROFILES_PATH = "./cache/factbook_profiles.json"
+
+# Profile field -> path into the raw Factbook JSON
+PROFILE_FIELDS = {
+    "climate": ("Environment", "Climate", "text"),
+    "environment_agreements": ("Environment", "Environment - international agreements", "party to", "text"),
+    "youth_unemployment": ("Economy", "Youth unemployment rate (ages 15-24)", "total", "text"),
+    "unemployment": ("Economy", "Unemployment rate", "Unemployment rate 2023", "text"),
+    "population_distribution": ("People and Society", "Population distribution", "text"),
+    "education_expenditure": ("People and Society", "Education expenditures", "text"),
+    "internet_users": ("Communications", "Internet users", "percent of population", "text"),
+    "broadband": ("Communications", "Broadband - fixed subscriptions", "subscriptions per 100 inhabitants", "text"),
+    "industries": ("Economy", "Industries", "text"),
+    "agricultural_products": ("Economy", "Agricultural products", "text"),
+    "coordinates": ("Geography", "Geographic coordinates", "text"),
+    "export_partners": ("Economy", "Exports - partners", "text"),
+    "import_partners": ("Economy", "Imports - partners", "text"),
+    "export_commodities": ("Economy", "Exports - commodities", "text"),
+    "import_commodities": ("Economy", "Imports - commodities", "text"),
+}
+
+# Below this many changed files the process pool costs more than it saves
+PARALLEL_THRESHOLD = 16
+# Seconds a serving process uses its table before checking the source files again
+PROFILES_TTL = 300
+
+_table = None
+_checked_at = None
+
+
+def _stamp(path):
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _lookup(data, path):
+    for key in path:
+        if not isinstance(data, dict) or key not in data:
+            return None
+        data = data[key]
+    return data if isinstance(data, str) else None
+
+
+def extract_profile(path):
+    """Return {field: text or None} for one raw Factbook file."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return {field: _lookup(data, keys) for field, keys in PROFILE_FIELDS.items()}
+
+
+def _read_table():
+    try:
+        with open(PROFILES_PATH, "r", encoding="utf-8") as f:
+            table = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    # A change to PROFILE_FIELDS invalidates every extracted row
+    if table.get("fields") != list(PROFILE_FIELDS):
+        return None
+    return table
+
+
+def _write_table(table):
+    tmp = f"{PROFILES_PATH}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(table, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, PROFILES_PATH)
+
+
+def build_profiles(table=None, parallel=True):
+    """Bring the profile table up to date with ``cache/factbook`` and return it.
+
+    Only new or changed source files are parsed, on a process pool when
+    ``parallel`` and there are enough of them; rows for deleted files
+    are dropped. The table is rewritten only when something changed.
+    """
+    if table is None:
+        table = _read_table() or {"fields": list(PROFILE_FIELDS), "sources": {}, "profiles": {}}
+    sources, profiles = table["sources"], table["profiles"]
+
+    current = {}
+    for name in os.listdir(FACTBOOK_DIR):
+        if name.endswith(".json"):
+            current[name[:-5].lower()] = _stamp(os.path.join(FACTBOOK_DIR, name))
+
+    changed = [fips for fips, stamp in current.items() if sources.get(fips) != stamp]
+    removed = [fips for fips in sources if fips not in current]
+    if not changed and not removed:
+        return table
+
+    paths = [os.path.join(FACTBOOK_DIR, f"{fips}.json") for fips in changed]
+    if parallel and len(paths) >= PARALLEL_THRESHOLD:
+        with concurrent.futures.ProcessPoolExecutor() as pool:
+            extracted = list(pool.map(extract_profile, paths, chunksize=8))
+    else:
+        extracted = [extract_profile(p) for p in paths]
+
+    for fips, profile in zip(changed, extracted):
+        profiles[fips] = profile
+        sources[fips] = current[fips]
+    for fips in removed:
+        profiles.pop(fips, None)
+        sources.pop(fips, None)
+
+    _write_table(table)
+    print(f"Factbook profiles: {len(changed)} extracted, {len(removed)} removed, "
+          f"{len(profiles)} total")
+    return table
+
+
+def _load_table():
+    global _table, _checked_at
+    _table = build_profiles(_read_table() or _table, parallel=False)
+    _checked_at = time.monotonic()
+    return _table
+
+
+def _get_table():
+    if _checked_at is not None and time.monotonic() - _checked_at < PROFILES_TTL:
+        return _table
+    # Sessions arriving while the table loads wait for the same load
+    return singleflight.group("factbook").do("profiles", _load_table)
+
+
+def load_profiles():
+    """Return {fips: profile} for every country, loading the table if needed."""
+    return _get_table()["profiles"]
+
+
+def get_profile(fips=None, iso3=None):
+    """Profile fields for a country given its FIPS or ISO3 code.
+
+    Every field in PROFILE_FIELDS is present; fields the Factbook does
+    not have for the country are ``None``. Returns None when there is
+    no Factbook entry at all.
+    """
+    if fips is None and iso3 is not None:
+        country = get_registry().by_iso3.get(iso3)
+        fips = country.fips if country else None
+    if not fips:
+        return None
+    return _get_table()["profiles"].get(fips.lower())
+
+
+if __name__ == "__main__":
+    build_profiles()
@@ -1,6 +1,7 @@
 import os
 import json
 from pathlib import Path
+from country_registry import get_registry
 
 # Load the country codes
 country_codes = []
@@ -20,62 +21,48 @@ def get_groups_from_json_files(directory):
     return groups
 
 def get_group_countries_iso3(group):
-    filename = f"{group}.json"
-    file_path = os.path.join(cache_folder, filename)
-    group_list = load_json_file(file_path)
-    countries = [country['ISO3'] for country in group_list['countries']]
-    names = [country['name'] for country in group_list['countries']]
-    return countries
+    return [country['ISO3'] for country in get_registry().group(group).members]
 
 def get_group_countries_iso2(group):
-    filename = f"{group}.json"
-    file_path = os.path.join(cache_folder, filename)
-    group_list = load_json_file(file_path)
-    countries = [country['ISO'] for country in group_list['countries']]
-    return countries
+    return [country['ISO'] for country in get_registry().group(group).members]
 
 def get_group_countries_name(group):
-    filename = f"{group}.json"
-    file_path = os.path.join(cache_folder, filename)
-    group_list = load_json_file(file_path)
-    countries = [country['name'] for country in group_list['countries']]
-    return countries
+    return list(get_registry().group(group).names)
+
+def get_groups_members(group_codes):
+    """Members of every group in group_codes, de-duplicated by ISO3 (first seen wins)."""
+    registry = get_registry()
+    members = {}
+    for group in group_codes:
+        for country in registry.group(group).members:
+            if country.get('ISO3'):
+                members.setdefault(country['ISO3'], dict(country))
+    return list(members.values())
+
+def is_group_member(iso3, group):
+    return iso3 in get_registry().group(group).iso3s
 
 def get_iso3_from_name(name, group):
-    filename = f"{group}.json"
-    file_path = os.path.join(cache_folder, filename)
-    group_list = load_json_file(file_path)
-    iso3 = [country['ISO3'] for country in group_list['countries'] if country['name'] == name]
-    return iso3[0] if iso3 else None
+    return get_registry().group(group).iso3_by_name.get(name)
 
 def get_iso2_from_name(name):
-    for country in country_codes:
-        if country['NAME.EN'] == name:
-            return country['ISO_3166_2']
-    return None
+    country = get_registry().by_name.get(name)
+    return country.iso2 if country else None
 
 def get_name_from_iso3(iso3):
-    for country in country_codes:
-        if country['ISO_3166_3'] == iso3:
-            return country['NAME.EN']
-    return None
+    country = get_registry().by_iso3.get(iso3)
+    return country.name if country else None
 
 def get_fips_from_iso3(iso3):
-    for country in country_codes:
-        if country['ISO_3166_3'] == iso3:
-            return country['FIPS_GEC']
-    return None
+    country = get_registry().by_iso3.get(iso3)
+    return country.fips if country else None
 
 def get_iso3_from_fips(fips):
-    for country in country_codes:
-        if country['FIPS_GEC'] == fips:
-            return country['ISO_3166_3']
-    return None
+    country = get_registry().by_fips.get(fips)
+    return country.iso3 if country else None
 
 def load_country_codes():
-    with open('cache/Countrycodesfull.json', 'r', encoding='utf-8') as f:
-        country_codes = json.load(f)
-    return country_codes
+    return [dict(entry) for entry in get_registry().entries]
 
 def load_group_metadata(group: str) -> dict:
     path = Path("cache/groups") / f"{group.lower()}.json"
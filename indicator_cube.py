@@ -0,0 +1,191 @@
+"""Memory-mapped indicator × country × year cube.
+
+Built once at ingest from the columnar store and opened read-only with
+``numpy.memmap`` by every serving process, so all Streamlit workers
+share the OS page cache instead of each holding its own DataFrames.
+Missing observations are NaN.
+
+The axes (indicator codes, ISO3 codes, years), the name of the data
+file and the store file stamp of every indicator at build time (see
+indicator_store.file_stamp) are kept in ``cube.json``; an indicator
+whose store file changed after the build is reported as stale so
+callers can fall back to the store. Both files
+live in the store generation (see indicator_store), so a refresh
+publishes its cube together with its data.
+
+Rebuild with:
+
+    python indicator_cube.py
+"""
+
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+import indicator_store
+
+AXES_FILE = "cube.json"
+
+_lock = threading.Lock()
+_cube = None
+
+
+class IndicatorCube:
+    """Read-only view over a cube file and its axes."""
+
+    def __init__(self, axes, data):
+        self.indicators = axes["indicators"]
+        self.countries = axes["countries"]
+        self.years = np.asarray(axes["years"], dtype=np.int16)
+        # JSON turns the (mtime_ns, size) stamps into lists
+        self.revisions = {
+            code: tuple(stamp) if isinstance(stamp, list) else stamp
+            for code, stamp in axes["revisions"].items()
+        }
+        self.data = data
+        self._indicator_pos = {code: i for i, code in enumerate(self.indicators)}
+        self._country_pos = {iso3: i for i, iso3 in enumerate(self.countries)}
+
+    def has(self, indicator_code):
+        """True when the indicator is in the cube and its store file is unchanged."""
+        if indicator_code not in self._indicator_pos:
+            return False
+        return indicator_store.file_stamp(indicator_code) == self.revisions[indicator_code]
+
+    def plane(self, indicator_code):
+        """Return the (country, year) array for one indicator."""
+        return self.data[self._indicator_pos[indicator_code]]
+
+    def values(self, indicator_code, iso3s, years):
+        """Values of one indicator at the given (ISO3, year) cells; NaN off the axes."""
+        rows = np.array([self._country_pos.get(c, -1) for c in iso3s], dtype=np.int64)
+        cols = np.asarray(years, dtype=np.int64) - (int(self.years[0]) if len(self.years) else 0)
+        inside = (rows >= 0) & (cols >= 0) & (cols < len(self.years))
+        out = np.full(len(rows), np.nan)
+        out[inside] = self.plane(indicator_code)[rows[inside], cols[inside]]
+        return out
+
+    def country_series(self, indicator_code, iso3):
+        """(years, values) of one country's observations, empty if it is not on the axis."""
+        if iso3 not in self._country_pos:
+            return self.years[:0], np.empty(0)
+        row = np.asarray(self.plane(indicator_code)[self._country_pos[iso3]])
+        present = ~np.isnan(row)
+        return self.years[present], row[present]
+
+    def country_mask(self, iso3s):
+        """Boolean mask over the country axis selecting ``iso3s``."""
+        mask = np.zeros(len(self.countries), dtype=bool)
+        idx = [self._country_pos[c] for c in iso3s if c in self._country_pos]
+        mask[idx] = True
+        return mask
+
+
+def build_cube(indicator_codes=None):
+    """Write the cube for ``indicator_codes`` (default: every stored indicator).
+
+    Each build writes a new data file and then swaps ``cube.json`` to
+    point at it, so processes that still map the previous cube keep a
+    consistent view; older data files are unlinked afterwards.
+    """
+    store_dir = indicator_store.store_dir()
+    if indicator_codes is None:
+        indicator_codes = sorted(
+            f[: -len(".parquet")]
+            for f in os.listdir(store_dir)
+            if f.endswith(".parquet")
+        )
+
+    frames = {}
+    revisions = {}
+    for code in indicator_codes:
+        revisions[code] = indicator_store.file_stamp(code)
+        df = indicator_store.read_frame(code)
+        if df is not None and not df.empty:
+            frames[code] = df
+    indicator_codes = list(frames)
+
+    countries = sorted({iso3 for df in frames.values() for iso3 in df["country_iso3"]})
+    if frames:
+        first = min(int(df["date"].min()) for df in frames.values())
+        last = max(int(df["date"].max()) for df in frames.values())
+        years = list(range(first, last + 1))
+    else:
+        years = []
+    country_pos = {iso3: i for i, iso3 in enumerate(countries)}
+
+    shape = (len(indicator_codes), len(countries), len(years))
+    data_file = f"cube.{time.time_ns()}.f64"
+    if all(shape):
+        data_path = os.path.join(store_dir, data_file)
+        data = np.memmap(data_path, dtype=np.float64, mode="w+", shape=shape)
+        data[:] = np.nan
+        for i, code in enumerate(indicator_codes):
+            df = frames[code]
+            # Through str: the shared categorical dtype also holds
+            # countries with no rows, which are not on the axis
+            rows = df["country_iso3"].astype(str).map(country_pos).to_numpy()
+            cols = df["date"].to_numpy(dtype=np.int64) - years[0]
+            data[i, rows, cols] = df["value"].to_numpy(dtype=np.float64)
+        data.flush()
+        del data
+
+    axes = {
+        "data_file": data_file,
+        "indicators": indicator_codes,
+        "countries": countries,
+        "years": years,
+        "shape": list(shape),
+        "revisions": {code: revisions[code] for code in indicator_codes},
+    }
+    def write(tmp):
+        with open(tmp, "w") as f:
+            json.dump(axes, f)
+    indicator_store.replace_atomic(os.path.join(store_dir, AXES_FILE), write)
+
+    # Removes this generation's links only; a previous generation that
+    # still lists a data file keeps it
+    for f in os.listdir(store_dir):
+        if f.startswith("cube.") and f.endswith(".f64") and f != data_file:
+            os.remove(os.path.join(store_dir, f))
+    return shape
+
+
+def open_cube():
+    """Return the shared IndicatorCube, or None if no cube has been built.
+
+    The mapping is reopened when ``cube.json`` changes, i.e. after a
+    rebuild or when another store generation is published.
+    """
+    global _cube
+    # Resolve the generation once, so the axes and the data file it
+    # names come from the same one even if a swap happens meanwhile
+    store_dir = os.path.realpath(indicator_store.store_dir())
+    axes_path = os.path.join(store_dir, AXES_FILE)
+    try:
+        st = os.stat(axes_path)
+    except OSError:
+        return None
+    key = (store_dir, st.st_ino, st.st_mtime_ns)
+    with _lock:
+        if _cube is None or _cube[0] != key:
+            with open(axes_path, "r") as f:
+                axes = json.load(f)
+            shape = tuple(axes["shape"])
+            if not all(shape):
+                return None
+            data_path = os.path.join(store_dir, axes["data_file"])
+            data = np.memmap(data_path, dtype=np.float64, mode="r", shape=shape)
+            _cube = (key, IndicatorCube(axes, data))
+        return _cube[1]
+
+
+if __name__ == "__main__":
+    # Rebuilt in a staged generation, so readers of the current one keep
+    # their cube until the new one is published
+    with indicator_store.staged_generation() as generation:
+        shape = build_cube()
+        print(f"Built cube {shape} (indicators, countries, years) in {generation}")
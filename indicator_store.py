@@ -0,0 +1,847 @@
+"""Columnar on-disk store for indicator data.
+
+Replaces the per-file ``{indicator}_{group}.json`` caches, which repeat
+the full ``indicator`` and ``country`` dicts on every record, with one
+Parquet file per indicator keyed on (country ISO3, year). Group
+membership is not stored: a group read is a filtered read over the
+group's ISO3 codes, so countries that belong to several groups are
+fetched and stored once.
+
+Country and indicator columns are dictionary-encoded, years are typed
+ints and values are float64. Country ISO2 codes and names live once in
+a small dimension file (``countries.json``). Source metadata and the
+set of countries covered by the last fetches travel in the Parquet
+schema metadata.
+
+The store is published in generations. ``cache/store/current`` is a
+symlink to one directory under ``cache/store/generations``, and
+readers go through it. A refresh stages a new generation (see
+``staged_generation``): it starts as hard links to the current files,
+every write replaces a file by atomic rename, and the finished
+generation, cube included, is published by swapping the symlink. A
+reader therefore sees either the previous generation or the new one in
+full, never a half-written file or a half-finished refresh. The cube
+and the materialized aggregates derived from the data live in the
+generation too, so they are published and rolled back with it.
+
+Convert an existing JSON cache with:
+
+    python indicator_store.py migrate
+"""
+
+import argparse
+import collections
+import contextlib
+import datetime
+import fcntl
+import hashlib
+import json
+import math
+import os
+import shutil
+import threading
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from country_registry import get_registry
+from indicators_data import indicators
+
+STORE_DIR = "./cache/store"
+GENERATIONS_DIR = os.path.join(STORE_DIR, "generations")
+CURRENT_PATH = os.path.join(STORE_DIR, "current")
+STAGING_PATH = os.path.join(STORE_DIR, "staging.json")
+LOCK_PATH = os.path.join(STORE_DIR, ".lock")
+MANIFEST_FILE = "manifest.json"
+# Published generations kept on disk: the current one and the one
+# before it, which readers that resolved it before the swap may still open
+KEEP_GENERATIONS = 2
+LEGACY_CACHE_DIR = "./cache/indicators"
+GROUPS_DIR = "./cache/groups"
+
+_META_KEY = b"landlinked"
+
+SCHEMA = pa.schema([
+    ("indicator_id", pa.dictionary(pa.int16(), pa.string())),
+    ("country_iso3", pa.dictionary(pa.int16(), pa.string())),
+    ("date", pa.int16()),
+    ("value", pa.float64()),
+])
+
+COLUMNS = [field.name for field in SCHEMA]
+
+# Guards the read-modify-write of a single indicator file
+_indicator_locks = collections.defaultdict(threading.Lock)
+_countries_lock = threading.Lock()
+_countries = None  # ((path, inode, mtime_ns), {iso3: info})
+_manifest_lock = threading.RLock()
+_manifest = None  # ((path, inode, mtime_ns), {indicator: entry})
+# Generation directory this process is staging, see staged_generation
+_staging = None
+_generations_lock = threading.Lock()
+
+# What one write changed: rows of (country_iso3, date, old_value,
+# new_value), NaN marking a missing side, plus the store file's stamp
+# (see file_stamp) before and after the write so consumers can check
+# they saw every write.
+ChangeSet = collections.namedtuple(
+    "ChangeSet", ["indicator", "previous_revision", "revision", "rows"]
+)
+CHANGE_COLUMNS = ["country_iso3", "date", "old_value", "new_value"]
+
+
+def store_dir():
+    """Directory this process reads and writes store files in.
+
+    The staging generation while this process stages one, otherwise the
+    ``current`` symlink (resolved by the OS on every open, so a swap is
+    seen at once), or STORE_DIR itself for a store from before
+    generations.
+    """
+    if _staging is not None:
+        return _staging
+    if os.path.islink(CURRENT_PATH):
+        return CURRENT_PATH
+    return STORE_DIR
+
+
+def store_path(indicator_code):
+    return os.path.join(store_dir(), f"{indicator_code}.parquet")
+
+
+def replace_atomic(path, write):
+    """Call ``write(tmp_path)`` and rename the result over ``path``.
+
+    The temporary name is unique to the process and thread, so
+    concurrent writers of the same file never clobber each other's.
+    """
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp)
+        raise
+
+
+def _file_key(path):
+    """(path, inode, mtime_ns) of a file, which changes when it is
+    replaced; inode and mtime are None when it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return (path, None, None)
+    return (path, st.st_ino, st.st_mtime_ns)
+
+
+def exists(indicator_code):
+    return os.path.exists(store_path(indicator_code))
+
+
+def modified_time(indicator_code):
+    """Return the store file's mtime, or None if it has not been written."""
+    try:
+        return os.path.getmtime(store_path(indicator_code))
+    except OSError:
+        return None
+
+
+def file_stamp(indicator_code):
+    """Return the store file's (mtime_ns, size), or None if it has not been written.
+
+    Cache keys use this rather than modified_time so a rewrite within
+    the filesystem's mtime resolution still changes the key.
+    """
+    try:
+        st = os.stat(store_path(indicator_code))
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+# ───────────────────────────────── Country dimension ─────────────────────────
+def _countries_path():
+    return os.path.join(store_dir(), "countries.json")
+
+
+def load_countries():
+    """Return {iso3: {'iso2': str, 'name': str}} for every stored country.
+
+    The file is re-read when it is replaced, so readers see countries
+    added by a write or a published generation.
+    """
+    global _countries
+    path = _countries_path()
+    key = _file_key(path)
+    with _countries_lock:
+        if _countries is None or _countries[0] != key:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    countries = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                countries = {}
+            _countries = (key, countries)
+        return _countries[1]
+
+
+def _register_countries(entries):
+    """Add unseen ISO3 codes to the country dimension file."""
+    global _countries
+    load_countries()
+    with _countries_lock:
+        countries = _countries[1]
+        new = {
+            iso3: info for iso3, info in entries.items()
+            if iso3 and iso3 not in countries
+        }
+        if not new:
+            return
+        countries = {**countries, **new}
+        os.makedirs(store_dir(), exist_ok=True)
+
+        def write(tmp):
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(countries, f, ensure_ascii=False, indent=1, sort_keys=True)
+        path = _countries_path()
+        replace_atomic(path, write)
+        _countries = (_file_key(path), countries)
+
+
+# Categories of the country columns, shared by every frame read_frame
+# returns so merges, concats and pivots across indicators stay
+# categorical. Categories are only ever appended, so codes are stable
+# for the life of the process.
+_country_categories = {"country_iso3": [], "country_id": [""], "country_name": [""]}
+_country_dtypes = {}
+_country_dtypes_lock = threading.Lock()
+
+
+def country_dtypes(iso3s=()):
+    """Return the shared categorical dtypes of the three country columns.
+
+    Countries of the dimension file, and any ISO3 codes in ``iso3s`` it
+    does not hold, are added to the dictionary first.
+    """
+    countries = load_countries()
+    values = {
+        "country_iso3": set(countries).union(iso3s),
+        "country_id": {info.get("iso2", "") for info in countries.values()},
+        "country_name": {info.get("name", "") for info in countries.values()},
+    }
+    with _country_dtypes_lock:
+        for column, wanted in values.items():
+            categories = _country_categories[column]
+            new = wanted.difference(categories)
+            if new or column not in _country_dtypes:
+                categories.extend(sorted(new))
+                _country_dtypes[column] = pd.CategoricalDtype(list(categories))
+        return dict(_country_dtypes)
+
+
+# ───────────────────────────────── Conversion ────────────────────────────────
+def records_to_frame(records):
+    """Flatten World Bank-style records into typed store columns.
+
+    Returns (frame, countries) where countries maps ISO3 to the ISO2 code
+    and name found in the records. Some World Bank databases (e.g. source
+    11, Africa Development Indicators) leave ``countryiso3code`` empty and
+    put the ISO3 code in ``country.id``; it is taken from there. Records
+    still without an ISO3 code, or without a numeric value or a parseable
+    year, are dropped since the store is keyed on them.
+    """
+    rows = []
+    countries = {}
+    for rec in records or []:
+        country = rec.get("country") or {}
+        iso2 = country.get("id") or ""
+        iso3 = rec.get("countryiso3code") or ""
+        if not iso3 and len(iso2) == 3 and iso2.isalpha():
+            iso3 = iso2.upper()
+            known = get_registry().by_iso3.get(iso3)
+            iso2 = known.iso2 if known else ""
+        value = rec.get("value")
+        if not iso3 or value is None:
+            continue
+        try:
+            value = float(value)
+            year = int(str(rec.get("date", ""))[:4])
+        except (TypeError, ValueError):
+            continue
+        if math.isnan(value):
+            continue
+        if iso3 not in countries:
+            countries[iso3] = {
+                "iso2": iso2,
+                "name": country.get("value", ""),
+            }
+        rows.append((
+            (rec.get("indicator") or {}).get("id", ""),
+            iso3,
+            year,
+            value,
+        ))
+    df = pd.DataFrame.from_records(rows, columns=COLUMNS)
+    return df.astype({"date": "int16", "value": "float64"}), countries
+
+
+def frame_to_records(df, indicator_code, indicator_name=""):
+    """Rebuild World Bank-style records from a store frame."""
+    return [
+        {
+            "indicator": {"id": indicator_code, "value": indicator_name},
+            "country": {"id": iso2, "value": name},
+            "countryiso3code": iso3,
+            "date": str(date),
+            "value": value,
+            "unit": "",
+            "obs_status": "",
+            "decimal": 0,
+        }
+        for iso3, iso2, name, date, value in zip(
+            df["country_iso3"], df["country_id"], df["country_name"],
+            df["date"], df["value"],
+        )
+    ]
+
+
+def _indicator_name(records):
+    for rec in records or []:
+        name = (rec.get("indicator") or {}).get("value")
+        if name:
+            return name
+    return ""
+
+
+# ───────────────────────────────── Write / read ──────────────────────────────
+def _write_table(indicator_code, df, meta):
+    table = pa.Table.from_pandas(df, schema=SCHEMA, preserve_index=False)
+    table = table.replace_schema_metadata({_META_KEY: json.dumps(meta)})
+    os.makedirs(store_dir(), exist_ok=True)
+    replace_atomic(store_path(indicator_code), lambda tmp: pq.write_table(table, tmp))
+
+
+def _diff_rows(old_df, new_df):
+    """Return the CHANGE_COLUMNS rows whose value differs between two frames."""
+    keys = ["country_iso3", "date"]
+    merged = pd.merge(
+        old_df[keys + ["value"]].rename(columns={"value": "old_value"}),
+        new_df[keys + ["value"]].rename(columns={"value": "new_value"}),
+        on=keys, how="outer",
+    )
+    changed = merged["old_value"].ne(merged["new_value"])
+    return merged[changed].reset_index(drop=True)[CHANGE_COLUMNS]
+
+
+def write_indicator(indicator_code, data, countries, source_version=None, fetch_seconds=None):
+    """Upsert a ``[metadata, records]`` fetch result into the store.
+
+    ``countries`` is the list of ISO3 codes the fetch covered. Their
+    existing rows are replaced by the new ones (a covered country with no
+    new rows had its data withdrawn upstream); rows for other countries
+    are kept. ``source_version`` is the upstream version token the
+    fetch was made against (see DataSourcePlugin.probe_version), and
+    ``fetch_seconds`` how long the fetch took; both go to the manifest.
+    Returns the ChangeSet of the write.
+    """
+    metadata, records = data[0], data[1]
+    new_df, new_countries = records_to_frame(records)
+    covered = set(countries) | set(new_df["country_iso3"])
+    _register_countries(new_countries)
+
+    with _indicator_locks[indicator_code]:
+        previous_revision = file_stamp(indicator_code)
+        meta = read_metadata(indicator_code) or {}
+        old_df = _read_table(indicator_code)
+        if old_df is not None:
+            changes = _diff_rows(old_df[old_df["country_iso3"].isin(covered)], new_df)
+            old_df = old_df[~old_df["country_iso3"].isin(covered)]
+            new_df = pd.concat([old_df, new_df], ignore_index=True)
+        else:
+            changes = _diff_rows(new_df.iloc[:0], new_df)
+        new_df = new_df.sort_values(["country_iso3", "date"], ignore_index=True)
+
+        now = datetime.datetime.now()
+        meta = {
+            "metadata": metadata or {},
+            "indicator_name": _indicator_name(records) or meta.get("indicator_name", ""),
+            "countries": sorted(covered | set(meta.get("countries", []))),
+            "fetched_at": now.isoformat(timespec="seconds"),
+            "source_version": source_version,
+        }
+        _write_table(indicator_code, new_df, meta)
+        revision = file_stamp(indicator_code)
+        _update_manifest(indicator_code, _manifest_entry(
+            indicator_code, new_df, meta, now.timestamp(), fetch_seconds=fetch_seconds
+        ))
+    return ChangeSet(indicator_code, previous_revision, revision, changes)
+
+
+def covers(indicator_code, countries):
+    """True when the indicator's fetches covered every ISO3 code in ``countries``."""
+    entry = manifest_entry(indicator_code)
+    return entry is not None and set(countries) <= set(entry["countries"])
+
+
+def stored_version(indicator_code):
+    """Upstream version token of the stored data, or None.
+
+    Falls back to the ``lastupdated`` of the stored source metadata, which
+    World Bank responses carry.
+    """
+    entry = manifest_entry(indicator_code)
+    return entry["source_version"] if entry else None
+
+
+# ───────────────────────────────── Manifest ──────────────────────────────────
+def _manifest_path():
+    return os.path.join(store_dir(), MANIFEST_FILE)
+
+
+def _content_hash(df):
+    """sha1 over the (country, year, value) rows, independent of file metadata."""
+    hashed = pd.util.hash_pandas_object(df[["country_iso3", "date", "value"]], index=False)
+    return hashlib.sha1(hashed.to_numpy().tobytes()).hexdigest()
+
+
+def _timestamp(iso, default):
+    try:
+        return datetime.datetime.fromisoformat(iso).timestamp()
+    except (TypeError, ValueError):
+        return default
+
+
+def _manifest_entry(indicator_code, df, meta, fetched_at, verified_at=None, fetch_seconds=None):
+    st = os.stat(store_path(indicator_code))
+    return {
+        "source": indicators.get(indicator_code, {}).get("source", ""),
+        "countries": meta.get("countries", []),
+        "rows": len(df),
+        "bytes": st.st_size,
+        "stamp": [st.st_mtime_ns, st.st_size],
+        "fetched_at": fetched_at,
+        "verified_at": max(fetched_at, verified_at or 0),
+        "source_version": (meta.get("source_version")
+                           or (meta.get("metadata") or {}).get("lastupdated") or None),
+        "hash": _content_hash(df),
+        "fetch_seconds": fetch_seconds,
+    }
+
+
+def _scan_manifest():
+    """Build the manifest entries from the store files themselves.
+
+    Used once for a store written before the manifest existed.
+    """
+    entries = {}
+    for filename in sorted(os.listdir(store_dir())) if os.path.isdir(store_dir()) else []:
+        if not filename.endswith(".parquet"):
+            continue
+        code = filename[: -len(".parquet")]
+        meta = read_metadata(code) or {}
+        mtime = modified_time(code)
+        entries[code] = _manifest_entry(code, _read_table(code), meta,
+                                        _timestamp(meta.get("fetched_at"), mtime), mtime)
+    return entries
+
+
+def _load_manifest():
+    """Return {indicator: entry} for this process's store generation.
+
+    The file is re-read when it is replaced, so readers follow writers
+    and generation swaps with one stat per lookup.
+    """
+    global _manifest
+    path = _manifest_path()
+    key = _file_key(path)
+    with _manifest_lock:
+        if _manifest is None or _manifest[0] != key:
+            entries = None
+            if key[1] is not None:
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        entries = json.load(f)["entries"]
+                except (OSError, json.JSONDecodeError, KeyError):
+                    pass
+            if entries is None:
+                entries = _scan_manifest()
+                if _staging is not None:
+                    key = _save_manifest(entries)
+            _manifest = (key, entries)
+        return _manifest[1]
+
+
+def _save_manifest(entries):
+    os.makedirs(store_dir(), exist_ok=True)
+    path = _manifest_path()
+
+    def write(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"entries": entries}, f, separators=(",", ":"))
+    replace_atomic(path, write)
+    return _file_key(path)
+
+
+def _update_manifest(indicator_code, entry):
+    global _manifest
+    with _manifest_lock:
+        # Copy on write: other threads may be iterating the old dict
+        entries = {**_load_manifest(), indicator_code: entry}
+        _manifest = (_save_manifest(entries), entries)
+
+
+def manifest_entries():
+    """{indicator: entry} for every stored indicator.
+
+    An entry holds the indicator's ``source``, the ISO3 ``countries``
+    its fetches covered, its ``rows`` and file ``bytes``, the file
+    ``stamp`` (mtime_ns, size), ``fetched_at`` and ``verified_at``
+    (epoch seconds), the upstream ``source_version``, a content ``hash``
+    of its rows and the last ``fetch_seconds``. Do not modify it.
+    """
+    return _load_manifest()
+
+
+def manifest_entry(indicator_code):
+    return _load_manifest().get(indicator_code)
+
+
+def manifest_frame():
+    """The manifest as a DataFrame, one row per indicator, without the country lists."""
+    entries = _load_manifest()
+    df = pd.DataFrame.from_records(
+        [{"indicator": code, **{k: v for k, v in e.items() if k not in ("countries", "stamp")}}
+         for code, e in entries.items()],
+        columns=["indicator", "source", "rows", "bytes", "fetched_at", "verified_at",
+                 "source_version", "hash", "fetch_seconds"],
+    )
+    df["age_days"] = (time.time() - df["verified_at"]) / 86400
+    return df
+
+
+def manifest_summary(max_age_days=30):
+    """Per-source breakdown of the manifest: indicators, rows, MB and
+    how many were verified within a week, within ``max_age_days`` or
+    longer ago (stale), with the oldest verification and the mean fetch
+    time."""
+    df = manifest_frame()
+    df["fresh"] = df["age_days"] <= 7
+    df["aging"] = (df["age_days"] > 7) & (df["age_days"] <= max_age_days)
+    df["stale"] = df["age_days"] > max_age_days
+    summary = df.groupby("source").agg(
+        indicators=("indicator", "count"),
+        rows=("rows", "sum"),
+        bytes=("bytes", "sum"),
+        fresh=("fresh", "sum"),
+        aging=("aging", "sum"),
+        stale=("stale", "sum"),
+        oldest_verified=("verified_at", "min"),
+        mean_fetch_seconds=("fetch_seconds", "mean"),
+    ).reset_index()
+    summary["MB"] = (summary.pop("bytes") / 1024 / 1024).round(2)
+    summary["oldest_verified"] = pd.to_datetime(summary["oldest_verified"], unit="s").dt.floor("min")
+    summary["mean_fetch_seconds"] = summary["mean_fetch_seconds"].round(2)
+    return summary
+
+
+def mark_verified(indicator_code):
+    """Record that the stored data was confirmed current upstream just now.
+
+    Kept in the manifest rather than by rewriting or touching the Parquet
+    file, whose stamp is the revision the cube and aggregate table key on.
+    """
+    entry = manifest_entry(indicator_code)
+    if entry is not None:
+        _update_manifest(indicator_code, {**entry, "verified_at": time.time()})
+
+
+def verified_time(indicator_code):
+    """Last time the data was written or confirmed current, or None."""
+    entry = manifest_entry(indicator_code)
+    return entry["verified_at"] if entry else None
+
+
+def is_fresh(indicator_code, countries, max_age_days):
+    """True when the indicator was written or verified within
+    ``max_age_days`` and its last fetches covered every ISO3 code in
+    ``countries``."""
+    checked = verified_time(indicator_code)
+    if checked is None:
+        return False
+    checked = datetime.datetime.fromtimestamp(checked)
+    if (datetime.datetime.now() - checked).days > max_age_days:
+        return False
+    return covers(indicator_code, countries)
+
+
+def read_metadata(indicator_code):
+    """Return the stored metadata dict, or None if absent."""
+    path = store_path(indicator_code)
+    if not os.path.exists(path):
+        return None
+    schema_meta = pq.read_schema(path).metadata or {}
+    return json.loads(schema_meta.get(_META_KEY, b"{}"))
+
+
+def _read_table(indicator_code, iso3s=None):
+    path = store_path(indicator_code)
+    if not os.path.exists(path):
+        return None
+    filters = None
+    if iso3s is not None:
+        filters = [("country_iso3", "in", list(iso3s))]
+    df = pq.read_table(path, filters=filters).to_pandas()
+    for col in ("indicator_id", "country_iso3"):
+        df[col] = df[col].astype(str)
+    return df
+
+
+def read_frame(indicator_code, iso3s=None):
+    """Return the stored rows as a DataFrame, or None if absent.
+
+    ``iso3s`` restricts the read to those countries. ISO2 codes and
+    names are joined from the country dimension. The three country
+    columns are categoricals over the shared dictionary (see
+    country_dtypes), ``date`` is int16 and ``value`` float64.
+    """
+    df = _read_table(indicator_code, iso3s)
+    if df is None:
+        return None
+    return add_country_columns(df)
+
+
+def add_country_columns(df):
+    """Join ``country_id`` (ISO2) and ``country_name`` onto a frame with ``country_iso3``.
+
+    All three columns come back as shared-dictionary categoricals.
+    """
+    dtypes = country_dtypes(df["country_iso3"].unique())
+    countries = load_countries()
+    iso3 = df["country_iso3"].astype(dtypes["country_iso3"])
+    df["country_iso3"] = iso3
+    # Map the (few) categories rather than every row
+    for column, field in (("country_id", "iso2"), ("country_name", "name")):
+        lookup = {code: countries.get(code, {}).get(field, "") for code in iso3.cat.categories}
+        df[column] = iso3.map(lookup).astype(dtypes[column])
+    return df
+
+
+def read_records(indicator_code, iso3s=None):
+    """Return stored data in the legacy ``[metadata, records]`` format."""
+    df = read_frame(indicator_code, iso3s)
+    if df is None:
+        return None
+    meta = read_metadata(indicator_code) or {}
+    records = frame_to_records(df, indicator_code, meta.get("indicator_name", ""))
+    return [meta.get("metadata", {}), records]
+
+
+# ───────────────────────────────── Generations ───────────────────────────────
+def current_generation():
+    """Name of the published generation, or None before the first one."""
+    try:
+        return os.path.basename(os.readlink(CURRENT_PATH))
+    except OSError:
+        return None
+
+
+def _read_staging():
+    try:
+        with open(STAGING_PATH, "r") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def _store_files(directory):
+    """Names of the data files in a generation directory (or in the flat layout)."""
+    return [
+        name for name in os.listdir(directory)
+        # Indicators, dimension and manifest, cube, aggregate table
+        if name.endswith((".parquet", ".json", ".f64", ".pq"))
+        and name != os.path.basename(STAGING_PATH)
+        and os.path.isfile(os.path.join(directory, name))
+    ]
+
+
+def _new_generation():
+    """Create a generation directory holding hard links to the current files."""
+    name = f"g{time.time_ns()}"
+    path = os.path.join(GENERATIONS_DIR, name)
+    os.makedirs(path)
+    base = os.path.realpath(CURRENT_PATH if os.path.islink(CURRENT_PATH) else STORE_DIR)
+    for filename in _store_files(base):
+        os.link(os.path.join(base, filename), os.path.join(path, filename))
+    return name, path
+
+
+def _publish(name):
+    tmp = f"{CURRENT_PATH}.{os.getpid()}.tmp"
+    os.symlink(os.path.join("generations", name), tmp)
+    os.replace(tmp, CURRENT_PATH)
+
+
+def _collect_garbage():
+    """Delete all but the newest KEEP_GENERATIONS generations, and the
+    flat-layout files the first generation was linked from."""
+    current = current_generation()
+    names = sorted(os.listdir(GENERATIONS_DIR))  # g<time_ns>, oldest first
+    keep = set(names[-KEEP_GENERATIONS:]) | {current}
+    for name in names:
+        if name not in keep:
+            shutil.rmtree(os.path.join(GENERATIONS_DIR, name), ignore_errors=True)
+    for filename in _store_files(STORE_DIR):
+        with contextlib.suppress(OSError):
+            os.remove(os.path.join(STORE_DIR, filename))
+
+
+@contextlib.contextmanager
+def _store_lock():
+    os.makedirs(STORE_DIR, exist_ok=True)
+    with open(LOCK_PATH, "a") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise RuntimeError("Another process is staging a store generation") from None
+        yield
+
+
+@contextlib.contextmanager
+def staged_generation():
+    """Stage a new store generation and publish it when the block ends.
+
+    Inside the block every store read and write of this process goes
+    to the staging directory; readers elsewhere keep the current
+    generation. Leaving the block normally publishes the staged one with
+    a single symlink swap. An exception leaves it staged, and the next
+    call continues it unless another generation was published in the
+    meantime, so a resumed refresh keeps what it already wrote. Yields
+    the generation's name.
+    """
+    global _staging, _countries, _manifest
+    with _store_lock():
+        with _generations_lock:
+            base = current_generation()
+            staging = _read_staging()
+            if (staging and staging.get("base") == base
+                    and os.path.isdir(os.path.join(GENERATIONS_DIR, staging["generation"]))):
+                name = staging["generation"]
+                path = os.path.join(GENERATIONS_DIR, name)
+                print(f"Continuing staged store generation {name}")
+            else:
+                name, path = _new_generation()
+
+                def write(tmp):
+                    with open(tmp, "w") as f:
+                        json.dump({"generation": name, "base": base}, f)
+                replace_atomic(STAGING_PATH, write)
+            # The process caches belong to the generation they were read from
+            _staging, _countries, _manifest = path, None, None
+        try:
+            yield name
+        finally:
+            with _generations_lock:
+                _staging, _countries, _manifest = None, None, None
+        _publish(name)
+        os.remove(STAGING_PATH)
+        _collect_garbage()
+        print(f"Published store generation {name}")
+
+
+def clear_store():
+    """Publish an empty generation.
+
+    Readers move to it on their next read; the files of the previous
+    generation stay on disk until garbage collection, so nothing is
+    deleted from under a reader.
+    """
+    with staged_generation() as name:
+        for filename in _store_files(_staging):
+            os.remove(os.path.join(_staging, filename))
+    return name
+
+
+# ───────────────────────────────── Migration ─────────────────────────────────
+def _group_iso3s(group_code):
+    path = os.path.join(GROUPS_DIR, f"{group_code}.json")
+    try:
+        with open(path, "r") as f:
+            group = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return []
+    return [c["ISO3"] for c in group.get("countries", group.get("names", [])) if c.get("ISO3")]
+
+
+def migrate_json_cache(src_dir=LEGACY_CACHE_DIR):
+    """Convert every ``{indicator}_{group}.json`` in ``src_dir`` to the store.
+
+    Group files of the same indicator are merged; overlapping
+    country-years are stored once. Returns (indicators, files, skipped).
+    """
+    by_indicator = collections.defaultdict(list)
+    skipped = 0
+    for filename in sorted(os.listdir(src_dir)):
+        if not filename.endswith(".json"):
+            continue
+        indicator_code, _, group_code = filename[: -len(".json")].rpartition("_")
+        if not indicator_code or not group_code:
+            skipped += 1
+            continue
+        by_indicator[indicator_code].append((group_code, filename))
+
+    files = 0
+    for indicator_code, entries in by_indicator.items():
+        metadata, records, covered = {}, [], set()
+        for group_code, filename in entries:
+            try:
+                with open(os.path.join(src_dir, filename), "r") as f:
+                    data = json.load(f)
+                # Prefer metadata that carries an upstream lastupdated
+                if not metadata.get("lastupdated"):
+                    metadata = data[0] or metadata
+                records.extend(data[1] or [])
+                covered.update(_group_iso3s(group_code))
+                files += 1
+            except (json.JSONDecodeError, IndexError, TypeError, ValueError) as e:
+                print(f"  ! {filename}: {e}")
+                skipped += 1
+
+        df, countries = records_to_frame(records)
+        _register_countries(countries)
+        df = (df.drop_duplicates(["country_iso3", "date"], keep="last")
+                .sort_values(["country_iso3", "date"], ignore_index=True))
+        now = datetime.datetime.now()
+        meta = {
+            "metadata": metadata,
+            "indicator_name": _indicator_name(records),
+            "countries": sorted(covered | set(df["country_iso3"])),
+            "fetched_at": now.isoformat(timespec="seconds"),
+        }
+        _write_table(indicator_code, df, meta)
+        _update_manifest(indicator_code, _manifest_entry(indicator_code, df, meta, now.timestamp()))
+    return len(by_indicator), files, skipped
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Indicator store utilities")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate = sub.add_parser("migrate", help="Convert the legacy JSON cache")
+    migrate.add_argument("--src", default=LEGACY_CACHE_DIR)
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        # Go through the imported module: indicator_cube reads the staging
+        # directory from it, not from this __main__ copy
+        import indicator_store
+        from indicator_cube import build_cube
+
+        from aggregates import materialize
+
+        with indicator_store.staged_generation():
+            n_indicators, files, skipped = indicator_store.migrate_json_cache(args.src)
+            print(f"Converted {files} files into {n_indicators} indicators "
+                  f"({skipped} skipped) in {STORE_DIR}")
+            print(f"Built cube {build_cube()} (indicators, countries, years)")
+            print(f"Materialized {materialize()} aggregate rows")
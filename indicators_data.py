@@ -1862,3 +1862,47 @@ categorized_indicators = {
 
 # Extract the list of all indicator codes needed for data download
 all_indicator_codes = list(indicators.keys())
+
+
+# ------------------------------------------------------------------
+# 2. Indicators shown on the pages (also preloaded by warmup.py)
+# ------------------------------------------------------------------
+# Key indicators for group detail view
+GROUP_INDICATORS = [
+    ("SP.POP.TOTL", "people"),
+    ("NY.GDP.MKTP.CD", "currency"),
+    ("NY.GDP.PCAP.PP.CD", "currency"),
+    ("EN.GHG.CO2.MT.CE.AR5", "number"),
+    ("EN.GHG.CO2.PC.CE.AR5", "number"),
+    ("DT.DOD.DECT.CD", "currency"),
+    ("NE.EXP.GNFS.CD", "currency"),
+    ("SP.DYN.LE00.IN", "years"),
+]
+
+# Headline metrics (subset shown as top-level st.metric cards)
+HEADLINE_INDICATORS = [
+    ("SP.POP.TOTL", "people", "Population"),
+    ("NY.GDP.MKTP.CD", "currency", "GDP"),
+    ("DT.DOD.DECT.CD", "currency", "External Debt"),
+    ("EN.GHG.CO2.MT.CE.AR5", "number", "CO₂ Emissions (Mt)"),
+]
+
+# Indicator series shown on a country profile, read in one call per country
+PROFILE_INDICATORS = [
+    "EN.GHG.CO2.PC.CE.AR5",
+    "EN.ATM.CO2E.PC",
+    "SL.TLF.CACT.FM.ZS",
+    "SL.UEM.TOTL.ZS",
+    "SP.POP.TOTL",
+    "SE.PRM.NENR",
+    "IT.NET.BBND.P2",
+    "NY.GDP.MKTP.PP.CD",
+    "NY.GDP.PCAP.PP.CD",
+    "FP.CPI.TOTL.ZG",
+    "BN.CAB.XOKA.CD",
+    "NE.EXP.GNFS.CD",
+    "NE.IMP.GNFS.CD",
+    "DT.DOD.DECT.CD",
+    "FI.RES.TOTL.CD",
+    "GC.DOD.TOTL.CN",
+]
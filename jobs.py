@@ -0,0 +1,389 @@
+"""Background jobs for the admin page's data updates.
+
+A refresh of every source takes far longer than a Streamlit request
+should, so the admin page only queues a job here and returns. The queue
+and the job table live in ``cache/runtime/jobs.sqlite``, one row per
+job with its parameters, state, timings, attempt count and the error
+of a failed run. Per-unit progress (source, indicator, state, attempts,
+fetch time) is kept in a refresh manifest per job,
+``cache/runtime/jobs/<id>.manifest.json`` (see refresh_manifest.py).
+
+A single worker process, ``python jobs.py worker``, runs the queued jobs
+one at a time through data_update.run_update. A lock file keeps a
+second worker from starting, so the admin page can call
+``ensure_worker`` after queueing; it starts a worker that exits when the
+queue is empty unless one is already running (for example
+landlinked-jobs.service).
+
+A queued job can be cancelled at once. A running one finishes the
+fetches in flight and then stops. Cancelled, failed and interrupted
+jobs (the worker died) can be resumed: only their pending and failed
+units are fetched again. Each job writes its output to
+``cache/runtime/jobs/<id>.log``.
+"""
+
+import argparse
+import contextlib
+import fcntl
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+import traceback
+
+from refresh_manifest import RefreshManifest
+
+RUNTIME_DIR = "./cache/runtime"
+JOBS_PATH = os.path.join(RUNTIME_DIR, "jobs.sqlite")
+LOG_DIR = os.path.join(RUNTIME_DIR, "jobs")
+WORKER_LOCK_PATH = os.path.join(RUNTIME_DIR, "jobs-worker.lock")
+WORKER_LOG_PATH = os.path.join(RUNTIME_DIR, "jobs-worker.log")
+
+# Seconds between queue polls of an idle worker, and between checks of
+# a running job's cancel flag
+POLL_INTERVAL = 2.0
+CANCEL_CHECK_INTERVAL = 1.0
+
+RESUMABLE = ("cancelled", "failed", "interrupted")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id       INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind     TEXT NOT NULL,
+    params   TEXT NOT NULL,
+    state    TEXT NOT NULL,
+    created  REAL NOT NULL,
+    started  REAL,
+    finished REAL,
+    pid      INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error    TEXT
+)
+"""
+
+
+def _connect():
+    os.makedirs(RUNTIME_DIR, exist_ok=True)
+    conn = sqlite3.connect(JOBS_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _job_dict(row):
+    job = dict(row)
+    job["params"] = json.loads(job["params"])
+    return job
+
+
+def log_path(job_id):
+    return os.path.join(LOG_DIR, f"{job_id}.log")
+
+
+def manifest_path(job_id):
+    return os.path.join(LOG_DIR, f"{job_id}.manifest.json")
+
+
+# ───────────────────────────────── Queue ─────────────────────────────────────
+def enqueue(kind="update", **params):
+    """Queue a job and return its id. ``params`` are passed to the job's runner."""
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    with contextlib.closing(_connect()) as conn, conn:
+        cursor = conn.execute(
+            "INSERT INTO jobs (kind, params, state, created) VALUES (?, ?, 'queued', ?)",
+            (kind, json.dumps(params), time.time()),
+        )
+        return cursor.lastrowid
+
+
+def cancel(job_id):
+    """Cancel a queued job, or ask a running one to stop after its fetches in flight."""
+    with contextlib.closing(_connect()) as conn, conn:
+        conn.execute(
+            "UPDATE jobs SET state = 'cancelled', finished = ? WHERE id = ? AND state = 'queued'",
+            (time.time(), job_id),
+        )
+        conn.execute(
+            "UPDATE jobs SET state = 'cancelling' WHERE id = ? AND state = 'running'", (job_id,)
+        )
+
+
+def resume(job_id):
+    """Queue a cancelled, failed or interrupted job again; its finished units are kept."""
+    with contextlib.closing(_connect()) as conn, conn:
+        cursor = conn.execute(
+            f"UPDATE jobs SET state = 'queued', finished = NULL, error = NULL "
+            f"WHERE id = ? AND state IN ({','.join('?' * len(RESUMABLE))})",
+            (job_id, *RESUMABLE),
+        )
+        return bool(cursor.rowcount)
+
+
+def list_jobs(limit=20):
+    """The most recent jobs, newest first, as dicts."""
+    with contextlib.closing(_connect()) as conn:
+        rows = conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+    return [_job_dict(row) for row in rows]
+
+
+def get_job(job_id):
+    with contextlib.closing(_connect()) as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return _job_dict(row) if row else None
+
+
+def job_progress(job_id):
+    """Per-source and per-indicator progress of a job, with throughput and ETA.
+
+    Returns {"sources": [...], "indicators": [...]}. Each source row has
+    its unit counts by state, the indicators finished per minute in the
+    current attempt and the seconds left at that rate (None until the
+    first indicator finishes). Indicator rows are the finished units,
+    most recent first.
+    """
+    job = get_job(job_id)
+    manifest = RefreshManifest.load(manifest_path(job_id))
+    if job is None or manifest is None:
+        return {"sources": [], "indicators": []}
+
+    now = time.time()
+    started = job["started"] or now
+    elapsed = max(now - started, 1e-9)
+    sources = {}
+    for unit in manifest.units:
+        row = sources.setdefault(unit["source"], {
+            "source": unit["source"], "total": 0, "pending": 0, "done": 0,
+            "skipped": 0, "failed": 0, "this_attempt": 0,
+        })
+        row["total"] += 1
+        row[unit["state"]] += 1
+        if unit["finished"] is not None and unit["finished"] >= started:
+            row["this_attempt"] += 1
+
+    for row in sources.values():
+        rate = row.pop("this_attempt") / elapsed
+        row["per_minute"] = round(rate * 60, 1)
+        if job["state"] in ("running", "cancelling") and rate > 0:
+            row["eta_seconds"] = round(row["pending"] / rate)
+        else:
+            row["eta_seconds"] = None
+
+    finished = sorted((u for u in manifest.units if u["state"] != "pending"),
+                      key=lambda u: u["finished"] or 0, reverse=True)
+    indicators = [
+        {"source": u["source"], "indicator": u["indicator"], "state": u["state"],
+         "attempts": u["attempts"], "seconds": u["seconds"], "finished": u["finished"],
+         "error": u["error"] or ""}
+        for u in finished
+    ]
+    return {"sources": list(sources.values()), "indicators": indicators}
+
+
+def read_log(job_id, lines=200):
+    """The last ``lines`` lines of a job's output."""
+    try:
+        with open(log_path(job_id), "r", encoding="utf-8", errors="replace") as f:
+            return "".join(f.readlines()[-lines:])
+    except OSError:
+        return ""
+
+
+# ───────────────────────────────── Running jobs ──────────────────────────────
+class CancelFlag:
+    """Polls a running job's row for a cancel request, at most every CANCEL_CHECK_INTERVAL."""
+
+    def __init__(self, conn, job_id):
+        self.conn = conn
+        self.job_id = job_id
+        self._cancelled = False
+        self._checked = 0.0
+
+    def __call__(self):
+        now = time.monotonic()
+        if not self._cancelled and now - self._checked >= CANCEL_CHECK_INTERVAL:
+            self._checked = now
+            row = self.conn.execute("SELECT state FROM jobs WHERE id = ?", (self.job_id,)).fetchone()
+            self._cancelled = row is not None and row["state"] == "cancelling"
+        return self._cancelled
+
+
+def _run_update(manifest, groups=None, sources=None, codes=None):
+    from data_update import run_update
+    run_update(groups=groups, sources=sources, manifest=manifest, codes=codes)
+
+
+JOB_KINDS = {
+    "update": _run_update,
+}
+
+
+class _Tee:
+    """Write to the job's log file and to the worker's own stdout."""
+
+    def __init__(self, *streams):
+        self.streams = streams
+
+    def write(self, text):
+        for stream in self.streams:
+            stream.write(text)
+            stream.flush()
+        return len(text)
+
+    def flush(self):
+        for stream in self.streams:
+            stream.flush()
+
+
+def _claim(conn):
+    """Mark the oldest queued job running and return it, or None."""
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute(
+            "SELECT * FROM jobs WHERE state = 'queued' ORDER BY id LIMIT 1"
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute(
+            "UPDATE jobs SET state = 'running', started = ?, pid = ?, attempts = attempts + 1 "
+            "WHERE id = ?", (time.time(), os.getpid(), row["id"]),
+        )
+    return _job_dict(row)
+
+
+def run_job(conn, job):
+    """Run a claimed job to completion, cancellation or failure.
+
+    A resumed job continues from its manifest: pending units and, as
+    the failures may have been transient, failed ones.
+    """
+    params = job["params"]
+    manifest = RefreshManifest.load(manifest_path(job["id"]))
+    if manifest is None:
+        manifest = RefreshManifest.create(manifest_path(job["id"]),
+                                          params.get("groups"), params.get("sources"),
+                                          params.get("codes"))
+    else:
+        manifest.run_states = {"pending", "failed"}
+    manifest.cancel_check = CancelFlag(conn, job["id"])
+    os.makedirs(LOG_DIR, exist_ok=True)
+    state, error = "done", None
+    with open(log_path(job["id"]), "a", encoding="utf-8") as log:
+        log.write(f"\n===== Job {job['id']} attempt {job['attempts'] + 1} "
+                  f"({time.strftime('%Y-%m-%d %H:%M:%S')}) =====\n")
+        with contextlib.redirect_stdout(_Tee(log, sys.__stdout__)):
+            try:
+                JOB_KINDS[job["kind"]](manifest, **params)
+                if manifest.cancelled():
+                    state = "cancelled"
+            except Exception as e:
+                state, error = "failed", f"{type(e).__name__}: {e}"
+                traceback.print_exc(file=log)
+            print(f"===== Job {job['id']} {state} =====")
+    with conn:
+        conn.execute(
+            "UPDATE jobs SET state = ?, finished = ?, error = ? WHERE id = ?",
+            (state, time.time(), error, job["id"]),
+        )
+    return state
+
+
+def _recover(conn):
+    # Called with the worker lock held, so no other worker runs these
+    with conn:
+        conn.execute("UPDATE jobs SET state = 'interrupted' WHERE state = 'running'")
+        conn.execute("UPDATE jobs SET state = 'cancelled', finished = ? WHERE state = 'cancelling'",
+                     (time.time(),))
+
+
+@contextlib.contextmanager
+def _worker_lock():
+    os.makedirs(RUNTIME_DIR, exist_ok=True)
+    with open(WORKER_LOCK_PATH, "a") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def worker_running():
+    """True while a worker process holds the worker lock."""
+    with _worker_lock() as acquired:
+        return not acquired
+
+
+def work(until_idle=False):
+    """Run queued jobs forever, or until the queue is empty with ``until_idle``."""
+    with _worker_lock() as acquired:
+        if not acquired:
+            print("Another job worker is running")
+            return
+        conn = _connect()
+        _recover(conn)
+        print(f"Job worker {os.getpid()} started")
+        while True:
+            job = _claim(conn)
+            if job is None:
+                if until_idle:
+                    break
+                time.sleep(POLL_INTERVAL)
+                continue
+            print(f"Running job {job['id']} ({job['kind']} {job['params']})")
+            print(f"Job {job['id']} {run_job(conn, job)}")
+        conn.close()
+
+
+def ensure_worker():
+    """Start a worker that drains the queue unless one is already running."""
+    if worker_running():
+        return False
+    root = os.path.dirname(os.path.abspath(__file__))
+    os.makedirs(RUNTIME_DIR, exist_ok=True)
+    with open(WORKER_LOG_PATH, "a") as log:
+        # A session of its own, so the worker outlives Streamlit reruns and restarts
+        subprocess.Popen(
+            [sys.executable, os.path.join(root, "jobs.py"), "worker", "--until-idle"],
+            cwd=root, stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Background data update jobs")
+    sub = parser.add_subparsers(dest="command", required=True)
+    worker = sub.add_parser("worker", help="Run queued jobs")
+    worker.add_argument("--until-idle", action="store_true",
+                        help="Exit once the queue is empty")
+    update = sub.add_parser("update", help="Queue a data update")
+    update.add_argument("--groups", nargs="+", help="Only these groups' members (default: all)")
+    update.add_argument("--sources", nargs="+", help="Only these sources (default: all)")
+    update.add_argument("--indicators", nargs="+", metavar="CODE",
+                        help="Only these indicators and their weight series (default: all)")
+    sub.add_parser("list", help="Show recent jobs")
+    for name in ("cancel", "resume"):
+        sub.add_parser(name, help=f"{name.capitalize()} a job").add_argument("job_id", type=int)
+    args = parser.parse_args()
+
+    if args.command == "worker":
+        work(until_idle=args.until_idle)
+    elif args.command == "update":
+        job_id = enqueue("update", groups=args.groups, sources=args.sources, codes=args.indicators)
+        print(f"Queued job {job_id}")
+    elif args.command == "list":
+        for job in list_jobs():
+            print(f"{job['id']:>5}  {job['state']:<11} {job['kind']} {job['params']}"
+                  f"{'  ' + job['error'] if job['error'] else ''}")
+    elif args.command == "cancel":
+        cancel(args.job_id)
+    elif args.command == "resume":
+        sys.exit(0 if resume(args.job_id) else 1)
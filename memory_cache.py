@@ -0,0 +1,299 @@
+"""Bounded in-process LRU cache for Streamlit data functions.
+
+``st.cache_data`` keeps every entry for the life of the worker. With 222
+indicators x 46 groups that is enough DataFrames to exhaust memory, so
+the heavy data functions use ``bounded_cache`` instead. All decorated
+functions share one least-recently-used store capped at a byte budget.
+The budget is ``cache.budget_mb`` in config.yaml, 512 MB by default.
+Each entry's size is estimated when it is stored: deep memory usage
+for DataFrames, and a recursive ``sys.getsizeof`` for records.
+
+Functions marked ``shared=True`` are also backed by the cross-process
+result cache in shared_cache.py. Each function keeps hit, miss,
+shared-hit and eviction counters. Every worker process writes them to
+``cache/runtime/cache_stats-<pid>.json`` at most every STATS_INTERVAL
+seconds. The admin app, a separate Streamlit
+process, reads them back with ``read_stats``.
+
+Inside ``shared_only()`` a shared function never computes: a result
+no worker has published raises NotShared. The in-process warmup uses
+it to fill a worker's memory without competing with its visitors.
+"""
+
+import atexit
+import contextlib
+import copy
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import yaml
+
+import singleflight
+from shared_cache import get_shared_cache
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), "config.yaml")
+RUNTIME_DIR = "./cache/runtime"
+DEFAULT_BUDGET_MB = 512
+STATS_INTERVAL = 5.0
+
+
+def estimate_size(value):
+    """Approximate bytes held by ``value``."""
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_size(k) + estimate_size(v) for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+def _copy(value):
+    # Callers may modify what they get back; keep the cached entry intact
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy()
+    return copy.deepcopy(value)
+
+
+def _load_budget():
+    try:
+        with open(CONFIG_PATH, "r") as f:
+            config = yaml.safe_load(f) or {}
+    except OSError:
+        config = {}
+    budget_mb = (config.get("cache") or {}).get("budget_mb", DEFAULT_BUDGET_MB)
+    return int(float(budget_mb) * 1024 * 1024)
+
+
+class BoundedCache:
+    """Thread-safe LRU store with a byte budget and per-function counters."""
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self._entries = OrderedDict()  # {(name, key): (value, size)}
+        self._bytes = 0
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._stats_written = 0.0
+
+    def _counters(self, name):
+        return self._stats.setdefault(
+            name, {"hits": 0, "misses": 0, "shared_hits": 0, "evictions": 0,
+                   "entries": 0, "bytes": 0}
+        )
+
+    def count(self, name, counter):
+        with self._lock:
+            self._counters(name)[counter] += 1
+
+    def get(self, name, key):
+        """Return (True, value) on a hit, (False, None) on a miss."""
+        with self._lock:
+            counters = self._counters(name)
+            entry = self._entries.get((name, key))
+            if entry is None:
+                counters["misses"] += 1
+                return False, None
+            self._entries.move_to_end((name, key))
+            counters["hits"] += 1
+            return True, entry[0]
+
+    def put(self, name, key, value):
+        size = estimate_size(value)
+        with self._lock:
+            if (name, key) in self._entries:
+                self._drop((name, key))
+            if size > self.budget_bytes:
+                return  # would evict everything and still not fit
+            self._entries[(name, key)] = (value, size)
+            self._bytes += size
+            counters = self._counters(name)
+            counters["entries"] += 1
+            counters["bytes"] += size
+            while self._bytes > self.budget_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self._counters(oldest[0])["evictions"] += 1
+
+    def _drop(self, entry_key):
+        _, size = self._entries.pop(entry_key)
+        self._bytes -= size
+        counters = self._counters(entry_key[0])
+        counters["entries"] -= 1
+        counters["bytes"] -= size
+
+    def clear(self, name=None):
+        """Drop every entry, or only those of function ``name``."""
+        with self._lock:
+            for entry_key in [k for k in self._entries if name is None or k[0] == name]:
+                self._drop(entry_key)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "budget_bytes": self.budget_bytes,
+                "bytes": self._bytes,
+                "updated": time.time(),
+                "functions": {name: dict(c) for name, c in self._stats.items()},
+                "singleflight": singleflight.stats(),
+            }
+
+    def write_stats(self, force=False):
+        """Write this process's counters under RUNTIME_DIR, throttled to STATS_INTERVAL."""
+        now = time.monotonic()
+        if not force and now - self._stats_written < STATS_INTERVAL:
+            return
+        self._stats_written = now
+        try:
+            os.makedirs(RUNTIME_DIR, exist_ok=True)
+            path = os.path.join(RUNTIME_DIR, f"cache_stats-{os.getpid()}.json")
+            tmp = f"{path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"Could not write cache stats: {e}")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+_mode = threading.local()
+
+
+class NotShared(LookupError):
+    """A shared function was called inside ``shared_only()`` for a result
+    no worker has published."""
+
+
+@contextlib.contextmanager
+def shared_only():
+    """Within the block (in this thread), shared functions read the
+    shared result cache and raise NotShared instead of computing."""
+    previous = getattr(_mode, "shared_only", False)
+    _mode.shared_only = True
+    try:
+        yield
+    finally:
+        _mode.shared_only = previous
+
+
+def get_cache():
+    """Return the process-wide BoundedCache, created on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = BoundedCache(_load_budget())
+            atexit.register(_cache.write_stats, True)
+        return _cache
+
+
+def bounded_cache(func=None, *, shared=False):
+    """Memoize a function in the shared bounded cache.
+
+    Arguments must be hashable. Unlike ``st.cache_data`` there is no
+    hashing of DataFrame arguments; pass revisions or ids instead.
+    With ``shared=True`` an in-memory miss is looked up in, and a
+    computed result published to, the cross-process result cache
+    (see shared_cache), so other workers do not recompute it.
+    Concurrent misses on the same arguments are coalesced (see
+    singleflight): one thread computes, the others wait for its result.
+    Every call returns its own copy of the result (deep, for records),
+    so a caller that modifies it does not change the cached entry.
+    """
+    if func is None:
+        return lambda f: bounded_cache(f, shared=shared)
+    name = f"{func.__module__}.{func.__qualname__}"
+    flight = singleflight.group(name)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        cache = get_cache()
+        key = (args, tuple(sorted(kwargs.items())))
+        hit, value = cache.get(name, key)
+        if not hit and shared and getattr(_mode, "shared_only", False):
+            # Not through the flight, whose other callers would get NotShared
+            value = fill_from_shared(key)
+        elif not hit:
+            # Concurrent misses on the same key wait for the first one
+            value = flight.do(key, fill, key, args, kwargs)
+        cache.write_stats()
+        return _copy(value)
+
+    def fill_from_shared(key):
+        hit, value = get_shared_cache().get(name, key)
+        if not hit:
+            raise NotShared(name)
+        cache = get_cache()
+        cache.count(name, "shared_hits")
+        cache.put(name, key, value)
+        return value
+
+    def fill(key, args, kwargs):
+        cache = get_cache()
+        hit = False
+        if shared:
+            hit, value = get_shared_cache().get(name, key)
+            if hit:
+                cache.count(name, "shared_hits")
+        if not hit:
+            value = func(*args, **kwargs)
+            if shared:
+                get_shared_cache().put(name, key, value)
+        cache.put(name, key, value)
+        return value
+
+    def clear():
+        get_cache().clear(name)
+        if shared:
+            get_shared_cache().clear(name)
+
+    wrapper.clear = clear
+    return wrapper
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def read_stats():
+    """Counters of every live worker process, as written by write_stats."""
+    stats = []
+    if not os.path.isdir(RUNTIME_DIR):
+        return stats
+    for filename in sorted(os.listdir(RUNTIME_DIR)):
+        if not (filename.startswith("cache_stats-") and filename.endswith(".json")):
+            continue
+        path = os.path.join(RUNTIME_DIR, filename)
+        try:
+            with open(path, "r") as f:
+                snapshot = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        if not _pid_alive(snapshot.get("pid", 0)):
+            # The worker exited; its stats file is stale
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        stats.append(snapshot)
+    return stats
@@ -5,44 +5,23 @@ import pandas as pd
 import streamlit as st
 from country_facts import get_small_flag
 from css import css_general
-from data_ops import compute_group_aggregate
-from indicators_data import indicators
+from data_ops import compute_group_aggregates, aggregate_series
+from memory_cache import bounded_cache
+from indicators_data import indicators, GROUP_INDICATORS, HEADLINE_INDICATORS
 from story_rendering import format_value
+import warmup
 
 # ───────────────────────────────── Page config ────────────────────────────────
 st.set_page_config(page_title="Landlinked — Groups", page_icon="📊", layout="wide")
+
+# Preload caches in the background on this worker's first page run
+warmup.start()
 st.markdown(css_general, unsafe_allow_html=True)
 
 GROUPS_DIR = "cache/groups"
 
-GROUPS_WITH_DATA = {
-    "aosis", "brics", "eu", "g20", "g77",
-    "ldcs", "lics", "lldcs", "lmcs", "oecd", "sids",
-}
-
-# Key indicators for group detail view
-GROUP_INDICATORS = [
-    ("SP.POP.TOTL", "people"),
-    ("NY.GDP.MKTP.CD", "currency"),
-    ("NY.GDP.PCAP.PP.CD", "currency"),
-    ("EN.GHG.CO2.MT.CE.AR5", "number"),
-    ("EN.GHG.CO2.PC.CE.AR5", "number"),
-    ("DT.DOD.DECT.CD", "currency"),
-    ("NE.EXP.GNFS.CD", "currency"),
-    ("SP.DYN.LE00.IN", "years"),
-]
-
-# Headline metrics (subset shown as top-level st.metric cards)
-HEADLINE_INDICATORS = [
-    ("SP.POP.TOTL", "people", "Population"),
-    ("NY.GDP.MKTP.CD", "currency", "GDP"),
-    ("DT.DOD.DECT.CD", "currency", "External Debt"),
-    ("EN.GHG.CO2.MT.CE.AR5", "number", "CO₂ Emissions (Mt)"),
-]
-
-
 # ───────────────────────────────── Data loading ───────────────────────────────
-@st.cache_data
+@bounded_cache
 def load_all_groups():
     """Load every group JSON from cache/groups/."""
     groups = []
@@ -99,17 +78,12 @@ def get_country_names(group):
     return group.get("countries", group.get("names", []))
 
 
-def render_group_indicator(ind_code, gid, fmt_type):
-    """Compute aggregate for one indicator and render header + metrics + chart."""
+def render_group_indicator(ind_code, series, fmt_type):
+    """Render header + metrics + chart for one indicator's group aggregate."""
     meta = indicators[ind_code]
     description = meta["description"]
 
-    try:
-        result = compute_group_aggregate(ind_code, gid)
-        if not result or not isinstance(result, (list, tuple)) or len(result) == 0 or result[0].empty:
-            return False
-        series = result[0]
-    except Exception:
+    if series.empty:
         return False
 
     first_val = series.iloc[0]
@@ -363,44 +337,46 @@ elif selected_group_gid:
 
     st.markdown("---")
 
-    # Check if aggregate data is available for this group
-    if selected_group_gid not in GROUPS_WITH_DATA:
-        st.info(
-            f"Aggregate indicator data is not yet available for **{acronym}**. "
-            f"Data is currently available for: "
-            f"{', '.join(sorted(gid.upper() for gid in GROUPS_WITH_DATA))}."
+    # Every aggregate shown on this view, computed in one pass
+    try:
+        aggregates = compute_group_aggregates(
+            [code for code, *_ in HEADLINE_INDICATORS + GROUP_INDICATORS],
+            [selected_group_gid],
         )
-    else:
-        # Headline metrics row
-        headline_cols = st.columns(len(HEADLINE_INDICATORS))
-        for col, (ind_code, fmt_type, label) in zip(headline_cols, HEADLINE_INDICATORS):
-            with col:
-                try:
-                    result = compute_group_aggregate(ind_code, selected_group_gid)
-                    if result and len(result) > 0 and not result[0].empty:
-                        series = result[0]
-                        latest_val = series.iloc[-1]
-                        latest_date = series.index[-1]
-                        st.metric(
-                            label=f"{label} ({latest_date})",
-                            value=format_value(latest_val, fmt_type),
-                        )
-                    else:
-                        st.metric(label=label, value="N/A")
-                except Exception:
+    except Exception:
+        aggregates = None
+
+    # Headline metrics row
+    headline_cols = st.columns(len(HEADLINE_INDICATORS))
+    for col, (ind_code, fmt_type, label) in zip(headline_cols, HEADLINE_INDICATORS):
+        with col:
+            try:
+                series = aggregate_series(aggregates, ind_code, selected_group_gid)
+                if not series.empty:
+                    latest_val = series.iloc[-1]
+                    latest_date = series.index[-1]
+                    st.metric(
+                        label=f"{label} ({latest_date})",
+                        value=format_value(latest_val, fmt_type),
+                    )
+                else:
                     st.metric(label=label, value="N/A")
+            except Exception:
+                st.metric(label=label, value="N/A")
 
-        st.markdown("---")
-
-        # Indicator sections
-        rendered_any = False
-        for ind_code, fmt_type in GROUP_INDICATORS:
-            if render_group_indicator(ind_code, selected_group_gid, fmt_type):
-                rendered_any = True
-                st.divider()
+    st.markdown("---")
 
-        if not rendered_any:
-            st.info("No indicator data could be loaded for this group.")
+    # Indicator sections
+    rendered_any = False
+    for ind_code, fmt_type in GROUP_INDICATORS:
+        if aggregates is not None and render_group_indicator(
+            ind_code, aggregate_series(aggregates, ind_code, selected_group_gid), fmt_type
+        ):
+            rendered_any = True
+            st.divider()
+
+    if not rendered_any:
+        st.info("No indicator data could be loaded for this group.")
 
 else:
     # ── MODE A: All groups overview (existing) ──
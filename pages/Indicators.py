@@ -1,16 +1,21 @@
 # Indicators.py  ─────────────────────────────────────────────────────────────
 import io
+import os
 import pandas as pd
 import streamlit as st
 
 from indicators_data import indicators, categorized_indicators
-from data_ops import load_group_data, compute_group_aggregate
-from groups import load_group_metadata, get_group_countries_name
+from data_ops import load_group_data, compute_group_aggregates, aggregate_series
+from groups import load_group_metadata, get_group_countries_name, get_iso3_from_name
 from country_facts import get_small_flag
 from css import css_general
+import warmup
 
 # ───────────────────────────────── Page config ────────────────────────────────
 st.set_page_config(page_title="Landlinked — Indicators", page_icon="📊", layout="wide")
+
+# Preload caches in the background on this worker's first page run
+warmup.start()
 st.markdown(css_general, unsafe_allow_html=True)
 
 
@@ -47,15 +52,15 @@ with st.sidebar:
 
     st.markdown("**Select indicators and groups to explore aggregate trends**")
 
-    # --- Group selection ---
-    available_groups = [
-        "LLDCs", "LDCs", "SIDS", "g77", "oecd", "eu",
-        "g20", "aosis", "lmcs", "lics", "brics", "lldcs",
-    ]
+    # --- Group selection (every group in cache/groups) ---
+    available_groups = sorted(
+        os.path.splitext(f)[0] for f in os.listdir("cache/groups") if f.endswith(".json")
+    )
     selected_groups = st.multiselect(
         "Select groups:",
         options=available_groups,
-        default=["LLDCs"],
+        default=["lldcs"],
+        format_func=lambda gid: gid.upper(),
         key="ind_group_select",
     )
 
@@ -143,7 +148,7 @@ if not selected_codes:
     st.info("Select at least one indicator in the sidebar to explore.")
     st.stop()
 
-_header_parts = [f"Groups: <strong>{', '.join(selected_groups)}</strong>"]
+_header_parts = [f"Groups: <strong>{', '.join(g.upper() for g in selected_groups)}</strong>"]
 if selected_countries:
     _header_parts.append(f"Countries: <strong>{', '.join(selected_countries)}</strong>")
 _header_parts.append(f"Indicators: {len(selected_codes)} selected")
@@ -156,21 +161,26 @@ st.markdown(f"""
 """, unsafe_allow_html=True)
 st.markdown("---")
 
+# --- Compute every selected indicator for every selected group in one pass ---
+try:
+    aggregates = compute_group_aggregates(selected_codes, selected_groups)
+except Exception as e:
+    st.warning(f"Could not compute aggregates: {e}")
+    aggregates = None
+
 for ind_code in selected_codes:
     meta = indicators[ind_code]
     description = meta["description"]
 
-    # --- Compute aggregate for each selected group ---
+    # --- Aggregate for each selected group ---
     all_series = {}
     for grp in selected_groups:
-        try:
-            result = compute_group_aggregate(ind_code, grp.lower())
-            if result and isinstance(result, (list, tuple)) and len(result) > 0 and not result[0].empty:
-                s = result[0]
-                s.name = grp
-                all_series[grp] = s
-        except Exception as e:
-            st.warning(f"Could not compute {ind_code} for {grp}: {e}")
+        if aggregates is None:
+            break
+        s = aggregate_series(aggregates, ind_code, grp)
+        if not s.empty:
+            s.name = grp.upper()
+            all_series[grp.upper()] = s
 
     if not all_series:
         st.info(f"No data available for '{description}' in the selected groups.")
@@ -190,7 +200,7 @@ for ind_code in selected_codes:
         for country_name in selected_countries:
             for grp in selected_groups:
                 df_grp = load_group_data(ind_code, grp.lower())
-                country_df = df_grp[df_grp["country_name"] == country_name]
+                country_df = df_grp[df_grp["country_iso3"] == get_iso3_from_name(country_name, grp.lower())]
                 if not country_df.empty:
                     country_series = country_df.set_index("date")["value"].sort_index()
                     country_series.name = country_name
@@ -296,12 +306,12 @@ for ind_code in selected_codes:
 
             # Pivot: rows = date, columns = country
             pivot = df.pivot_table(
-                index="date", columns="country_name", values="value"
+                index="date", columns="country_name", values="value", observed=True
             )
             pivot = pivot.sort_index()
 
             if len(selected_groups) > 1:
-                st.markdown(f"**{grp}**")
+                st.markdown(f"**{grp.upper()}**")
             st.dataframe(pivot, use_container_width=True)
 
     # Download
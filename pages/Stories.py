@@ -5,9 +5,13 @@ from css import css_general
 from story_rendering import list_stories, load_story, render_story
 from groups import load_group_metadata
 from country_facts import get_small_flag
+import warmup
 
 # ───────────────────────────────── Page config ────────────────────────────────
 st.set_page_config(page_title="Landlinked — Stories", page_icon="📊", layout="wide")
+
+# Preload caches in the background on this worker's first page run
+warmup.start()
 st.markdown(css_general, unsafe_allow_html=True)
 
 # ───────────────────────────────── Sidebar ────────────────────────────────────
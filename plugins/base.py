@@ -1,11 +1,17 @@
 """Abstract base class for data source plugins."""
 
-import os
-import json
-import datetime
-import concurrent.futures
+import asyncio
+import time
 from abc import ABC, abstractmethod
 
+import requests
+from requests.adapters import HTTPAdapter
+
+import indicator_store
+import refresh_scheduler
+from plugins.engine import FetchCancelled, FetchEngine, host_concurrency
+from plugins.rate_limit import limiter_for, retry_after_hook
+
 
 class DataSourcePlugin(ABC):
     """Base class that all data source plugins must implement.
@@ -17,9 +23,9 @@ class DataSourcePlugin(ABC):
     SOURCE_NAME: str = ""
     SOURCE_URL: str = ""
     SOURCE_DB: str = ""
+    API_HOST: str = ""  # keys the fetch engine's per-host concurrency limit
 
-    def __init__(self, indicators_dict, cache_dir="./cache/indicators", cache_duration_days=30):
-        self.cache_dir = cache_dir
+    def __init__(self, indicators_dict, cache_duration_days=30):
         self.cache_duration_days = cache_duration_days
         # Filter indicators to only those belonging to this source
         self.indicators = {
@@ -27,16 +33,71 @@ class DataSourcePlugin(ABC):
             for code, meta in indicators_dict.items()
             if meta.get("source") == self.SOURCE_NAME
         }
-        os.makedirs(self.cache_dir, exist_ok=True)
+        # ChangeSets of every store write, consumed by aggregates.apply_changes
+        self.change_sets = []
+        # Indicators past their cache window that probe_version showed unchanged
+        self.skipped = []
+        # Indicators still within their cache window, served from the store
+        self.cached = []
+        # Indicators checked upstream even within their cache window: weight
+        # series, so weighted aggregates never pair a fresh series with an
+        # old weight, plus any refreshed on request (see data_update)
+        self.recheck = {code for code in self.indicators if refresh_scheduler.is_weight(code)}
+        # One connection pool per source, sized to the host's concurrency
+        self.session = requests.Session()
+        pool_size = host_concurrency(self.API_HOST)
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        # Request rate is limited per host, shared with every other client of it
+        self.rate_limiter = limiter_for(self.API_HOST)
+        self.session.hooks["response"].append(retry_after_hook(self.API_HOST))
+
+    def _respect_rate_limit(self):
+        """Wait for the host's token bucket before sending a request."""
+        self.rate_limiter.acquire()
+
+    def probe_version(self, indicator_code):
+        """Cheaply return a token identifying the upstream version of an
+        indicator (a last-updated date, ETag, ...), or None when the
+        source offers none. Stored data with the same token is current.
+        """
+        return None
 
-    def _get_cache_path(self, indicator_code, group_code):
-        return os.path.join(self.cache_dir, f"{indicator_code}_{group_code}.json")
+    def _probe_http(self, url):
+        """ETag or Last-Modified of ``url`` from a HEAD request, or None."""
+        try:
+            self._respect_rate_limit()
+            resp = self.session.head(url, timeout=10, allow_redirects=True)
+            resp.raise_for_status()
+        except requests.exceptions.RequestException:
+            return None
+        return resp.headers.get("ETag") or resp.headers.get("Last-Modified") or None
 
-    def _is_cache_valid(self, cache_path):
-        if not os.path.exists(cache_path):
-            return False
-        modified = datetime.datetime.fromtimestamp(os.path.getmtime(cache_path))
-        return (datetime.datetime.now() - modified).days <= self.cache_duration_days
+    def _check_cache(self, indicator_code, countries):
+        """Return (use_cache, source_version) for a request.
+
+        Data within the cache window is used as is, except for the
+        indicators in ``recheck``. Past it, the indicator is probed
+        upstream: if the stored data covers the countries and carries the
+        same version it is marked verified and used, and the indicator is
+        counted in ``skipped``.
+        """
+        iso3s = [c["ISO3"] for c in countries]
+        if indicator_code not in self.recheck and indicator_store.is_fresh(
+            indicator_code, iso3s, self.cache_duration_days
+        ):
+            self.cached.append(indicator_code)
+            return True, None
+
+        version = self.probe_version(indicator_code)
+        if (
+            version is not None
+            and indicator_store.covers(indicator_code, iso3s)
+            and version == indicator_store.stored_version(indicator_code)
+        ):
+            indicator_store.mark_verified(indicator_code)
+            self.skipped.append(indicator_code)
+            return True, version
+        return False, version
 
     @abstractmethod
     def fetch_indicator(self, indicator_code, group_code, countries):
@@ -44,7 +105,8 @@ class DataSourcePlugin(ABC):
 
         Args:
             indicator_code: The indicator series code.
-            group_code: The group identifier (e.g. 'lldcs').
+            group_code: Label for the country set (a group id such as
+                'lldcs', or 'all' for the union of every group).
             countries: List of dicts with keys 'name', 'ISO', 'ISO3'.
 
         Returns:
@@ -53,49 +115,75 @@ class DataSourcePlugin(ABC):
         """
         ...
 
+    async def fetch_indicator_async(self, indicator_code, group_code, countries):
+        """Coroutine form of fetch_indicator used by the fetch engine.
+
+        The default adapter runs the synchronous fetch_indicator in a
+        worker thread; plugins with a native async client can override it.
+        """
+        return await asyncio.to_thread(
+            self.fetch_indicator, indicator_code, group_code, countries
+        )
+
     def get_indicator(self, indicator_code, group_code, countries):
-        """Return indicator data, using cache when valid."""
+        """Return indicator data, using cache when valid.
+
+        The store is keyed by country, so data already fetched for the
+        same countries under another group label is reused.
+        """
         if indicator_code not in self.indicators:
             return None
 
-        cache_path = self._get_cache_path(indicator_code, group_code)
-        if self._is_cache_valid(cache_path):
-            with open(cache_path, "r") as f:
-                return json.load(f)
+        use_cache, version = self._check_cache(indicator_code, countries)
+        if use_cache:
+            return indicator_store.read_records(
+                indicator_code, [c["ISO3"] for c in countries]
+            )
 
         print(f"[{self.SOURCE_NAME}] Fetching {indicator_code} for group {group_code}")
+        started = time.monotonic()
         data = self.fetch_indicator(indicator_code, group_code, countries)
+        fetch_seconds = time.monotonic() - started
+
+        if data:
+            self.change_sets.append(indicator_store.write_indicator(
+                indicator_code, data, [c["ISO3"] for c in countries], version, fetch_seconds
+            ))
+            return data
+
+        return None
+
+    async def get_indicator_async(self, indicator_code, group_code, countries, slot,
+                                  cancelled=None):
+        """Engine counterpart of get_indicator; ``slot`` is the host's
+        semaphore and is held only while the remote fetch runs.
+        ``cancelled()`` is checked once the slot is acquired and raises
+        FetchCancelled instead of fetching."""
+        if indicator_code not in self.indicators:
+            return None
+
+        iso3s = [c["ISO3"] for c in countries]
+        use_cache, version = await asyncio.to_thread(self._check_cache, indicator_code, countries)
+        if use_cache:
+            return await asyncio.to_thread(indicator_store.read_records, indicator_code, iso3s)
+
+        async with slot:
+            if cancelled is not None and cancelled():
+                raise FetchCancelled(indicator_code)
+            print(f"[{self.SOURCE_NAME}] Fetching {indicator_code} for group {group_code}")
+            started = time.monotonic()
+            data = await self.fetch_indicator_async(indicator_code, group_code, countries)
+            fetch_seconds = time.monotonic() - started
 
         if data:
-            with open(cache_path, "w") as f:
-                json.dump(data, f)
+            self.change_sets.append(await asyncio.to_thread(
+                indicator_store.write_indicator, indicator_code, data, iso3s, version,
+                fetch_seconds,
+            ))
             return data
 
         return None
 
     def download_all_indicators(self, group_code, countries):
-        """Download all indicators for a group using concurrent workers."""
-        codes = list(self.indicators.keys())
-        if not codes:
-            return
-
-        batch_size = 20
-        max_workers = 8
-
-        for i in range(0, len(codes), batch_size):
-            batch = codes[i : i + batch_size]
-            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-                future_to_code = {
-                    executor.submit(self.get_indicator, code, group_code, countries): code
-                    for code in batch
-                }
-                for future in concurrent.futures.as_completed(future_to_code):
-                    code = future_to_code[future]
-                    try:
-                        result = future.result()
-                        if result:
-                            print(f"  ✓ {code}")
-                        else:
-                            print(f"  ✗ {code} (no data)")
-                    except Exception as e:
-                        print(f"  ! {code}: {e}")
+        """Download all indicators for a group through the fetch engine."""
+        return FetchEngine([self]).run(group_code, countries)
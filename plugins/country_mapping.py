@@ -4,38 +4,31 @@ Used by UN SDG and FAOSTAT plugins which use M49 numeric codes
 instead of ISO alpha codes.
 """
 
-import json
-import os
+import threading
 
-_COUNTRY_CODES_PATH = os.path.join(
-    os.path.dirname(os.path.dirname(__file__)), "cache", "Countrycodesfull.json"
-)
+from country_registry import get_registry
 
 _m49_to_iso = None
 _iso3_to_m49 = None
+_lock = threading.Lock()
 
 
 def _load():
+    """Derive the M49 maps from the shared CountryRegistry's M49 index."""
     global _m49_to_iso, _iso3_to_m49
-    if _m49_to_iso is not None:
-        return
-
-    with open(_COUNTRY_CODES_PATH, "r", encoding="utf-8") as f:
-        codes = json.load(f)
-
-    _m49_to_iso = {}
-    _iso3_to_m49 = {}
-
-    for entry in codes:
-        m49 = entry.get("M49")
-        iso2 = entry.get("ISO_3166_2", "")
-        iso3 = entry.get("ISO_3166_3", "")
-        name = entry.get("NAME.EN", "")
-
-        if m49 and iso2 and iso3:
-            m49_int = int(m49)
-            _m49_to_iso[m49_int] = {"iso2": iso2, "iso3": iso3, "name": name}
-            _iso3_to_m49[iso3] = m49_int
+    with _lock:
+        if _m49_to_iso is not None:
+            return
+
+        m49_to_iso = {}
+        iso3_to_m49 = {}
+        for m49, country in get_registry().by_m49.items():
+            if country.iso2 and country.iso3:
+                m49_to_iso[m49] = {"iso2": country.iso2, "iso3": country.iso3, "name": country.name}
+                iso3_to_m49[country.iso3] = m49
+
+        _iso3_to_m49 = iso3_to_m49
+        _m49_to_iso = m49_to_iso
 
 
 def build_m49_to_iso_map():
@@ -0,0 +1,151 @@
+"""asyncio fetch engine shared by every data source plugin.
+
+Runs the indicators of several plugins on one event loop so World Bank,
+UN SDG, FAOSTAT and IMF requests overlap instead of running plugin by
+plugin. Concurrency is bounded per API host: each host gets a
+semaphore sized from HOST_CONCURRENCY, and each plugin's
+``requests.Session`` (one connection pool per source) is sized to
+match in DataSourcePlugin.
+
+Plugins plug in through ``DataSourcePlugin.fetch_indicator_async``.
+The default adapter runs the plugin's synchronous ``fetch_indicator``
+in a worker thread, so existing plugins work unchanged; a plugin can
+override it with a native coroutine.
+
+A run can report to a ``progress`` object (see refresh_manifest):
+``pending(source, code)`` is asked before each indicator and returning
+False leaves it out of the run; ``finished(source, code, outcome,
+seconds, error)`` is told how each one went, with outcome "done"
+(fetched), "skipped" (served from the store) or "failed";
+``cancelled()`` is checked before each remote fetch, and once it
+returns True the fetches that have not started are dropped.
+
+Indicators are scheduled by their weight dependencies (see
+refresh_scheduler): weight series are queued first, and an indicator
+whose weight series is in the same run starts once that series is
+done, whatever its outcome.
+"""
+
+import asyncio
+import concurrent.futures
+import time
+
+import refresh_scheduler
+
+# Concurrent requests allowed per API host
+HOST_CONCURRENCY = {
+    "api.worldbank.org": 4,
+    "unstats.un.org": 2,
+    "fenixservices.fao.org": 2,
+    "www.imf.org": 2,
+}
+DEFAULT_HOST_CONCURRENCY = 2
+
+
+def host_concurrency(host):
+    return HOST_CONCURRENCY.get(host, DEFAULT_HOST_CONCURRENCY)
+
+
+class _TimedSlot:
+    """A host semaphore that notes when this task acquired it, so the
+    time spent waiting for the host is not counted as fetch time."""
+
+    def __init__(self, semaphore):
+        self.semaphore = semaphore
+        self.acquired = None
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        self.acquired = time.monotonic()
+
+    async def __aexit__(self, *exc):
+        self.semaphore.release()
+
+
+class FetchCancelled(Exception):
+    """Raised instead of starting a fetch once the run was cancelled."""
+
+
+class FetchEngine:
+    """Fetch every indicator of ``plugins`` concurrently, bounded per host."""
+
+    def __init__(self, plugins, progress=None):
+        self.plugins = [p for p in plugins if p.indicators]
+        self.progress = progress
+        self.results = {}  # {indicator_code: True if data was returned}
+        self.done = {}  # {indicator_code: asyncio.Event set once it finished}
+
+    def cancelled(self):
+        return self.progress is not None and self.progress.cancelled()
+
+    async def _run_after(self, weight, plugin, slot, indicator_code, group_code, countries):
+        try:
+            if weight is not None:
+                await self.done[weight].wait()
+            await self._run_one(plugin, slot, indicator_code, group_code, countries)
+        finally:
+            self.done[indicator_code].set()
+
+    async def _run_one(self, plugin, slot, indicator_code, group_code, countries):
+        source = plugin.SOURCE_NAME
+        if self.progress is not None and not self.progress.pending(source, indicator_code):
+            return
+        started = time.monotonic()
+        slot = _TimedSlot(slot)
+        try:
+            data = await plugin.get_indicator_async(
+                indicator_code, group_code, countries, slot, cancelled=self.cancelled
+            )
+            ok = bool(data)
+            error = None if ok else "no data"
+            if not ok:
+                outcome = "failed"
+            elif indicator_code in plugin.skipped or indicator_code in plugin.cached:
+                outcome = "skipped"
+            else:
+                outcome = "done"
+            print(f"  {'✓' if ok else '✗'} [{source}] {indicator_code}"
+                  f"{'' if ok else ' (no data)'}")
+        except FetchCancelled:
+            return
+        except Exception as e:
+            ok = False
+            outcome, error = "failed", str(e)
+            print(f"  ! [{source}] {indicator_code}: {e}")
+        self.results[indicator_code] = ok
+        if self.progress is not None:
+            seconds = time.monotonic() - (slot.acquired or started)
+            self.progress.finished(source, indicator_code, outcome, seconds, error)
+
+    async def run_async(self, group_code, countries):
+        # Sync plugin work (requests, store reads/writes) runs in threads;
+        # size the pool so every host can use its full allowance
+        hosts = {p.API_HOST for p in self.plugins}
+        workers = sum(host_concurrency(h) for h in hosts) + 4
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(concurrent.futures.ThreadPoolExecutor(max_workers=workers))
+
+        slots = {h: asyncio.Semaphore(host_concurrency(h)) for h in hosts}
+        owner = {code: plugin for plugin in self.plugins for code in plugin.indicators}
+        waits = refresh_scheduler.waits_for(owner)
+        self.done = {code: asyncio.Event() for code in owner}
+        # Weight series first, so they are ahead in their host's queue
+        tasks = [
+            self._run_after(waits.get(code), owner[code], slots[owner[code].API_HOST],
+                            code, group_code, countries)
+            for code in refresh_scheduler.order(owner)
+        ]
+        skipped_before = sum(len(p.skipped) for p in self.plugins)
+        await asyncio.gather(*tasks)
+        skipped = sum(len(p.skipped) for p in self.plugins) - skipped_before
+        print(f"{skipped} indicators unchanged upstream, download skipped")
+        return self.results
+
+    def run(self, group_code, countries):
+        """Fetch everything and return {indicator_code: succeeded}."""
+        return asyncio.run(self.run_async(group_code, countries))
+
+
+def download_all(plugins, group_code, countries, progress=None):
+    """Download every indicator of every plugin for ``countries`` in one engine run."""
+    return FetchEngine(plugins, progress).run(group_code, countries)
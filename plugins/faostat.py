@@ -9,13 +9,13 @@ indicator's metadata must include a '_fao_params' dict with keys
 'domain', 'item', 'element'.
 """
 
+import threading
 import time
 import requests
 from plugins.base import DataSourcePlugin
 from plugins.country_mapping import build_iso3_to_m49_map, build_m49_to_iso_map
 
 MAX_RETRIES = 3
-RATE_LIMIT_DELAY = 0.5
 YEARS = ",".join(str(y) for y in range(2010, 2026))
 
 
@@ -23,19 +23,37 @@ class FAOSTATPlugin(DataSourcePlugin):
     SOURCE_NAME = "FAOSTAT"
     SOURCE_URL = "https://www.fao.org/faostat"
     SOURCE_DB = "FAOSTAT"
+    API_HOST = "fenixservices.fao.org"
 
     def __init__(self, indicators_dict, **kwargs):
         super().__init__(indicators_dict, **kwargs)
-        self.session = requests.Session()
         self.iso3_to_m49 = build_iso3_to_m49_map()
         self.m49_to_iso = build_m49_to_iso_map()
-        self.last_request_time = 0
-
-    def _respect_rate_limit(self):
-        elapsed = time.time() - self.last_request_time
-        if elapsed < RATE_LIMIT_DELAY:
-            time.sleep(RATE_LIMIT_DELAY - elapsed)
-        self.last_request_time = time.time()
+        self._probe_lock = threading.Lock()
+        self._domain_updates = None  # {domain_code: date_update}
+
+    def probe_version(self, indicator_code):
+        """Last update date of the indicator's FAOSTAT domain.
+
+        The domain list is requested once per plugin instance.
+        """
+        fao_params = (self.indicators.get(indicator_code) or {}).get("_fao_params") or {}
+        with self._probe_lock:
+            if self._domain_updates is None:
+                self._domain_updates = {}
+                try:
+                    self._respect_rate_limit()
+                    resp = self.session.get(
+                        "https://fenixservices.fao.org/faostat/api/v1/en/groupsanddomains",
+                        timeout=30,
+                    )
+                    resp.raise_for_status()
+                    for domain in resp.json().get("data", []):
+                        if domain.get("domain_code") and domain.get("date_update"):
+                            self._domain_updates[domain["domain_code"]] = domain["date_update"]
+                except (requests.exceptions.RequestException, ValueError, AttributeError) as e:
+                    print(f"[FAOSTAT] Could not probe domain updates: {e}")
+            return self._domain_updates.get(fao_params.get("domain"))
 
     def _clean_m49(self, raw):
         """Strip FAOSTAT's apostrophe-prefix quirk from M49 codes."""
@@ -11,7 +11,6 @@ import requests
 from plugins.base import DataSourcePlugin
 
 MAX_RETRIES = 3
-RATE_LIMIT_DELAY = 0.5
 REQUEST_TIMEOUT = 30
 
 
@@ -19,21 +18,18 @@ class IMFPlugin(DataSourcePlugin):
     SOURCE_NAME = "IMF"
     SOURCE_URL = "https://www.imf.org/external/datamapper"
     SOURCE_DB = "IMF DataMapper"
+    API_HOST = "www.imf.org"
 
     def __init__(self, indicators_dict, **kwargs):
         super().__init__(indicators_dict, **kwargs)
-        self.session = requests.Session()
-        self.last_request_time = 0
         self._lock = threading.Lock()
         # Cache of raw indicator data: {indicator_code: {ISO3: {year: value}}}
         self._indicator_cache = {}
 
-    def _respect_rate_limit(self):
-        with self._lock:
-            elapsed = time.time() - self.last_request_time
-            if elapsed < RATE_LIMIT_DELAY:
-                time.sleep(RATE_LIMIT_DELAY - elapsed)
-            self.last_request_time = time.time()
+    def probe_version(self, indicator_code):
+        """ETag / Last-Modified of the indicator's DataMapper endpoint."""
+        imf_code = self.indicators[indicator_code].get("_imf_code", indicator_code)
+        return self._probe_http(f"https://www.imf.org/external/datamapper/api/v1/{imf_code}")
 
     def _fetch_all_indicator_data(self, indicator_code):
         """Fetch all data for an indicator (all countries, all years)."""
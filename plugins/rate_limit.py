@@ -0,0 +1,109 @@
+"""Thread-safe token-bucket rate limiting, shared per API host.
+
+Every plugin instance (and the legacy World Bank client) that talks to
+the same host draws from one bucket, so the request rate tracks the
+host's allowance however many threads or plugin objects are fetching.
+Buckets refill continuously at ``rate`` requests per second up to
+``burst`` tokens. A 429 or 503 response with ``Retry-After`` pauses the
+whole host until the advertised time.
+"""
+
+import email.utils
+import threading
+import time
+
+# (requests per second, burst capacity) per API host
+HOST_RATES = {
+    "api.worldbank.org": (2.0, 4),
+    "unstats.un.org": (3.0, 2),
+    "fenixservices.fao.org": (2.0, 2),
+    "www.imf.org": (2.0, 2),
+}
+DEFAULT_RATE = (1.0, 1)
+
+# Pause applied on 429/503 when the response carries no usable Retry-After
+DEFAULT_RETRY_AFTER = 5.0
+MAX_RETRY_AFTER = 300.0
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        # _updated is in the future while a deferral lasts: nothing accrues
+        if now > self._updated:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    def acquire(self):
+        """Block until a request may be sent. The lock is never held while sleeping."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._blocked_until:
+                    wait = self._blocked_until - now
+                elif self._tokens >= 1 - 1e-9:  # a token refilled to 0.999... is due
+                    self._tokens -= 1
+                    return
+                else:
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def defer(self, seconds):
+        """Hold every caller for ``seconds`` and drain the burst allowance;
+        tokens accrue again from the end of the pause, so the host is not
+        hit with a full burst the moment it asked to be left alone."""
+        with self._lock:
+            now = time.monotonic()
+            self._blocked_until = max(self._blocked_until, now + seconds)
+            self._tokens = 0.0
+            self._updated = self._blocked_until
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def limiter_for(host):
+    """Return the process-wide TokenBucket for ``host``."""
+    with _buckets_lock:
+        if host not in _buckets:
+            _buckets[host] = TokenBucket(*HOST_RATES.get(host, DEFAULT_RATE))
+        return _buckets[host]
+
+
+def retry_after_seconds(response):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    value = response.headers.get("Retry-After", "").strip()
+    if not value:
+        return DEFAULT_RETRY_AFTER
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            when = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return DEFAULT_RETRY_AFTER
+        seconds = when.timestamp() - time.time()
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+def retry_after_hook(host):
+    """requests response hook that defers ``host``'s bucket on 429/503."""
+    bucket = limiter_for(host)
+
+    def hook(response, *args, **kwargs):
+        if response.status_code in (429, 503):
+            seconds = retry_after_seconds(response)
+            print(f"[{host}] HTTP {response.status_code}, pausing {seconds:.0f}s")
+            bucket.defer(seconds)
+        return response
+
+    return hook
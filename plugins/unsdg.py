@@ -12,7 +12,6 @@ from plugins.base import DataSourcePlugin
 from plugins.country_mapping import build_iso3_to_m49_map, build_m49_to_iso_map
 
 MAX_RETRIES = 3
-RATE_LIMIT_DELAY = 0.3
 REQUEST_TIMEOUT = 60
 PAGE_SIZE = 10000
 
@@ -21,23 +20,22 @@ class UNSDGPlugin(DataSourcePlugin):
     SOURCE_NAME = "UN SDG"
     SOURCE_URL = "https://unstats.un.org/sdgs/dataportal"
     SOURCE_DB = "UN SDG Global Database"
+    API_HOST = "unstats.un.org"
 
     def __init__(self, indicators_dict, **kwargs):
         super().__init__(indicators_dict, **kwargs)
-        self.session = requests.Session()
         self.iso3_to_m49 = build_iso3_to_m49_map()
         self.m49_to_iso = build_m49_to_iso_map()
-        self.last_request_time = 0
         self._lock = threading.Lock()
         # Cache of raw series data: {indicator_code: [all_records]}
         self._series_cache = {}
 
-    def _respect_rate_limit(self):
-        with self._lock:
-            elapsed = time.time() - self.last_request_time
-            if elapsed < RATE_LIMIT_DELAY:
-                time.sleep(RATE_LIMIT_DELAY - elapsed)
-            self.last_request_time = time.time()
+    def probe_version(self, indicator_code):
+        """ETag / Last-Modified of the series' first data page."""
+        return self._probe_http(
+            "https://unstats.un.org/sdgs/UNSDGAPIV5/v1/sdg/Series/Data"
+            f"?seriesCode={indicator_code}&pageSize=1&page=1"
+        )
 
     def _fetch_all_series_data(self, indicator_code):
         """Fetch all data points for a series (all countries, all years)."""
@@ -3,61 +3,115 @@
 Wraps the existing World Bank API v2 fetch logic. The API response
 is already in the normalized [metadata, records[]] format, so no
 transformation is needed.
+
+Each indicator is requested once for every country (``country/all``)
+and the records are filtered locally to the requested countries, so a
+refresh costs one round trip per indicator however many groups or
+countries it covers.
 """
 
+import threading
 import time
 import requests
-import concurrent.futures
+import indicator_store
 from plugins.base import DataSourcePlugin
 
-API_RATE_LIMIT_DELAY = 0.5
 MAX_RETRIES = 3
+API_URL = "https://api.worldbank.org/v2"
+DATE_RANGE = "2010:2025"
+PER_PAGE = 20000  # every economy and aggregate for DATE_RANGE fits in one page
+PROBE_ERRORS = (requests.exceptions.RequestException, ValueError, IndexError, KeyError, TypeError)
+
+# Request country/all and split locally; set to False to request the
+# ';'-joined ISO2 codes of the countries instead
+FETCH_ALL_COUNTRIES = True
 
 
 class WorldBankPlugin(DataSourcePlugin):
     SOURCE_NAME = "World Bank"
     SOURCE_URL = "https://data.worldbank.org"
     SOURCE_DB = "World Development Indicators"
+    API_HOST = "api.worldbank.org"
 
     def __init__(self, indicators_dict, **kwargs):
         super().__init__(indicators_dict, **kwargs)
-        self.session = requests.Session()
-        self.last_request_time = 0
-
-    def _respect_rate_limit(self):
-        elapsed = time.time() - self.last_request_time
-        if elapsed < API_RATE_LIMIT_DELAY:
-            time.sleep(API_RATE_LIMIT_DELAY - elapsed)
-        self.last_request_time = time.time()
+        self._probe_lock = threading.Lock()
+        self._source_lastupdated = {}  # {source id: lastupdated, "" if the probe failed}
+
+    def _get_json(self, url):
+        self._respect_rate_limit()
+        resp = self.session.get(url, timeout=10)
+        resp.raise_for_status()
+        return resp.json()[1][0]
+
+    def _source_id(self, indicator_code):
+        """Id of the World Bank database serving the indicator.
+
+        Taken from the ``sourceid`` of the stored data response, or asked
+        of the indicator endpoint for an indicator not stored yet.
+        """
+        stored = (indicator_store.read_metadata(indicator_code) or {}).get("metadata") or {}
+        if stored.get("sourceid"):
+            return str(stored["sourceid"])
+        return str(self._get_json(f"{API_URL}/indicator/{indicator_code}?format=json")["source"]["id"])
+
+    def probe_version(self, indicator_code):
+        """``lastupdated`` of the indicator's own source database (WDI,
+        WGI, Africa Development Indicators, ...), requested once per
+        source per plugin instance.
+
+        Data responses carry the same date in their metadata, so it
+        matches what is already stored for indicators fetched earlier.
+        """
+        try:
+            source_id = self._source_id(indicator_code)
+        except PROBE_ERRORS as e:
+            print(f"[World Bank] Could not find the source of {indicator_code}: {e}")
+            return None
+        with self._probe_lock:
+            if source_id not in self._source_lastupdated:
+                try:
+                    self._source_lastupdated[source_id] = self._get_json(
+                        f"{API_URL}/sources/{source_id}?format=json"
+                    ).get("lastupdated") or ""
+                except PROBE_ERRORS as e:
+                    print(f"[World Bank] Could not probe source {source_id} lastupdated: {e}")
+                    self._source_lastupdated[source_id] = ""
+            return self._source_lastupdated[source_id] or None
+
+    def _url(self, indicator_code, countries_str, page=1):
+        return (
+            f"{API_URL}/country/{countries_str}/indicator/{indicator_code}"
+            f"?date={DATE_RANGE}&format=json&per_page={PER_PAGE}&page={page}"
+        )
 
     def _fetch_page(self, indicator_code, countries_str, page):
-        try:
-            self._respect_rate_limit()
-            url = (
-                f"https://api.worldbank.org/v2/country/{countries_str}"
-                f"/indicator/{indicator_code}"
-                f"?date=2010:2025&format=json&per_page=10000&page={page}"
-            )
-            resp = self.session.get(url, timeout=10)
-            resp.raise_for_status()
-            return resp.json()[1]
-        except Exception as e:
-            print(f"Error fetching page {page} for {indicator_code}: {e}")
-            return []
+        """Records of one further page.
+
+        Errors propagate: a fetch missing a page would be stored as
+        complete, withdrawing the covered countries' rows it lacks.
+        """
+        self._respect_rate_limit()
+        resp = self.session.get(self._url(indicator_code, countries_str, page), timeout=10)
+        resp.raise_for_status()
+        return resp.json()[1]
 
     def fetch_indicator(self, indicator_code, group_code, countries):
-        """Fetch from World Bank API v2, joining country ISO2 codes with ';'."""
-        countries_str = ";".join(c["ISO"] for c in countries)
+        """Fetch from World Bank API v2 and keep the records of ``countries``.
+
+        With FETCH_ALL_COUNTRIES the request is for ``country/all`` (one
+        call whatever the country set); otherwise the countries' ISO2
+        codes are joined with ';'.
+        """
+        if FETCH_ALL_COUNTRIES:
+            countries_str = "all"
+        else:
+            countries_str = ";".join(c["ISO"] for c in countries)
 
         for attempt in range(MAX_RETRIES):
             try:
                 self._respect_rate_limit()
-                url = (
-                    f"https://api.worldbank.org/v2/country/{countries_str}"
-                    f"/indicator/{indicator_code}"
-                    f"?date=2010:2025&per_page=10000&format=json"
-                )
-                resp = self.session.get(url, timeout=10)
+                resp = self.session.get(self._url(indicator_code, countries_str), timeout=30)
                 resp.raise_for_status()
                 result = resp.json()
 
@@ -65,25 +119,21 @@ class WorldBankPlugin(DataSourcePlugin):
                     return None
 
                 metadata, first_page = result
-                data = first_page
-
-                # Handle pagination
-                if "pages" in metadata and metadata["pages"] > 1:
-                    pages = metadata["pages"]
-                    with concurrent.futures.ThreadPoolExecutor(
-                        max_workers=min(pages - 1, 4)
-                    ) as executor:
-                        futures = {
-                            executor.submit(
-                                self._fetch_page, indicator_code, countries_str, p
-                            ): p
-                            for p in range(2, pages + 1)
-                        }
-                        for future in concurrent.futures.as_completed(futures):
-                            page_data = future.result()
-                            if page_data:
-                                data.extend(page_data)
-
+                data = first_page or []
+
+                # Remaining pages, if any (PER_PAGE normally fits everything);
+                # a failed page fails the attempt
+                for page in range(2, metadata.get("pages", 1) + 1):
+                    data.extend(self._fetch_page(indicator_code, countries_str, page))
+
+                # Split locally: drop regional/income aggregates and
+                # countries outside the requested set. Some databases
+                # (e.g. source 11) only give the ISO3 code as country.id
+                wanted = {c["ISO3"] for c in countries}
+                data = [
+                    r for r in data
+                    if (r.get("countryiso3code") or (r.get("country") or {}).get("id")) in wanted
+                ]
                 return [metadata, data]
 
             except requests.exceptions.RequestException as e:
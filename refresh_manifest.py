@@ -0,0 +1,136 @@
+"""Checkpoint of a refresh run, one entry per unit of work.
+
+A unit is one (source, indicator, scope) fetch, where the scope is the
+group code the countries were taken from ("all", or e.g. "lldcs+oecd").
+Each unit records its state, how many times it was attempted, how long
+the last attempt took and its error, if any. States:
+
+- ``pending``: not attempted yet, or cut short by a crash or a cancel;
+- ``done``: fetched and written to the store;
+- ``skipped``: served from the store, either within its cache window or
+  unchanged upstream (see DataSourcePlugin._check_cache);
+- ``failed``: the fetch raised, or returned no data.
+
+The manifest is a JSON file rewritten atomically after every unit, so a
+run that dies halfway leaves an accurate record. ``python data_update.py
+--resume`` runs only the pending units of the last run, and
+``--only-failed`` only its failures. Background jobs keep one manifest
+per job (see jobs.py).
+
+RefreshManifest is the ``progress`` object the fetch engine reports to
+(see plugins.engine).
+"""
+
+import json
+import os
+import time
+
+MANIFEST_PATH = "./cache/runtime/refresh_manifest.json"
+
+UNIT_STATES = ("pending", "done", "skipped", "failed")
+
+
+class RefreshManifest:
+    def __init__(self, path, data):
+        self.path = path
+        self.data = data
+        self._units = {(u["source"], u["indicator"]): u for u in data["units"]}
+        # Units in these states are run; the rest are left as they are
+        self.run_states = {"pending"}
+        # Optional callable polled by the engine before each fetch
+        self.cancel_check = None
+
+    @classmethod
+    def create(cls, path=MANIFEST_PATH, groups=None, sources=None, codes=None):
+        """Start an empty manifest for a run over ``groups``, ``sources`` and
+        ``codes`` (the indicators refreshed with their weight series; None: all)."""
+        now = time.time()
+        data = {
+            "groups": groups,
+            "sources": sources,
+            "codes": codes,
+            "scope": "all" if groups is None else "+".join(groups),
+            "state": "running",
+            "created": now,
+            "updated": now,
+            "units": [],
+        }
+        return cls(path, data)
+
+    @classmethod
+    def load(cls, path=MANIFEST_PATH):
+        """The manifest saved at ``path``, or None if there is none."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return cls(path, json.load(f))
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    @property
+    def groups(self):
+        return self.data["groups"]
+
+    @property
+    def sources(self):
+        return self.data["sources"]
+
+    @property
+    def codes(self):
+        return self.data.get("codes")
+
+    @property
+    def units(self):
+        return self.data["units"]
+
+    def save(self):
+        self.data["updated"] = time.time()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, separators=(",", ":"))
+        os.replace(tmp, self.path)
+
+    def plan(self, plugins):
+        """Add a pending unit for every indicator of ``plugins`` not in the manifest yet."""
+        for plugin in plugins:
+            for code in plugin.indicators:
+                key = (plugin.SOURCE_NAME, code)
+                if key not in self._units:
+                    unit = {
+                        "source": plugin.SOURCE_NAME, "indicator": code,
+                        "scope": self.data["scope"], "state": "pending",
+                        "attempts": 0, "seconds": None, "finished": None, "error": None,
+                    }
+                    self._units[key] = unit
+                    self.data["units"].append(unit)
+        self.data["state"] = "running"
+        self.save()
+
+    def set_state(self, state):
+        """Record the run's overall state ("running", "complete", "cancelled" or "failed")."""
+        self.data["state"] = state
+        self.save()
+
+    def counts(self):
+        """{state: number of units}."""
+        counts = dict.fromkeys(UNIT_STATES, 0)
+        for unit in self.data["units"]:
+            counts[unit["state"]] += 1
+        return counts
+
+    # Fetch engine progress protocol
+    def pending(self, source, indicator):
+        unit = self._units.get((source, indicator))
+        return unit is not None and unit["state"] in self.run_states
+
+    def finished(self, source, indicator, outcome, seconds, error=None):
+        unit = self._units[(source, indicator)]
+        unit["state"] = outcome
+        unit["attempts"] += 1
+        unit["seconds"] = round(seconds, 3)
+        unit["finished"] = time.time()
+        unit["error"] = error
+        self.save()
+
+    def cancelled(self):
+        return self.cancel_check is not None and self.cancel_check()
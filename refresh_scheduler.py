@@ -0,0 +1,91 @@
+"""Dependency graph of the catalogue's weighted indicators.
+
+An indicator with ``agg: 'weighted'`` is aggregated with the series
+named in its ``weight_by`` (population, GDP, land area, ...), and a
+weight series can itself be weighted (AG.LND.CROP.ZS is weighted by
+AG.LND.TOTL.K2 and weights nothing, but the graph allows chains). The
+fetch engine uses the graph to schedule a refresh:
+
+- weight series go first: their fetches are queued ahead of every other
+  indicator, and an indicator weighted by a series in the same run
+  waits for that series to finish before it is fetched;
+- weight series are always checked upstream instead of being served
+  from their cache window (see DataSourcePlugin._check_cache), so a
+  refreshed indicator is never aggregated with a weight series older
+  than its own cache window allows.
+
+``closure(codes)`` is what ``python data_update.py --indicators CODE``
+refreshes: the indicators and, transitively, their weight series. The
+materialized aggregates of everything weighted by a series that changed
+are recomputed by aggregates.apply_changes; ``dependents`` lists them.
+"""
+
+from indicators_data import indicators
+
+# {indicator: weight series} for every weighted indicator
+WEIGHT_BY = {
+    code: meta["weight_by"]
+    for code, meta in indicators.items()
+    if meta.get("agg") == "weighted" and meta.get("weight_by")
+}
+
+# {weight series: [indicators weighted by it]}
+DEPENDENTS = {}
+for _code, _weight in WEIGHT_BY.items():
+    DEPENDENTS.setdefault(_weight, []).append(_code)
+
+
+def is_weight(code):
+    """True when some indicator is weighted by ``code``."""
+    return code in DEPENDENTS
+
+
+def depth(code):
+    """Length of the longest chain of indicators weighted, directly or
+    not, by ``code``: 0 for an indicator that weights nothing."""
+    return 1 + max((depth(dep) for dep in DEPENDENTS[code]), default=0) if code in DEPENDENTS else 0
+
+
+def closure(codes):
+    """``codes`` and every weight series they depend on, weights first.
+
+    Unknown codes raise KeyError.
+    """
+    found = []
+    for code in codes:
+        if code not in indicators:
+            raise KeyError(code)
+        while code is not None and code not in found:
+            found.append(code)
+            code = WEIGHT_BY.get(code)
+    return order(found)
+
+
+def dependents(codes):
+    """Every indicator weighted, directly or not, by one of ``codes``."""
+    found, todo = [], list(codes)
+    while todo:
+        for dep in DEPENDENTS.get(todo.pop(), []):
+            if dep not in found:
+                found.append(dep)
+                todo.append(dep)
+    return found
+
+
+def order(codes):
+    """``codes`` sorted so every weight series precedes what it weights;
+    deeper weights (which more indicators wait on) come first."""
+    return sorted(codes, key=lambda code: (-depth(code), -len(DEPENDENTS.get(code, ()))))
+
+
+def waits_for(codes):
+    """{indicator: weight series} for the indicators of ``codes`` whose
+    weight series is also in ``codes``, i.e. must be fetched first."""
+    codes = set(codes)
+    return {code: WEIGHT_BY[code] for code in codes if WEIGHT_BY.get(code) in codes}
+
+
+if __name__ == "__main__":
+    for weight in order(DEPENDENTS):
+        print(f"{weight:<20} {indicators[weight]['source']:<10} "
+              f"{len(dependents([weight]))} dependents")
@@ -0,0 +1,194 @@
+"""Result cache shared by every Streamlit worker on the host.
+
+memory_cache keeps results per process, so each replica behind nginx
+would otherwise recompute every aggregate and country slice. Functions
+decorated with ``bounded_cache(shared=True)`` also publish their
+results to a local SQLite file, ``cache/runtime/results.sqlite``. On an
+in-memory miss, a worker reads the published result before computing.
+
+Entries are addressed by a hash of the function name and arguments.
+Callers put file revisions in the arguments (see
+aggregates.pair_revision), so a refreshed indicator simply stops
+matching its old entries. Invalidation never rewrites a row that a
+reader might be using.
+
+Each publish is one transaction. In WAL mode a reader sees either the
+old row or the complete new one, never a partial value. Superseded
+entries age out least-recently-read first once the file passes
+``cache.shared_budget_mb`` in config.yaml. The total size is kept in a
+one-row ``totals`` table by triggers, so a publish checks the budget
+without summing every entry.
+"""
+
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+import yaml
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), "config.yaml")
+SHARED_CACHE_PATH = "./cache/runtime/results.sqlite"
+DEFAULT_SHARED_BUDGET_MB = 1024
+
+# Reads refresh an entry's access time at most this often (seconds), so
+# hits do not turn into a write per lookup
+TOUCH_INTERVAL = 60.0
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS results (
+        key      TEXT PRIMARY KEY,
+        name     TEXT NOT NULL,
+        value    BLOB NOT NULL,
+        size     INTEGER NOT NULL,
+        created  REAL NOT NULL,
+        accessed REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)",
+    # Running SUM(size) of results; seeded once for a file from before it
+    "CREATE TABLE IF NOT EXISTS totals (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO totals SELECT 0, COALESCE(SUM(size), 0) FROM results",
+    """
+    CREATE TRIGGER IF NOT EXISTS results_insert AFTER INSERT ON results
+    BEGIN UPDATE totals SET bytes = bytes + new.size; END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS results_update AFTER UPDATE OF size ON results
+    BEGIN UPDATE totals SET bytes = bytes - old.size + new.size; END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS results_delete AFTER DELETE ON results
+    BEGIN UPDATE totals SET bytes = bytes - old.size; END
+    """,
+]
+
+
+def _load_budget():
+    try:
+        with open(CONFIG_PATH, "r") as f:
+            config = yaml.safe_load(f) or {}
+    except OSError:
+        config = {}
+    budget_mb = (config.get("cache") or {}).get("shared_budget_mb", DEFAULT_SHARED_BUDGET_MB)
+    return int(float(budget_mb) * 1024 * 1024)
+
+
+def entry_key(name, key):
+    """Content address of one call: sha1 over the function name and arguments."""
+    return hashlib.sha1(repr((name, key)).encode("utf-8")).hexdigest()
+
+
+class SharedResultCache:
+    def __init__(self, path=SHARED_CACHE_PATH, budget_bytes=None):
+        self.path = path
+        self.budget_bytes = budget_bytes if budget_bytes is not None else _load_budget()
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            for statement in _SCHEMA:
+                conn.execute(statement)
+
+    def _connect(self):
+        # sqlite3 connections are bound to their thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, name, key):
+        """Return (True, value) if another worker (or this one) published the call."""
+        address = entry_key(name, key)
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, accessed FROM results WHERE key = ?", (address,)
+            ).fetchone()
+            if row is None:
+                return False, None
+            now = time.time()
+            if now - row[1] > TOUCH_INTERVAL:
+                with conn:
+                    conn.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, address))
+            return True, pickle.loads(row[0])
+        except (sqlite3.Error, pickle.UnpicklingError, EOFError) as e:
+            print(f"Shared cache read failed for {name}: {e}")
+            return False, None
+
+    def put(self, name, key, value):
+        """Publish a result atomically; oversize results are not shared."""
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.budget_bytes:
+            return
+        now = time.time()
+        try:
+            conn = self._connect()
+            with conn:
+                # An upsert rather than INSERT OR REPLACE, whose implicit
+                # delete would not fire the totals trigger
+                conn.execute(
+                    "INSERT INTO results (key, name, value, size, created, accessed) "
+                    "VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (key) DO UPDATE SET name = excluded.name, "
+                    "value = excluded.value, size = excluded.size, "
+                    "created = excluded.created, accessed = excluded.accessed",
+                    (entry_key(name, key), name, blob, len(blob), now, now),
+                )
+                self._evict(conn)
+        except sqlite3.Error as e:
+            print(f"Shared cache write failed for {name}: {e}")
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT bytes FROM totals").fetchone()[0]
+        if total <= self.budget_bytes:
+            return
+        # Least recently read first, down to 90% of the budget
+        target = total - int(self.budget_bytes * 0.9)
+        freed = 0
+        doomed = []
+        for address, size in conn.execute("SELECT key, size FROM results ORDER BY accessed"):
+            doomed.append((address,))
+            freed += size
+            if freed >= target:
+                break
+        conn.executemany("DELETE FROM results WHERE key = ?", doomed)
+
+    def clear(self, name=None):
+        try:
+            conn = self._connect()
+            with conn:
+                if name is None:
+                    conn.execute("DELETE FROM results")
+                else:
+                    conn.execute("DELETE FROM results WHERE name = ?", (name,))
+        except sqlite3.Error as e:
+            print(f"Shared cache clear failed: {e}")
+
+    def stats(self):
+        """{function name: (entries, bytes)} of the published results."""
+        try:
+            rows = self._connect().execute(
+                "SELECT name, COUNT(*), SUM(size) FROM results GROUP BY name"
+            ).fetchall()
+        except sqlite3.Error:
+            return {}
+        return {name: (count, size) for name, count, size in rows}
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_cache():
+    """Return the process's handle on the shared result cache."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = SharedResultCache()
+        return _shared
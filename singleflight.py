@@ -0,0 +1,72 @@
+"""In-process request coalescing ("singleflight").
+
+When several session threads ask for the same uncached result at once,
+for example everyone opening the Groups page right after a restart,
+only the first caller computes it. The others wait on the same future
+and receive the same result, or the same exception.
+
+Each SingleFlight counts the calls that ran (``computed``) and the
+calls that waited on another thread instead (``coalesced``).
+memory_cache includes the counters in the per-worker stats shown on
+the admin page.
+"""
+
+import concurrent.futures
+import threading
+
+_groups = {}
+_groups_lock = threading.Lock()
+
+
+class SingleFlight:
+    def __init__(self, name):
+        self.name = name
+        self.computed = 0
+        self.coalesced = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args, **kwargs):
+        """Return ``fn(*args, **kwargs)``, sharing one run among concurrent callers of ``key``."""
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = concurrent.futures.Future()
+                self._inflight[key] = future
+                self.computed += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def stats(self):
+        with self._lock:
+            return {"computed": self.computed, "coalesced": self.coalesced,
+                    "in_flight": len(self._inflight)}
+
+
+def group(name):
+    """Return the process-wide SingleFlight called ``name``."""
+    with _groups_lock:
+        if name not in _groups:
+            _groups[name] = SingleFlight(name)
+        return _groups[name]
+
+
+def stats():
+    """{name: counters} of every SingleFlight in this process."""
+    with _groups_lock:
+        flights = list(_groups.values())
+    return {flight.name: flight.stats() for flight in flights}
@@ -5,7 +5,7 @@ import pandas as pd
 import streamlit as st
 from pathlib import Path
 
-from data_ops import compute_group_aggregate
+from data_ops import compute_group_aggregates, aggregate_series
 from indicators_data import indicators
 
 STORIES_DIR = "cache/stories"
@@ -73,8 +73,11 @@ def save_story(story):
     os.makedirs(STORIES_DIR, exist_ok=True)
     slug = story.get("slug", "untitled")
     path = os.path.join(STORIES_DIR, f"{slug}.json")
-    with open(path, "w") as f:
+    # Pages may be reading the story; publish it with an atomic rename
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
         json.dump(story, f, indent=2)
+    os.replace(tmp, path)
 
 
 def delete_story(slug):
@@ -91,7 +94,7 @@ def render_narrative_section(section):
     st.markdown(f'<div class="factbook-text">{content}</div>', unsafe_allow_html=True)
 
 
-def render_headline_metrics_section(section, group_id):
+def render_headline_metrics_section(section, group_id, aggregates):
     """Render a row of headline st.metric cards."""
     ind_list = section.get("indicators", [])
     if not ind_list:
@@ -105,9 +108,8 @@ def render_headline_metrics_section(section, group_id):
 
         with col:
             try:
-                result = compute_group_aggregate(code, group_id)
-                if result and len(result) > 0 and not result[0].empty:
-                    series = result[0]
+                series = aggregate_series(aggregates, code, group_id)
+                if not series.empty:
                     latest_val = series.iloc[-1]
                     latest_date = series.index[-1]
                     st.metric(
@@ -120,7 +122,7 @@ def render_headline_metrics_section(section, group_id):
                 st.metric(label=label, value="N/A")
 
 
-def render_indicator_section(section, group_id):
+def render_indicator_section(section, group_id, aggregates):
     """Render an indicator chart section with metrics and optional commentary."""
     code = section.get("code", "")
     fmt = section.get("format", "number")
@@ -134,11 +136,10 @@ def render_indicator_section(section, group_id):
     description = meta["description"]
 
     try:
-        result = compute_group_aggregate(code, group_id)
-        if not result or not isinstance(result, (list, tuple)) or len(result) == 0 or result[0].empty:
+        series = aggregate_series(aggregates, code, group_id)
+        if series.empty:
             st.info(f"No data available for {description}.")
             return
-        series = result[0]
     except Exception:
         st.info(f"Could not load data for {description}.")
         return
@@ -185,7 +186,7 @@ GROUP_LABELS = {
 }
 
 
-def render_comparison_section(section, group_id):
+def render_comparison_section(section, group_id, aggregates):
     """Render a multi-group comparison chart with metrics for each group."""
     code = section.get("code", "")
     fmt = section.get("format", "number")
@@ -211,9 +212,8 @@ def render_comparison_section(section, group_id):
     all_series = {}
     for gid in compare_groups:
         try:
-            result = compute_group_aggregate(code, gid)
-            if result and len(result) > 0 and not result[0].empty:
-                s = result[0]
+            s = aggregate_series(aggregates, code, gid)
+            if not s.empty:
                 s.name = GROUP_LABELS.get(gid, gid.upper())
                 all_series[gid] = s
         except Exception:
@@ -251,20 +251,43 @@ def render_comparison_section(section, group_id):
 
 
 # ───────────────────────────────── Story dispatcher ──────────────────────────
+def story_requirements(story):
+    """Return (indicator codes, group ids) referenced by a story's sections."""
+    group_id = story.get("group_id", "lldcs")
+    codes, groups = [], [group_id]
+    for section in story.get("sections", []):
+        section_type = section.get("type", "")
+        if section_type == "headline_metrics":
+            codes.extend(spec.get("code", "") for spec in section.get("indicators", []))
+        elif section_type in ("indicator", "comparison"):
+            codes.append(section.get("code", ""))
+            if section_type == "comparison":
+                groups.extend(section.get("groups", [group_id]))
+    codes = [c for c in dict.fromkeys(codes) if c in indicators]
+    return codes, list(dict.fromkeys(groups))
+
+
 def render_story(story):
     """Render all sections of a story."""
     group_id = story.get("group_id", "lldcs")
     sections = story.get("sections", [])
 
+    # Every aggregate the story shows, computed in one pass
+    codes, groups = story_requirements(story)
+    try:
+        aggregates = compute_group_aggregates(codes, groups)
+    except Exception:
+        aggregates = None
+
     for section in sections:
         section_type = section.get("type", "")
         if section_type == "narrative":
             render_narrative_section(section)
         elif section_type == "headline_metrics":
-            render_headline_metrics_section(section, group_id)
+            render_headline_metrics_section(section, group_id, aggregates)
         elif section_type == "indicator":
-            render_indicator_section(section, group_id)
+            render_indicator_section(section, group_id, aggregates)
         elif section_type == "comparison":
-            render_comparison_section(section, group_id)
+            render_comparison_section(section, group_id, aggregates)
         else:
             st.warning(f"Unknown section type: {section_type}")
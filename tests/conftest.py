@@ -0,0 +1,157 @@
+"""Shared fixtures: an isolated cache directory and a stub World Bank API.
+
+Every module keeps its files under relative ``./cache`` paths, so a test
+that changes into a temporary directory gets an empty store, runtime
+directory and aggregate table of its own. The module-level caches that
+outlive a call (country dimension, manifest, registry, aggregate table,
+cube, result caches) are reset for each test.
+"""
+
+import http.server
+import json
+import re
+import threading
+
+import pytest
+
+import aggregates
+import country_registry
+import indicator_cube
+import indicator_store
+import memory_cache
+import plugins.base
+import plugins.worldbank
+import shared_cache
+from plugins.rate_limit import TokenBucket
+
+# Two small overlapping groups
+GROUPS = {
+    "alpha": ["MLI", "NER", "BFA"],
+    "beta": ["NER", "TCD"],
+}
+
+
+@pytest.fixture
+def sandbox(tmp_path, monkeypatch):
+    """Run the test in an empty ``cache/`` holding only GROUPS."""
+    monkeypatch.chdir(tmp_path)
+    groups_dir = tmp_path / "cache" / "groups"
+    groups_dir.mkdir(parents=True)
+    registry = country_registry.get_registry()
+    for gid, iso3s in GROUPS.items():
+        countries = [
+            {"name": registry.by_iso3[iso3].name, "ISO": registry.by_iso3[iso3].iso2, "ISO3": iso3}
+            for iso3 in iso3s
+        ]
+        (groups_dir / f"{gid}.json").write_text(json.dumps({"gid": gid, "countries": countries}))
+
+    monkeypatch.setattr(country_registry, "GROUPS_DIR", str(groups_dir))
+    monkeypatch.setattr(country_registry, "_registry", None)
+    monkeypatch.setattr(indicator_store, "_countries", None)
+    monkeypatch.setattr(indicator_store, "_manifest", None)
+    monkeypatch.setattr(indicator_store, "_staging", None)
+    monkeypatch.setattr(aggregates, "_table", None)
+    monkeypatch.setattr(indicator_cube, "_cube", None)
+    monkeypatch.setattr(memory_cache, "_cache", memory_cache.BoundedCache(64 << 20))
+    monkeypatch.setattr(shared_cache, "_shared", None)
+    return tmp_path
+
+
+def wb_record(code, iso3, year, value, iso3_in_country_id=False):
+    """One World Bank API v2 data record."""
+    country = country_registry.get_registry().by_iso3[iso3]
+    return {
+        "indicator": {"id": code, "value": code},
+        "country": {"id": iso3 if iso3_in_country_id else country.iso2, "value": country.name},
+        "countryiso3code": "" if iso3_in_country_id else iso3,
+        "date": str(year),
+        "value": value,
+        "unit": "",
+        "obs_status": "",
+        "decimal": 0,
+    }
+
+
+class StubWorldBank:
+    """In-memory World Bank API: indicator data, source dates and a request log.
+
+    ``series`` maps an indicator code to {(iso3, year): value};
+    ``source_of`` gives an indicator's source id (2, WDI, by default),
+    ``lastupdated`` each source's date. Source 11 puts the ISO3 code in
+    ``country.id`` only, as the real API does. Data responses are split
+    into pages of ``page_size`` records when it is set. ``fail`` maps a path
+    prefix to a list of status codes returned (and consumed) before the
+    request is served normally.
+    """
+
+    def __init__(self):
+        self.series = {}
+        self.source_of = {}
+        self.lastupdated = {"2": "2026-01-01", "11": "2013-02-22"}
+        self.page_size = None
+        self.fail = {}
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def data_requests(self, code=None):
+        return [p for p in self.requests
+                if "/country/" in p and (code is None or f"/indicator/{code}?" in p)]
+
+    def respond(self, path):
+        with self.lock:
+            self.requests.append(path)
+            for prefix, statuses in self.fail.items():
+                if path.startswith(prefix) and statuses:
+                    return statuses.pop(0), None
+        route = path.split("?")[0]
+        if m := re.fullmatch(r"/v2/sources/(\w+)", route):
+            return 200, [{"page": 1}, [{"id": m[1], "lastupdated": self.lastupdated[m[1]]}]]
+        if m := re.fullmatch(r"/v2/indicator/([\w.]+)", route):
+            return 200, [{"page": 1}, [{"id": m[1], "source": {"id": self.source_of.get(m[1], "2")}}]]
+        if m := re.fullmatch(r"/v2/country/all/indicator/([\w.]+)", route):
+            code = m[1]
+            if code not in self.series:
+                return 200, [{"message": [{"key": "Invalid value"}]}]
+            source = self.source_of.get(code, "2")
+            records = [
+                wb_record(code, iso3, year, value, iso3_in_country_id=(source == "11"))
+                for (iso3, year), value in sorted(self.series[code].items())
+            ]
+            size = self.page_size or max(len(records), 1)
+            page = int(re.search(r"[?&]page=(\d+)", path)[1]) if "page=" in path else 1
+            meta = {"page": page, "pages": -(-len(records) // size), "per_page": size,
+                    "total": len(records), "sourceid": source,
+                    "lastupdated": self.lastupdated[source]}
+            return 200, [meta, records[(page - 1) * size: page * size]]
+        return 404, None
+
+
+@pytest.fixture
+def worldbank(sandbox, monkeypatch):
+    """A StubWorldBank served on localhost, with WorldBankPlugin pointed at it."""
+    stub = StubWorldBank()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            status, payload = stub.respond(self.path)
+            body = json.dumps(payload).encode() if payload is not None else b""
+            self.send_response(status)
+            if status == 429:
+                self.send_header("Retry-After", "0")
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(plugins.worldbank, "API_URL", f"http://127.0.0.1:{server.server_port}/v2")
+    # The real per-host buckets would pace the test at the API's rate
+    monkeypatch.setattr(plugins.base, "limiter_for", lambda host: TokenBucket(1000, 1000))
+    yield stub
+    server.shutdown()
+    server.server_close()
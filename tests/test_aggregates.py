@@ -0,0 +1,141 @@
+"""Incremental maintenance of the materialized aggregates."""
+
+import os
+
+import pandas as pd
+import pytest
+
+import aggregates
+import indicator_store
+from indicator_cube import build_cube
+from tests.conftest import wb_record
+
+POP, LIFE, URBAN = "SP.POP.TOTL", "SP.DYN.LE00.IN", "SP.URB.TOTL"
+
+INITIAL = {
+    POP: {("MLI", 2019): 19.0, ("MLI", 2020): 20.0, ("NER", 2020): 24.0, ("BFA", 2020): 21.0,
+          ("TCD", 2020): 16.0},
+    LIFE: {("MLI", 2019): 58.0, ("MLI", 2020): 59.0, ("NER", 2020): 62.0, ("TCD", 2020): 53.0},
+    URBAN: {("MLI", 2020): 9.0, ("NER", 2020): 4.0},
+}
+
+
+def _write(code, values):
+    records = [wb_record(code, iso3, year, value) for (iso3, year), value in values.items()]
+    iso3s = sorted({iso3 for iso3, _ in values})
+    return indicator_store.write_indicator(code, [{"page": 1}, records], iso3s)
+
+
+def _refresh(updates):
+    """Write ``updates`` in a published generation with its cube; returns the ChangeSets."""
+    with indicator_store.staged_generation():
+        change_sets = [_write(code, values) for code, values in updates.items()]
+        build_cube()
+    return change_sets
+
+
+def _table():
+    cols = ["indicator", "group", "date", "value", "n_countries"]
+    df = aggregates.open_aggregates().df[cols]
+    return df.sort_values(cols[:3], ignore_index=True)
+
+
+def _assert_matches_full_build():
+    incremental = _table()
+    aggregates.materialize()
+    pd.testing.assert_frame_equal(incremental, _table(), check_exact=False, rtol=1e-12)
+
+
+def _seed():
+    _refresh(INITIAL)
+    aggregates.materialize()
+
+
+def test_changed_cells_are_folded_in(sandbox):
+    _seed()
+    change_sets = _refresh({
+        # Changed, withdrawn (MLI 2019) and new (BFA) cells
+        LIFE: {("MLI", 2020): 60.5, ("NER", 2020): 62.0, ("TCD", 2020): 54.0, ("BFA", 2020): 61.0},
+        URBAN: {("MLI", 2020): 9.5, ("NER", 2020): 4.0},
+    })
+    aggregates.apply_changes(change_sets)
+    assert set(aggregates.open_aggregates().revisions) >= {LIFE, URBAN}
+    _assert_matches_full_build()
+
+
+def test_weight_change_reaggregates_its_dependents(sandbox):
+    _seed()
+    change_sets = _refresh({POP: {**INITIAL[POP], ("NER", 2020): 30.0, ("TCD", 2020): 17.0}})
+    before = _table().set_index(["indicator", "group", "date"])["value"]
+    aggregates.apply_changes(change_sets)
+    after = _table().set_index(["indicator", "group", "date"])["value"]
+    # Life expectancy did not change, but its population weights did
+    assert after[(LIFE, "beta", 2020)] != before[(LIFE, "beta", 2020)]
+    _assert_matches_full_build()
+
+
+def test_writes_without_change_sets_are_recomputed(sandbox):
+    _seed()
+    # A run that crashed before applying its ChangeSets
+    _refresh({URBAN: {("MLI", 2020): 12.0, ("TCD", 2020): 3.0}})
+    change_sets = _refresh({LIFE: {**INITIAL[LIFE], ("NER", 2020): 63.0}})
+    aggregates.apply_changes(change_sets)
+    _assert_matches_full_build()
+
+
+def test_chained_writes_fold_to_their_net_change(sandbox):
+    _seed()
+    with indicator_store.staged_generation():
+        change_sets = [
+            # BFA 2020 inserted then updated, MLI 2020 updated then withdrawn
+            _write(LIFE, {**INITIAL[LIFE], ("BFA", 2020): 61.0}),
+            _write(LIFE, {**INITIAL[LIFE], ("BFA", 2020): 63.0, ("MLI", 2020): 60.0}),
+            indicator_store.write_indicator(LIFE, [{"page": 1}, [
+                wb_record(LIFE, iso3, year, value)
+                for (iso3, year), value in INITIAL[LIFE].items() if iso3 != "MLI"
+            ]], ["MLI"]),
+        ]
+        build_cube()
+    aggregates.apply_changes(change_sets)
+    _assert_matches_full_build()
+
+
+def test_unchanged_store_leaves_the_table_alone(sandbox):
+    _seed()
+    built_at = aggregates.open_aggregates().built_at
+    revisions = dict(aggregates.open_aggregates().revisions)
+    aggregates.apply_changes([])
+    assert aggregates.open_aggregates().built_at == built_at
+    assert aggregates.open_aggregates().revisions == revisions
+
+
+def test_rewrite_within_the_mtime_resolution_is_recomputed(sandbox):
+    _seed()
+    built = os.stat(indicator_store.store_path(URBAN)).st_mtime_ns
+    with indicator_store.staged_generation():
+        _write(URBAN, {("MLI", 2020): 12.5, ("NER", 2020): 4.0, ("BFA", 2020): 30.0})
+        # A filesystem with a coarse mtime gives the rewrite the same one
+        os.utime(indicator_store.store_path(URBAN), ns=(built, built))
+        build_cube()
+    assert not aggregates.open_aggregates().covers(URBAN, "alpha")
+    aggregates.apply_changes([])
+    assert aggregates.open_aggregates().covers(URBAN, "alpha")
+    _assert_matches_full_build()
+
+
+def test_table_is_published_with_its_generation(sandbox):
+    _seed()
+    seeded = _table()
+    with pytest.raises(RuntimeError):
+        with indicator_store.staged_generation():
+            aggregates.apply_changes([_write(LIFE, {**INITIAL[LIFE], ("NER", 2020): 70.0})])
+            raise RuntimeError("killed")
+    # Readers keep the table computed from the published data
+    pd.testing.assert_frame_equal(_table(), seeded)
+    assert aggregates.open_aggregates().covers(LIFE, "beta")
+
+    with indicator_store.staged_generation():
+        pass  # continues and publishes the staged one
+    assert aggregates.open_aggregates().covers(LIFE, "beta")
+    assert not _table().equals(seeded)
+    _assert_matches_full_build()
@@ -0,0 +1,72 @@
+"""The compact cca3-keyed REST Countries facts store."""
+
+import json
+import os
+
+import pytest
+
+import country_facts
+
+MALI = {
+    "cca3": "MLI",
+    "name": {"common": "Mali", "official": "Republic of Mali", "nativeName": {"fra": {}}},
+    "translations": {"fra": {"official": "République du Mali", "common": "Mali"},
+                     "deu": {"official": "Republik Mali"}},
+    "demonyms": {"eng": {"f": "Malian", "m": "Malian"}},
+    "capital": ["Bamako"], "region": "Africa", "area": 1240192.0, "population": 20250834,
+    "borders": ["DZA", "BFA"], "flag": "🇲🇱", "maps": {"googleMaps": "https://goo.gl/maps/x"},
+}
+NIGER = {"cca3": "NER", "name": {"common": "Niger", "official": "Republic of Niger"},
+         "region": "Africa", "flag": "🇳🇪"}
+
+
+@pytest.fixture
+def facts(sandbox, monkeypatch):
+    monkeypatch.setattr(country_facts, "_facts", None)
+    monkeypatch.setattr(country_facts, "_facts_stamp", None)
+    (sandbox / "cache" / "country_facts.json").write_text(json.dumps([MALI, NIGER]))
+    return sandbox
+
+
+def test_store_keeps_only_the_fields_the_ui_reads(facts):
+    mali = country_facts.load_country_data("MLI")[0]
+    assert mali["name"] == {"common": "Mali", "official": "Republic of Mali"}
+    assert mali["translations"] == {"fra": {"official": "République du Mali"}}
+    assert mali["demonyms"] == {"eng": {"m": "Malian"}}
+    assert mali["capital"] == ["Bamako"] and mali["borders"] == ["DZA", "BFA"]
+    assert "maps" not in mali
+    # Absent upstream fields stay absent
+    assert "capital" not in country_facts.load_country_data("NER")[0]
+    assert country_facts.load_country_data("TCD") == []
+    assert country_facts.get_small_flag("NER") == "🇳🇪"
+    assert [c["cca3"] for c in country_facts.load_countries_group_data(["NER", "TCD"])] == ["NER"]
+
+
+def test_store_is_loaded_once(facts, monkeypatch):
+    country_facts.get_facts()
+    monkeypatch.setattr(country_facts, "_reload_facts", lambda: pytest.fail("reloaded"))
+    assert country_facts.get_small_flag("MLI") == "🇲🇱"
+
+
+def test_newer_full_cache_rebuilds_the_store(facts):
+    assert country_facts.get_small_flag("MLI") == "🇲🇱"
+    full = facts / "cache" / "country_facts.json"
+    full.write_text(json.dumps([{**MALI, "flag": "ML"}, NIGER]))
+    later = os.stat(country_facts.facts_file).st_mtime_ns + 1_000_000_000
+    os.utime(full, ns=(later, later))
+    assert country_facts.get_small_flag("MLI") == "ML"
+
+
+def test_fetch_swaps_in_a_new_store(facts, monkeypatch):
+    country_facts.get_facts()
+
+    class Response:
+        def json(self):
+            return [{**NIGER, "population": 27032412}, MALI, {**MALI, "flag": "duplicate"}]
+
+    monkeypatch.setattr(country_facts.requests, "get", lambda url: Response())
+    country_facts.fetch_and_cache_countries_data()
+    assert country_facts.load_country_data("NER")[0]["population"] == 27032412
+    # First record per cca3 wins
+    assert country_facts.get_small_flag("MLI") == "🇲🇱"
+    assert not [f for f in os.listdir("cache") if f.endswith(".tmp")]
@@ -0,0 +1,54 @@
+"""Country and group lookups through the in-memory registry."""
+
+import json
+
+import pytest
+
+import groups
+from country_registry import COUNTRY_CODES_PATH, CountryRegistry, get_registry
+
+
+def _scan(field, value):
+    """The linear scan the registry replaced."""
+    with open(COUNTRY_CODES_PATH, "r", encoding="utf-8") as f:
+        return next((e for e in json.load(f) if e.get(field) == value), None)
+
+
+@pytest.mark.parametrize("field, value", [
+    ("ISO_3166_3", "MLI"), ("ISO_3166_2", "NE"), ("NAME.EN", "Chad"), ("M49", "854"),
+])
+def test_indexes_agree_with_a_scan(field, value):
+    entry = _scan(field, value)
+    assert groups.get_name_from_iso3(entry["ISO_3166_3"]) == entry["NAME.EN"]
+    assert groups.get_iso2_from_name(entry["NAME.EN"]) == entry["ISO_3166_2"]
+    assert groups.get_fips_from_iso3(entry["ISO_3166_3"]) == entry["FIPS_GEC"]
+    assert get_registry().by_m49[int(entry["M49"])].iso3 == entry["ISO_3166_3"]
+
+
+def test_first_entry_wins_and_unknown_codes_miss():
+    registry = CountryRegistry([
+        {"NAME.EN": "Aland", "ISO_3166_2": "AX", "ISO_3166_3": "ALA", "FIPS_GEC": "AX", "M49": "248"},
+        {"NAME.EN": "Aland", "ISO_3166_2": "XX", "ISO_3166_3": "", "FIPS_GEC": "", "M49": ""},
+    ], [])
+    assert registry.by_name["Aland"].iso3 == "ALA"
+    assert registry.by_m49[248].iso2 == "AX"
+    assert registry.by_fips["AX"].iso3 == "ALA"
+    assert "" not in registry.by_iso3 and None not in registry.by_m49
+    assert get_registry().by_iso3.get("ZZZ") is None
+    assert groups.get_name_from_iso3("ZZZ") is None
+
+
+def test_group_membership(sandbox):
+    assert groups.get_group_countries_iso3("alpha") == ["MLI", "NER", "BFA"]
+    assert groups.is_group_member("TCD", "beta")
+    assert not groups.is_group_member("TCD", "alpha")
+    assert groups.get_iso3_from_name("Niger", "beta") == "NER"
+    assert [c["ISO3"] for c in groups.get_groups_members(["beta", "alpha"])] == \
+        ["NER", "TCD", "MLI", "BFA"]
+    assert sorted(get_registry().groups_of("NER")) == ["alpha", "beta"]
+
+
+def test_deleted_group_file_keeps_its_members(sandbox):
+    assert get_registry().group("beta").iso3s == {"NER", "TCD"}
+    (sandbox / "cache" / "groups" / "beta.json").unlink()
+    assert get_registry().group("beta").iso3s == {"NER", "TCD"}
@@ -0,0 +1,53 @@
+"""The memory-mapped indicator cube and its freshness checks."""
+
+import os
+
+import numpy as np
+
+import indicator_store
+from indicator_cube import build_cube, open_cube
+from tests.test_aggregates import INITIAL, LIFE, POP, _refresh, _write
+
+
+def test_cube_serves_the_store_values(sandbox):
+    _refresh({POP: INITIAL[POP], LIFE: INITIAL[LIFE]})
+    cube = open_cube()
+    assert cube.has(POP) and cube.has(LIFE)
+    assert list(cube.years) == [2019, 2020]
+    values = cube.values(LIFE, ["MLI", "NER", "BFA", "FRA"], [2019, 2020, 2020, 2020])
+    np.testing.assert_array_equal(values, [58.0, 62.0, np.nan, np.nan])
+    years, series = cube.country_series(POP, "MLI")
+    assert list(years) == [2019, 2020] and list(series) == [19.0, 20.0]
+    assert cube.country_mask(["NER", "FRA"]).sum() == 1
+
+
+def test_indicator_written_after_the_build_is_stale(sandbox):
+    _refresh({POP: INITIAL[POP], LIFE: INITIAL[LIFE]})
+    with indicator_store.staged_generation():
+        _write(LIFE, {**INITIAL[LIFE], ("BFA", 2020): 61.0})
+    cube = open_cube()
+    assert cube.has(POP)
+    assert not cube.has(LIFE)
+    assert not cube.has("NY.GDP.PCAP.CD")
+
+
+def test_rewrite_within_the_mtime_resolution_is_stale(sandbox):
+    _refresh({LIFE: INITIAL[LIFE]})
+    built = os.stat(indicator_store.store_path(LIFE)).st_mtime_ns
+    with indicator_store.staged_generation():
+        _write(LIFE, {**INITIAL[LIFE], ("BFA", 2020): 61.0})
+        # A filesystem with a coarse mtime gives the rewrite the same one
+        os.utime(indicator_store.store_path(LIFE), ns=(built, built))
+    assert not open_cube().has(LIFE)
+
+
+def test_rebuild_is_picked_up_by_open_cube(sandbox):
+    _refresh({LIFE: INITIAL[LIFE]})
+    first = open_cube()
+    with indicator_store.staged_generation():
+        _write(LIFE, {**INITIAL[LIFE], ("BFA", 2020): 61.0})
+        build_cube()
+    cube = open_cube()
+    assert cube is not first
+    assert cube.has(LIFE)
+    assert cube.values(LIFE, ["BFA"], [2020])[0] == 61.0
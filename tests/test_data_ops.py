@@ -0,0 +1,94 @@
+"""Cached reads of data_ops and their invalidation."""
+
+import json
+
+import pandas as pd
+
+import data_ops
+import indicator_store
+from country_registry import get_registry
+from tests.conftest import wb_record
+from tests.test_aggregates import INITIAL, LIFE, POP, _refresh, _write
+
+
+def _members(df):
+    return sorted(df["country_iso3"].astype(str).unique())
+
+
+def _edit_group(sandbox, gid, iso3s):
+    registry = get_registry()
+    countries = [{"name": registry.by_iso3[i].name, "ISO": registry.by_iso3[i].iso2, "ISO3": i}
+                 for i in iso3s]
+    path = sandbox / "cache" / "groups" / f"{gid}.json"
+    path.write_text(json.dumps({"gid": gid, "countries": countries, "note": "edited"}))
+
+
+def test_group_data_follows_store_writes(sandbox):
+    _refresh({LIFE: INITIAL[LIFE]})
+    assert data_ops.load_group_data(LIFE, "beta")["value"].tolist() == [62.0, 53.0]
+    with indicator_store.staged_generation():
+        _write(LIFE, {("NER", 2020): 63.0})
+    assert data_ops.load_group_data(LIFE, "beta")["value"].tolist() == [63.0, 53.0]
+
+
+def test_registry_and_group_data_follow_group_edits(sandbox):
+    _refresh({POP: INITIAL[POP], LIFE: INITIAL[LIFE]})
+    assert _members(data_ops.load_group_data(LIFE, "beta")) == ["NER", "TCD"]
+    before = data_ops.compute_group_aggregates([LIFE], ["beta"])
+
+    _edit_group(sandbox, "beta", ["NER", "TCD", "MLI"])
+    assert get_registry().group("beta").iso3s >= {"MLI"}
+    assert "beta" in get_registry().groups_of("MLI")
+    assert _members(data_ops.load_group_data(LIFE, "beta")) == ["MLI", "NER", "TCD"]
+    after = data_ops.compute_group_aggregates([LIFE], ["beta"])
+    assert not after.equals(before)
+
+
+def test_group_added_after_startup_is_found(sandbox):
+    get_registry()
+    _edit_group(sandbox, "gamma", ["BFA"])
+    assert get_registry().group("gamma").iso3s == {"BFA"}
+
+
+def test_country_indicators_come_from_one_call(sandbox):
+    _refresh({POP: INITIAL[POP], LIFE: INITIAL[LIFE]})
+    series = data_ops.load_country_indicators("MLI", [POP, LIFE, "NY.GDP.PCAP.CD"])
+    assert series["NY.GDP.PCAP.CD"] is None
+    assert [(r["date"], r["value"]) for r in series[LIFE]] == [("2019", 58.0), ("2020", 59.0)]
+    assert {r["countryiso3code"] for r in series[POP]} == {"MLI"}
+    assert series[POP][0]["indicator"]["id"] == POP
+    # The cube slice reads back as the store does
+    assert series[LIFE] == indicator_store.frame_to_records(indicator_store.read_frame(LIFE, ["MLI"]), LIFE)
+
+
+def test_country_indicators_written_after_the_cube_are_read_from_the_store(sandbox):
+    _refresh({LIFE: INITIAL[LIFE]})
+    assert len(data_ops.load_country_indicators("BFA", [LIFE])[LIFE]) == 0
+    with indicator_store.staged_generation():
+        _write(LIFE, {**INITIAL[LIFE], ("BFA", 2020): 61.0})
+    records = data_ops.load_country_indicators("BFA", [LIFE])[LIFE]
+    assert [(r["date"], r["value"]) for r in records] == [("2020", 61.0)]
+
+
+def test_group_data_is_typed_over_one_country_dictionary(sandbox):
+    _refresh({POP: INITIAL[POP], LIFE: INITIAL[LIFE]})
+    alpha = data_ops.load_group_data(POP, "alpha")
+    beta = data_ops.load_group_data(LIFE, "beta")
+    for column in ["country_iso3", "country_id", "country_name"]:
+        assert isinstance(alpha[column].dtype, pd.CategoricalDtype)
+        assert alpha[column].dtype == beta[column].dtype
+    assert alpha["date"].dtype == "int16" and alpha["value"].dtype == "float64"
+    # Frames of different indicators and groups combine without losing the types
+    both = pd.concat([alpha, beta], ignore_index=True)
+    assert isinstance(both["country_name"].dtype, pd.CategoricalDtype)
+    wide = beta.pivot_table(index="date", columns="country_name", values="value", observed=True)
+    assert list(wide.columns) == ["Chad", "Niger"] and wide.index.dtype == "int16"
+
+
+def test_normalized_records_have_numeric_years():
+    records = [wb_record(LIFE, "MLI", 2019, 58.0), wb_record(LIFE, "MLI", 2020, None),
+               wb_record(LIFE, "MLI", 2009, 50.0)]
+    df = data_ops.normalize_dictionary(records)
+    assert df["date"].dtype == "int16"
+    assert df.loc[df["value"].idxmin(), "date"] == 2009
+    assert df["date"].max() == 2019
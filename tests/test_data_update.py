@@ -0,0 +1,123 @@
+"""Refresh runs end to end against the stub API: cancel, crash, resume."""
+
+import os
+
+import pandas as pd
+import pytest
+
+import aggregates
+import data_update
+import indicator_store
+import indicators
+from refresh_manifest import MANIFEST_PATH, RefreshManifest
+from tests.test_aggregates import INITIAL, _refresh, _table
+
+POP, LIFE = "SP.POP.TOTL", "SP.DYN.LE00.IN"
+
+
+@pytest.fixture
+def stub(worldbank):
+    """A store and aggregate table seeded with INITIAL, and newer data upstream."""
+    _refresh({POP: INITIAL[POP], LIFE: INITIAL[LIFE]})
+    aggregates.materialize()
+    worldbank.series[POP] = {**INITIAL[POP], ("NER", 2020): 25.0, ("TCD", 2021): 16.5}
+    worldbank.series[LIFE] = {**INITIAL[LIFE], ("MLI", 2020): 59.4, ("BFA", 2020): 61.0}
+    return worldbank
+
+
+def _resume(run_states):
+    manifest = RefreshManifest.load(MANIFEST_PATH)
+    manifest.run_states = run_states
+    data_update.run_update(manifest.groups, manifest.sources, manifest, manifest.codes)
+    return manifest
+
+
+def _stored(code):
+    df = indicator_store.read_frame(code)
+    return {(iso3, int(year)): value
+            for iso3, year, value in zip(df["country_iso3"], df["date"], df["value"])}
+
+
+def _assert_up_to_date(stub):
+    assert _stored(POP) == stub.series[POP]
+    assert _stored(LIFE) == stub.series[LIFE]
+    incremental = _table()
+    aggregates.materialize()
+    pd.testing.assert_frame_equal(incremental, _table(), check_exact=False, rtol=1e-12)
+
+
+def test_cancelled_run_is_resumed(stub):
+    manifest = RefreshManifest.create(MANIFEST_PATH, codes=[LIFE])
+    manifest.cancel_check = lambda: manifest.counts()["done"] >= 1
+    # Past the cache window, so both are fetched
+    stub.lastupdated["2"] = "2026-06-01"
+    data_update.run_update(manifest=manifest, codes=[LIFE])
+    assert manifest.data["state"] == "cancelled"
+    # The weight series goes first
+    assert {u["indicator"]: u["state"] for u in manifest.units} == {POP: "done", LIFE: "pending"}
+
+    resumed = _resume({"pending"})
+    assert resumed.data["state"] == "complete"
+    assert resumed.counts()["done"] == 2
+    assert len(stub.data_requests(POP)) == 1
+    assert len(stub.data_requests(LIFE)) == 1
+    _assert_up_to_date(stub)
+
+
+def test_crashed_run_is_resumed(stub, monkeypatch):
+    stub.lastupdated["2"] = "2026-06-01"
+
+    def crash():
+        raise RuntimeError("killed")
+    with monkeypatch.context() as m:
+        m.setattr(data_update, "build_cube", crash)
+        with pytest.raises(RuntimeError):
+            data_update.run_update(codes=[LIFE])
+    assert os.path.exists(indicator_store.STAGING_PATH)
+    # Nothing was published: readers still see the seeded data
+    assert _stored(POP) == INITIAL[POP]
+
+    # Every unit is done; the resumed run only finishes the generation,
+    # and the aggregates still pick up the writes of the crashed run
+    resumed = _resume({"pending"})
+    assert resumed.counts()["done"] == 2
+    assert len(stub.data_requests()) == 2
+    _assert_up_to_date(stub)
+
+
+def test_only_failed_units_are_retried(stub):
+    stub.lastupdated["2"] = "2026-06-01"
+    stub.fail[f"/v2/country/all/indicator/{LIFE}"] = [500, 500, 500]
+    data_update.run_update(codes=[LIFE])
+    manifest = RefreshManifest.load(MANIFEST_PATH)
+    assert {u["indicator"]: u["state"] for u in manifest.units} == {POP: "done", LIFE: "failed"}
+
+    retried = _resume({"failed"})
+    assert {u["indicator"]: u["attempts"] for u in retried.units} == {POP: 1, LIFE: 2}
+    assert len(stub.data_requests(POP)) == 1
+    _assert_up_to_date(stub)
+
+
+def test_indicator_refresh_covers_its_weight_series():
+    plugins = data_update.get_plugins(codes=["AG.LND.CROP.ZS"])
+    assert [(p.SOURCE_NAME, list(p.indicators)) for p in plugins] == [
+        ("World Bank", ["AG.LND.TOTL.K2", "AG.LND.CROP.ZS"])
+    ]
+    assert "AG.LND.CROP.ZS" in plugins[0].recheck
+
+
+def test_legacy_get_indicator_refreshes_through_the_pipeline(stub):
+    trade = "NE.TRD.GNFS.CD"
+    stub.source_of[trade] = "11"
+    stub.series[trade] = {("MLI", 2020): 5e9, ("NER", 2020): 3e9}
+    generation = indicator_store.current_generation()
+
+    data = indicators.get_indicator(trade, "alpha")
+    # Source 11 records carry the ISO3 code in country.id only
+    assert {r["countryiso3code"] for r in data[1]} == {"MLI", "NER"}
+    assert indicator_store.current_generation() != generation
+    assert aggregates.open_aggregates().covers(trade, "alpha")
+
+    stub.requests.clear()
+    assert indicators.get_indicator(trade, "alpha") == data
+    assert stub.data_requests() == []
@@ -0,0 +1,132 @@
+"""Fetch engine and World Bank plugin against the stub API."""
+
+import pytest
+
+import indicator_store
+from groups import get_groups_members
+from indicators_data import indicators
+from plugins.engine import download_all
+from plugins.worldbank import WorldBankPlugin
+from refresh_manifest import RefreshManifest
+
+POP, LIFE, TRADE = "SP.POP.TOTL", "SP.DYN.LE00.IN", "NE.TRD.GNFS.CD"
+
+
+def _plugin(codes, **kwargs):
+    return WorldBankPlugin({code: indicators[code] for code in codes}, **kwargs)
+
+
+def _run(plugin, manifest=None):
+    countries = get_groups_members(["alpha", "beta"])
+    with indicator_store.staged_generation():
+        return download_all([plugin], "all", countries, manifest)
+
+
+def _values(code):
+    df = indicator_store.read_frame(code)
+    return {(iso3, int(year)): value
+            for iso3, year, value in zip(df["country_iso3"], df["date"], df["value"])}
+
+
+@pytest.fixture
+def series(worldbank):
+    worldbank.series[POP] = {("MLI", 2020): 20e6, ("NER", 2020): 24e6, ("TCD", 2020): 16e6,
+                             ("FRA", 2020): 67e6}
+    worldbank.series[LIFE] = {("MLI", 2020): 59.0, ("NER", 2020): 62.0, ("BFA", 2020): 61.5}
+    return worldbank
+
+
+def test_fetches_into_store_and_reports_progress(series):
+    manifest = RefreshManifest.create("cache/runtime/manifest.json")
+    plugin = _plugin([LIFE, POP])
+    manifest.plan([plugin])
+
+    assert _run(plugin, manifest) == {POP: True, LIFE: True}
+    # Only the requested countries are kept from the country/all response
+    assert _values(POP) == {("MLI", 2020): 20e6, ("NER", 2020): 24e6, ("TCD", 2020): 16e6}
+    assert _values(LIFE) == series.series[LIFE]
+    assert manifest.counts() == {"pending": 0, "done": 2, "skipped": 0, "failed": 0}
+    assert RefreshManifest.load("cache/runtime/manifest.json").counts()["done"] == 2
+
+
+def test_weight_series_is_fetched_before_its_dependents(series):
+    _run(_plugin([LIFE, POP]))
+    assert series.data_requests()[0].startswith(f"/v2/country/all/indicator/{POP}?")
+
+
+def test_fresh_store_is_served_without_fetching(series):
+    _run(_plugin([LIFE, POP]))
+    series.requests.clear()
+
+    manifest = RefreshManifest.create("cache/runtime/manifest.json")
+    plugin = _plugin([LIFE, POP])
+    manifest.plan([plugin])
+    assert _run(plugin, manifest) == {POP: True, LIFE: True}
+    assert series.data_requests() == []
+    assert manifest.counts()["skipped"] == 2
+    assert plugin.cached == [LIFE]
+    # The weight series is checked upstream even within its cache window
+    assert plugin.skipped == [POP]
+
+
+def test_changed_source_is_fetched_again(series):
+    series.series[TRADE] = {("MLI", 2020): 5e9, ("TCD", 2020): 7e9}
+    series.source_of[TRADE] = "11"
+    _run(_plugin([LIFE, TRADE]))
+    # Source 11 records carry the ISO3 code in country.id only
+    assert _values(TRADE) == series.series[TRADE]
+    assert indicator_store.stored_version(TRADE) == "2013-02-22"
+
+    series.requests.clear()
+    series.lastupdated["11"] = "2026-05-01"
+    series.series[TRADE][("NER", 2020)] = 3e9
+    # Past the cache window (whole days; -1 puts even today's data past it)
+    plugin = _plugin([LIFE, TRADE], cache_duration_days=-1)
+    _run(plugin)
+    # WDI is unchanged, source 11 is not: only its indicator is fetched
+    assert plugin.skipped == [LIFE]
+    assert [p.split("?")[0] for p in series.data_requests()] == [
+        f"/v2/country/all/indicator/{TRADE}"
+    ]
+    assert _values(TRADE)[("NER", 2020)] == 3e9
+    assert indicator_store.stored_version(TRADE) == "2026-05-01"
+
+
+def test_failed_and_missing_indicators_are_reported(series):
+    series.fail[f"/v2/country/all/indicator/{LIFE}"] = [500, 500, 500]
+    manifest = RefreshManifest.create("cache/runtime/manifest.json")
+    plugin = _plugin([LIFE, POP, "NY.GDP.PCAP.CD"])
+    manifest.plan([plugin])
+
+    results = _run(plugin, manifest)
+    assert results == {POP: True, LIFE: False, "NY.GDP.PCAP.CD": False}
+    failed = {u["indicator"]: u["error"] for u in manifest.units if u["state"] == "failed"}
+    assert failed == {LIFE: "no data", "NY.GDP.PCAP.CD": "no data"}
+
+
+def test_failed_page_fails_the_fetch(series):
+    _run(_plugin([LIFE]))
+    series.page_size = 2
+    series.lastupdated["2"] = "2026-06-01"
+    series.series[LIFE] = {**series.series[LIFE], ("MLI", 2020): 60.0}
+    page_2 = series.data_requests(LIFE)[0].replace("page=1", "page=2")
+    series.fail[page_2] = [503, 503, 503]
+    manifest = RefreshManifest.create("cache/runtime/manifest.json")
+    plugin = _plugin([LIFE], cache_duration_days=-1)
+    manifest.plan([plugin])
+
+    assert _run(plugin, manifest) == {LIFE: False}
+    # The rows of the missing page are not withdrawn, nor the others updated
+    assert _values(LIFE) == {("MLI", 2020): 59.0, ("NER", 2020): 62.0, ("BFA", 2020): 61.5}
+    assert [u["state"] for u in manifest.units] == ["failed"]
+
+
+def test_cancelled_run_leaves_units_pending(series):
+    manifest = RefreshManifest.create("cache/runtime/manifest.json")
+    manifest.cancel_check = lambda: manifest.counts()["done"] >= 1
+    plugin = _plugin([LIFE, POP])
+    manifest.plan([plugin])
+
+    assert _run(plugin, manifest) == {POP: True}
+    assert {u["indicator"]: u["state"] for u in manifest.units} == {POP: "done", LIFE: "pending"}
+    assert series.data_requests(LIFE) == []
@@ -0,0 +1,96 @@
+"""Extraction of the Factbook profile table."""
+
+import json
+import os
+
+import pytest
+
+import factbook
+
+
+def _factbook(climate=None, industries=None):
+    data = {"Geography": {"Geographic coordinates": {"text": "17 00 N, 4 00 W"}}}
+    if climate is not None:
+        data["Environment"] = {"Climate": {"text": climate}}
+    if industries is not None:
+        data["Economy"] = {"Industries": {"text": industries}}
+    return data
+
+
+@pytest.fixture
+def sources(sandbox, monkeypatch):
+    monkeypatch.setattr(factbook, "_table", None)
+    monkeypatch.setattr(factbook, "_checked_at", None)
+    directory = sandbox / "cache" / "factbook"
+    directory.mkdir()
+
+    def write(fips, data):
+        path = directory / f"{fips}.json"
+        path.write_text(json.dumps(data))
+        # Distinct stamps even where the filesystem's mtime is coarse
+        stamp = path.stat().st_mtime_ns + 1_000_000_000
+        os.utime(path, ns=(stamp, stamp))
+        return path
+
+    write("ml", _factbook("subtropical to arid", "gold mining"))
+    write("ng", _factbook(industries="uranium mining"))
+    return write
+
+
+def _counting(monkeypatch):
+    parsed = []
+    extract = factbook.extract_profile
+    monkeypatch.setattr(factbook, "extract_profile", lambda path: parsed.append(path) or extract(path))
+    return parsed
+
+
+def test_missing_fields_are_recorded_as_none(sources):
+    table = factbook.build_profiles(parallel=False)
+    assert set(table["profiles"]) == {"ml", "ng"}
+    niger = table["profiles"]["ng"]
+    assert set(niger) == set(factbook.PROFILE_FIELDS)
+    assert niger["industries"] == "uranium mining"
+    assert niger["climate"] is None
+    assert factbook.get_profile(fips="ML")["climate"] == "subtropical to arid"
+    assert factbook.get_profile(fips="xx") is None
+
+
+def test_only_changed_files_are_extracted_again(sources, monkeypatch):
+    factbook.build_profiles(parallel=False)
+    parsed = _counting(monkeypatch)
+    sources("ng", _factbook(climate="desert", industries="uranium mining"))
+    os.remove(os.path.join(factbook.FACTBOOK_DIR, "ml.json"))
+    table = factbook.build_profiles(parallel=False)
+    assert [os.path.basename(p) for p in parsed] == ["ng.json"]
+    assert set(table["profiles"]) == {"ng"}
+    assert table["profiles"]["ng"]["climate"] == "desert"
+
+    parsed.clear()
+    factbook.build_profiles(parallel=False)
+    assert parsed == []
+
+
+def test_parallel_build_matches_the_serial_one(sources, monkeypatch):
+    for n in range(4):
+        sources(f"x{n}", _factbook(f"climate {n}"))
+    serial = factbook.build_profiles(parallel=False)["profiles"]
+    os.remove(factbook.PROFILES_PATH)
+    monkeypatch.setattr(factbook, "PARALLEL_THRESHOLD", 2)
+    assert factbook.build_profiles(parallel=True)["profiles"] == serial
+
+
+def test_changed_field_list_rebuilds_every_row(sources, monkeypatch):
+    factbook.build_profiles(parallel=False)
+    monkeypatch.setitem(factbook.PROFILE_FIELDS, "capital", ("Government", "Capital", "name", "text"))
+    parsed = _counting(monkeypatch)
+    table = factbook.build_profiles(parallel=False)
+    assert len(parsed) == 2
+    assert table["profiles"]["ml"]["capital"] is None
+
+
+def test_served_table_is_rechecked_after_the_ttl(sources, monkeypatch):
+    assert factbook.get_profile(fips="ml")["industries"] == "gold mining"
+    sources("ml", _factbook(industries="cotton"))
+    assert factbook.get_profile(fips="ml")["industries"] == "gold mining"
+    monkeypatch.setattr(factbook, "_checked_at", factbook._checked_at - factbook.PROFILES_TTL)
+    assert factbook.get_profile(fips="ml")["industries"] == "cotton"
@@ -0,0 +1,105 @@
+"""Staged store generations: publish, interrupt and continue, collect."""
+
+import json
+import os
+
+import pytest
+
+import indicator_store
+from tests.conftest import wb_record
+
+POP = "SP.POP.TOTL"
+
+
+def _write(code, values):
+    records = [wb_record(code, iso3, year, value) for (iso3, year), value in values.items()]
+    iso3s = sorted({iso3 for iso3, _ in values})
+    return indicator_store.write_indicator(code, [{"page": 1}, records], iso3s)
+
+
+def _published(code):
+    """Whether the published generation holds ``code``, as another process sees it."""
+    return os.path.exists(os.path.join(indicator_store.CURRENT_PATH, f"{code}.parquet"))
+
+
+def test_writes_are_published_together(sandbox):
+    with indicator_store.staged_generation() as name:
+        _write(POP, {("MLI", 2020): 1.0})
+        _write("SP.URB.TOTL", {("MLI", 2020): 2.0})
+        assert not _published(POP)
+    assert indicator_store.current_generation() == name
+    assert _published(POP) and _published("SP.URB.TOTL")
+    assert indicator_store.manifest_entry(POP)["rows"] == 1
+    assert not os.path.exists(indicator_store.STAGING_PATH)
+
+
+def test_unchanged_files_are_shared_with_the_previous_generation(sandbox):
+    with indicator_store.staged_generation() as first:
+        _write(POP, {("MLI", 2020): 1.0})
+    with indicator_store.staged_generation() as second:
+        _write("SP.URB.TOTL", {("MLI", 2020): 2.0})
+    old, new = (os.stat(os.path.join(indicator_store.GENERATIONS_DIR, g, f"{POP}.parquet"))
+                for g in (first, second))
+    assert old.st_ino == new.st_ino
+    assert indicator_store.read_frame(POP)["value"].tolist() == [1.0]
+
+
+def test_interrupted_generation_is_continued(sandbox):
+    with indicator_store.staged_generation() as first:
+        _write(POP, {("MLI", 2020): 1.0})
+
+    with pytest.raises(RuntimeError):
+        with indicator_store.staged_generation() as interrupted:
+            _write(POP, {("MLI", 2020): 5.0})
+            _write("SP.URB.TOTL", {("MLI", 2020): 2.0})
+            raise RuntimeError("crash")
+
+    # Readers still see the last published data
+    assert indicator_store.current_generation() == first
+    assert indicator_store.read_frame(POP)["value"].tolist() == [1.0]
+    assert not indicator_store.exists("SP.URB.TOTL")
+    assert os.path.exists(indicator_store.STAGING_PATH)
+
+    with indicator_store.staged_generation() as resumed:
+        assert resumed == interrupted
+        # What the interrupted run wrote is kept
+        assert indicator_store.read_frame(POP)["value"].tolist() == [5.0]
+        _write("SP.RUR.TOTL", {("NER", 2020): 3.0})
+
+    assert indicator_store.current_generation() == resumed
+    assert all(indicator_store.exists(c) for c in (POP, "SP.URB.TOTL", "SP.RUR.TOTL"))
+    assert set(indicator_store.manifest_entries()) == {POP, "SP.URB.TOTL", "SP.RUR.TOTL"}
+    assert not os.path.exists(indicator_store.STAGING_PATH)
+
+
+def test_staging_based_on_a_superseded_generation_is_dropped(sandbox):
+    with pytest.raises(RuntimeError):
+        with indicator_store.staged_generation() as stale:
+            _write(POP, {("MLI", 2020): 5.0})
+            raise RuntimeError("crash")
+    # As if another generation had been published since the staging began
+    with open(indicator_store.STAGING_PATH, "w") as f:
+        json.dump({"generation": stale, "base": "g0"}, f)
+
+    with indicator_store.staged_generation() as name:
+        assert name != stale
+        assert not indicator_store.exists(POP)
+
+
+def test_old_generations_are_collected(sandbox):
+    names = []
+    for i in range(4):
+        with indicator_store.staged_generation() as name:
+            _write(POP, {("MLI", 2020): float(i)})
+        names.append(name)
+    kept = sorted(os.listdir(indicator_store.GENERATIONS_DIR))
+    assert kept == sorted(names[-indicator_store.KEEP_GENERATIONS:])
+
+
+def test_clear_store_publishes_an_empty_generation(sandbox):
+    with indicator_store.staged_generation() as name:
+        _write(POP, {("MLI", 2020): 1.0})
+    indicator_store.clear_store()
+    assert indicator_store.current_generation() != name
+    assert not indicator_store.exists(POP)
+    assert indicator_store.manifest_entries() == {}
@@ -0,0 +1,111 @@
+"""The background job queue: run, cancel, resume and recover jobs."""
+
+import contextlib
+import sqlite3
+
+import pytest
+
+import jobs
+from refresh_manifest import RefreshManifest
+from tests.test_data_update import LIFE, POP, _assert_up_to_date, stub  # noqa: F401
+
+
+@pytest.fixture
+def upstream(stub):  # noqa: F811
+    # Past the cache window, so both series are fetched
+    stub.lastupdated["2"] = "2026-06-01"
+    return stub
+
+
+def _units(job_id):
+    manifest = RefreshManifest.load(jobs.manifest_path(job_id))
+    return {u["indicator"]: (u["state"], u["attempts"]) for u in manifest.units}
+
+
+def test_queued_job_runs_to_completion(upstream):
+    job_id = jobs.enqueue(codes=[LIFE])
+    assert jobs.get_job(job_id)["state"] == "queued"
+    jobs.work(until_idle=True)
+
+    job = jobs.get_job(job_id)
+    assert job["state"] == "done" and job["attempts"] == 1 and job["error"] is None
+    assert job["params"] == {"codes": [LIFE]}
+    assert _units(job_id) == {POP: ("done", 1), LIFE: ("done", 1)}
+    progress = jobs.job_progress(job_id)
+    assert [(s["source"], s["total"], s["done"], s["eta_seconds"]) for s in progress["sources"]] == \
+        [("World Bank", 2, 2, None)]
+    assert {i["indicator"] for i in progress["indicators"]} == {POP, LIFE}
+    assert f"Job {job_id} done" in jobs.read_log(job_id)
+    _assert_up_to_date(upstream)
+
+
+def test_cancelled_queued_job_never_runs(upstream):
+    job_id = jobs.enqueue(codes=[LIFE])
+    jobs.cancel(job_id)
+    jobs.work(until_idle=True)
+    assert jobs.get_job(job_id)["state"] == "cancelled"
+    assert upstream.data_requests() == []
+
+    assert jobs.resume(job_id)
+    jobs.work(until_idle=True)
+    assert jobs.get_job(job_id)["state"] == "done"
+    _assert_up_to_date(upstream)
+
+
+def test_running_job_stops_and_resumes_where_it_stopped(upstream, monkeypatch):
+    monkeypatch.setattr(jobs, "CANCEL_CHECK_INTERVAL", 0)
+    job_id = jobs.enqueue(codes=[LIFE])
+    finished = RefreshManifest.finished
+
+    def cancel_after_first(manifest, *args, **kwargs):
+        finished(manifest, *args, **kwargs)
+        jobs.cancel(job_id)
+
+    with monkeypatch.context() as m:
+        m.setattr(RefreshManifest, "finished", cancel_after_first)
+        jobs.work(until_idle=True)
+    assert jobs.get_job(job_id)["state"] == "cancelled"
+    # The weight series goes first
+    assert _units(job_id) == {POP: ("done", 1), LIFE: ("pending", 0)}
+
+    assert jobs.resume(job_id)
+    jobs.work(until_idle=True)
+    assert jobs.get_job(job_id)["attempts"] == 2
+    assert _units(job_id) == {POP: ("done", 1), LIFE: ("done", 1)}
+    assert len(upstream.data_requests(POP)) == 1
+    _assert_up_to_date(upstream)
+
+
+def test_failed_job_records_its_error(sandbox, monkeypatch):
+    def explode(manifest, **params):
+        raise RuntimeError("source unreachable")
+    monkeypatch.setitem(jobs.JOB_KINDS, "update", explode)
+    job_id = jobs.enqueue(codes=[LIFE])
+    jobs.work(until_idle=True)
+    job = jobs.get_job(job_id)
+    assert job["state"] == "failed"
+    assert job["error"] == "RuntimeError: source unreachable"
+    assert "Traceback" in jobs.read_log(job_id)
+    assert jobs.resume(job_id)
+    assert not jobs.resume(job_id)  # already queued
+
+    with pytest.raises(ValueError):
+        jobs.enqueue("reboot")
+
+
+def test_jobs_of_a_dead_worker_are_interrupted(sandbox):
+    running, cancelling = jobs.enqueue(codes=[LIFE]), jobs.enqueue(codes=[POP])
+    conn = sqlite3.connect(jobs.JOBS_PATH)
+    with conn:
+        conn.execute("UPDATE jobs SET state = 'running' WHERE id = ?", (running,))
+        conn.execute("UPDATE jobs SET state = 'cancelling' WHERE id = ?", (cancelling,))
+    conn.close()
+    with jobs._worker_lock() as acquired:
+        assert acquired and jobs.worker_running()
+        jobs.work(until_idle=True)  # refuses to start a second worker
+        assert jobs.get_job(running)["state"] == "running"
+    with contextlib.closing(jobs._connect()) as conn:
+        jobs._recover(conn)
+    assert jobs.get_job(running)["state"] == "interrupted"
+    assert jobs.get_job(cancelling)["state"] == "cancelled"
+    assert not jobs.worker_running()
@@ -0,0 +1,95 @@
+"""The per-generation store manifest and the freshness checks it answers."""
+
+import os
+
+import indicator_store
+from tests.conftest import wb_record
+from tests.test_aggregates import INITIAL, LIFE, POP, URBAN, _refresh
+
+
+def _write(code, values, **kwargs):
+    records = [wb_record(code, iso3, year, value) for (iso3, year), value in values.items()]
+    iso3s = sorted({iso3 for iso3, _ in values})
+    return indicator_store.write_indicator(code, [{"page": 1}, records], iso3s, **kwargs)
+
+
+def _age(code, days):
+    entry = indicator_store.manifest_entry(code)
+    indicator_store._update_manifest(code, {**entry, "verified_at": entry["verified_at"] - days * 86400})
+
+
+def test_write_records_its_entry(sandbox):
+    with indicator_store.staged_generation():
+        _write(LIFE, INITIAL[LIFE], source_version="2026-01-01", fetch_seconds=1.25)
+    entry = indicator_store.manifest_entry(LIFE)
+    assert entry["source"] == "World Bank"
+    assert entry["countries"] == ["MLI", "NER", "TCD"]
+    assert entry["rows"] == 4
+    assert tuple(entry["stamp"]) == indicator_store.file_stamp(LIFE)
+    assert entry["bytes"] == os.path.getsize(indicator_store.store_path(LIFE))
+    assert entry["source_version"] == "2026-01-01" == indicator_store.stored_version(LIFE)
+    assert entry["fetch_seconds"] == 1.25
+    assert entry["verified_at"] == entry["fetched_at"]
+    assert indicator_store.manifest_entry(POP) is None
+
+
+def test_content_hash_follows_the_rows(sandbox):
+    with indicator_store.staged_generation():
+        _write(LIFE, INITIAL[LIFE])
+        first = indicator_store.manifest_entry(LIFE)["hash"]
+        _write(LIFE, INITIAL[LIFE])
+        assert indicator_store.manifest_entry(LIFE)["hash"] == first
+        _write(LIFE, {**INITIAL[LIFE], ("NER", 2020): 63.0})
+        assert indicator_store.manifest_entry(LIFE)["hash"] != first
+
+
+def test_freshness_is_read_from_the_manifest(sandbox):
+    _refresh({LIFE: INITIAL[LIFE]})
+    assert indicator_store.is_fresh(LIFE, ["MLI", "TCD"], max_age_days=30)
+    # Not fetched for these countries
+    assert not indicator_store.is_fresh(LIFE, ["MLI", "BFA"], max_age_days=30)
+    assert not indicator_store.is_fresh(POP, ["MLI"], max_age_days=30)
+
+    with indicator_store.staged_generation():
+        _age(LIFE, 40)
+    assert not indicator_store.is_fresh(LIFE, ["MLI"], max_age_days=30)
+    stamp = indicator_store.file_stamp(LIFE)
+    with indicator_store.staged_generation():
+        indicator_store.mark_verified(LIFE)
+    assert indicator_store.is_fresh(LIFE, ["MLI"], max_age_days=30)
+    # Verifying leaves the data file, and so every revision keyed on it, alone
+    assert indicator_store.file_stamp(LIFE) == stamp
+
+
+def test_staged_entries_are_published_with_their_generation(sandbox):
+    _refresh({LIFE: INITIAL[LIFE]})
+    published = os.path.realpath(indicator_store._manifest_path())
+    with indicator_store.staged_generation():
+        _write(POP, INITIAL[POP])
+        assert indicator_store.manifest_entry(POP) is not None
+    assert os.path.realpath(indicator_store._manifest_path()) != published
+    assert set(indicator_store.manifest_entries()) == {LIFE, POP}
+
+
+def test_store_without_a_manifest_is_scanned(sandbox):
+    _refresh({LIFE: INITIAL[LIFE], URBAN: INITIAL[URBAN]})
+    entries = dict(indicator_store.manifest_entries())
+    with indicator_store.staged_generation():
+        os.remove(indicator_store._manifest_path())
+        rebuilt = indicator_store.manifest_entries()
+        assert os.path.exists(indicator_store._manifest_path())
+    assert set(rebuilt) == {LIFE, URBAN}
+    for code in rebuilt:
+        assert {k: rebuilt[code][k] for k in ("rows", "stamp", "hash", "countries")} == \
+            {k: entries[code][k] for k in ("rows", "stamp", "hash", "countries")}
+
+
+def test_summary_breaks_down_by_source_and_staleness(sandbox):
+    _refresh({POP: INITIAL[POP], LIFE: INITIAL[LIFE], URBAN: INITIAL[URBAN]})
+    with indicator_store.staged_generation():
+        _age(POP, 10)
+        _age(URBAN, 45)
+    summary = indicator_store.manifest_summary(max_age_days=30).set_index("source")
+    row = summary.loc["World Bank"]
+    assert (row["indicators"], row["rows"]) == (3, 11)
+    assert (row["fresh"], row["aging"], row["stale"]) == (1, 1, 1)
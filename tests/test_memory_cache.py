@@ -0,0 +1,79 @@
+"""The bounded in-process result cache."""
+
+import pandas as pd
+import pytest
+
+import memory_cache
+from memory_cache import BoundedCache, bounded_cache, estimate_size
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """A fresh process cache of 10 kB, with its stats written under tmp_path."""
+    monkeypatch.chdir(tmp_path)
+    cache = BoundedCache(10_000)
+    monkeypatch.setattr(memory_cache, "_cache", cache)
+    return cache
+
+
+def test_least_recently_used_entries_are_evicted_to_the_budget():
+    cache = BoundedCache(3 * estimate_size("x" * 1000) + 100)
+    for key in "abc":
+        cache.put("f", key, key * 1000)
+    assert cache.get("f", "a")[0]  # now the most recently used
+    cache.put("f", "d", "d" * 1000)
+
+    assert [cache.get("f", key)[0] for key in "abcd"] == [True, False, True, True]
+    stats = cache.snapshot()
+    assert stats["bytes"] <= cache.budget_bytes
+    assert stats["functions"]["f"]["evictions"] == 1
+    assert stats["functions"]["f"]["entries"] == 3
+
+
+def test_entry_larger_than_the_budget_is_not_stored():
+    cache = BoundedCache(1000)
+    cache.put("f", "small", "s")
+    cache.put("f", "big", "b" * 5000)
+    assert cache.get("f", "small") == (True, "s")
+    assert cache.get("f", "big") == (False, None)
+
+
+def test_frame_size_counts_its_contents():
+    small = pd.DataFrame({"name": ["a"] * 10})
+    large = pd.DataFrame({"name": ["a" * 100] * 1000})
+    assert estimate_size(large) > 100 * estimate_size(small)
+
+
+def test_calls_are_memoized_and_cleared(cache):
+    calls = []
+
+    @bounded_cache
+    def square(x):
+        calls.append(x)
+        return x * x
+
+    assert [square(3), square(3), square(4)] == [9, 9, 16]
+    assert calls == [3, 4]
+    square.clear()
+    assert square(3) == 9
+    assert calls == [3, 4, 3]
+    counters = cache.snapshot()["functions"][f"{__name__}.{square.__qualname__}"]
+    assert (counters["hits"], counters["misses"]) == (1, 3)
+
+
+def test_callers_cannot_modify_the_cached_result(cache):
+    @bounded_cache
+    def profile(iso3):
+        return {"SP.POP.TOTL": [{"countryiso3code": iso3, "value": 1.0}]}
+
+    @bounded_cache
+    def frame(iso3):
+        return pd.DataFrame({"country_iso3": [iso3], "value": [1.0]})
+
+    profile("MLI")["SP.POP.TOTL"][0]["value"] = 99.0
+    profile("MLI")["SP.POP.TOTL"].append({})
+    assert profile("MLI") == {"SP.POP.TOTL": [{"countryiso3code": "MLI", "value": 1.0}]}
+
+    df = frame("MLI")
+    df.loc[0, "value"] = 99.0
+    assert frame("MLI")["value"].tolist() == [1.0]
@@ -0,0 +1,124 @@
+"""Per-host token buckets and Retry-After handling."""
+
+import email.utils
+import threading
+import time
+import types
+
+import pytest
+import requests
+
+from plugins import rate_limit
+from plugins.rate_limit import TokenBucket
+
+
+class FakeClock:
+    """Stands in for the time module: sleeping advances the clock."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+    def time(self):
+        return time.time()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", types.SimpleNamespace(
+        monotonic=clock.monotonic, sleep=clock.sleep, time=clock.time))
+    return clock
+
+
+def test_burst_is_served_at_once_then_paced(clock):
+    bucket = TokenBucket(rate=2, burst=4)
+    for _ in range(4):
+        bucket.acquire()
+    assert clock.now == 0.0
+    for _ in range(6):
+        bucket.acquire()
+    assert clock.now == pytest.approx(3.0)
+
+
+def test_idle_time_refills_up_to_burst(clock):
+    bucket = TokenBucket(rate=1, burst=2)
+    bucket.acquire()
+    bucket.acquire()
+    clock.now += 60
+    start = clock.now
+    for _ in range(3):
+        bucket.acquire()
+    # Two tokens banked (not sixty), then one second for the third
+    assert clock.now - start == pytest.approx(1.0)
+
+
+def test_defer_blocks_every_caller_and_drains_the_burst(clock):
+    bucket = TokenBucket(rate=10, burst=5)
+    bucket.defer(30)
+    bucket.acquire()
+    # Tokens accrue from the end of the pause, not during it
+    assert clock.now == pytest.approx(30.1)
+    bucket.acquire()
+    assert clock.now == pytest.approx(30.2)
+
+
+def test_concurrent_callers_never_exceed_the_rate():
+    bucket = TokenBucket(rate=200, burst=5)
+    stamps = []
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(10):
+            bucket.acquire()
+            with lock:
+                stamps.append(time.monotonic())
+
+    threads = [threading.Thread(target=worker) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # 60 requests: 5 from the burst, 55 at 200/s
+    assert len(stamps) == 60
+    assert max(stamps) - min(stamps) >= 55 / 200 * 0.9
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("12", 12.0),
+    ("", rate_limit.DEFAULT_RETRY_AFTER),
+    ("soon", rate_limit.DEFAULT_RETRY_AFTER),
+    ("-5", 0.0),
+    ("99999", rate_limit.MAX_RETRY_AFTER),
+])
+def test_retry_after_seconds(header, expected):
+    response = requests.Response()
+    response.headers["Retry-After"] = header
+    assert rate_limit.retry_after_seconds(response) == expected
+
+
+def test_retry_after_http_date():
+    response = requests.Response()
+    response.headers["Retry-After"] = email.utils.formatdate(time.time() + 60, usegmt=True)
+    assert 55 <= rate_limit.retry_after_seconds(response) <= 60
+
+
+def test_throttled_response_pauses_the_host(worldbank, monkeypatch):
+    bucket = TokenBucket(rate=1000, burst=1000)
+    monkeypatch.setattr(rate_limit, "limiter_for", lambda host: bucket)
+    worldbank.fail["/v2/sources/"] = [429]
+
+    session = requests.Session()
+    session.hooks["response"].append(rate_limit.retry_after_hook("api.worldbank.org"))
+    from plugins import worldbank as wb
+    assert session.get(f"{wb.API_URL}/sources/2").status_code == 429
+    # Retry-After: 0 from the stub: no pause, but the burst is drained
+    assert bucket._tokens == 0.0
+    assert session.get(f"{wb.API_URL}/sources/2").status_code == 200
@@ -0,0 +1,102 @@
+"""The cross-process result cache."""
+
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+import memory_cache
+import shared_cache
+from memory_cache import BoundedCache
+from shared_cache import SharedResultCache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "runtime" / "results.sqlite")
+
+
+def _total(path):
+    with sqlite3.connect(path) as conn:
+        kept = conn.execute("SELECT bytes FROM totals").fetchone()[0]
+        summed = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+    assert kept == summed
+    return kept
+
+
+def test_results_round_trip(path):
+    cache = SharedResultCache(path, budget_bytes=1 << 20)
+    assert cache.get("f", (1,)) == (False, None)
+    cache.put("f", (1,), {"rows": [1.0, 2.0]})
+    assert cache.get("f", (1,)) == (True, {"rows": [1.0, 2.0]})
+    assert SharedResultCache(path).get("f", (1,)) == (True, {"rows": [1.0, 2.0]})
+
+
+def test_running_total_follows_puts_replaces_and_clears(path):
+    cache = SharedResultCache(path, budget_bytes=1 << 20)
+    cache.put("f", (1,), "a" * 1000)
+    cache.put("g", (1,), "b" * 2000)
+    cache.put("f", (1,), "a" * 10)  # replaces the first entry
+    assert _total(path) == sum(size for _, size in cache.stats().values())
+    cache.clear("g")
+    assert list(cache.stats()) == ["f"]
+    _total(path)
+    cache.clear()
+    assert _total(path) == 0
+
+
+def test_least_recently_read_entries_are_evicted(path, monkeypatch):
+    cache = SharedResultCache(path, budget_bytes=5000)
+    for i in range(4):
+        monkeypatch.setattr(shared_cache.time, "time", lambda i=i: 1000.0 + i)
+        cache.put("f", (i,), "x" * 1000)
+    # Reading entry 0 again makes entry 1 the least recently read
+    monkeypatch.setattr(shared_cache.time, "time", lambda: 2000.0)
+    assert cache.get("f", (0,))[0]
+    cache.put("f", (4,), "x" * 1000)
+    cache.put("f", (5,), "x" * 1000)
+    assert _total(path) <= 5000
+    assert not cache.get("f", (1,))[0]
+    assert cache.get("f", (0,))[0] and cache.get("f", (5,))[0]
+
+
+def test_total_is_seeded_for_a_file_from_before_it(path):
+    os.makedirs(os.path.dirname(path))
+    with sqlite3.connect(path) as conn:
+        conn.execute(shared_cache._SCHEMA[0])
+        conn.execute("INSERT INTO results VALUES ('k', 'f', x'00', 700, 0, 0)")
+    SharedResultCache(path)
+    assert _total(path) == 700
+
+
+_WORKER = """
+from memory_cache import bounded_cache
+
+calls = []
+
+
+@bounded_cache(shared=True)
+def slice_of(iso3):
+    calls.append(iso3)
+    return {"country": iso3, "values": [1.0, 2.0]}
+"""
+
+
+def test_result_computed_by_another_worker_is_reused(tmp_path, monkeypatch):
+    (tmp_path / "worker.py").write_text(_WORKER)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([str(tmp_path), ROOT])}
+    subprocess.run([sys.executable, "-c", "import worker; worker.slice_of('MLI')"],
+                   check=True, env=env, cwd=tmp_path)
+
+    monkeypatch.setattr(memory_cache, "_cache", BoundedCache(1 << 20))
+    monkeypatch.setattr(shared_cache, "_shared", None)
+    import worker
+    assert worker.slice_of("MLI") == {"country": "MLI", "values": [1.0, 2.0]}
+    assert worker.calls == []
+    assert memory_cache.get_cache().snapshot()["functions"]["worker.slice_of"]["shared_hits"] == 1
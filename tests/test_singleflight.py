@@ -0,0 +1,67 @@
+"""Request coalescing."""
+
+import concurrent.futures
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def test_concurrent_callers_share_one_run():
+    flight = SingleFlight("test")
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return object()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as pool:
+        futures = [pool.submit(flight.do, "key", compute)]
+        _wait_for(lambda: calls)
+        futures += [pool.submit(flight.do, "key", compute) for _ in range(4)]
+        _wait_for(lambda: flight.coalesced == 4)
+        release.set()
+        results = [f.result() for f in futures]
+
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+    assert flight.stats() == {"computed": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_waiters_get_the_leaders_exception():
+    flight = SingleFlight("test")
+    release = threading.Event()
+
+    def compute():
+        release.wait(5)
+        raise ValueError("boom")
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=3) as pool:
+        futures = [pool.submit(flight.do, "key", compute)]
+        _wait_for(lambda: flight.stats()["in_flight"] == 1)
+        futures += [pool.submit(flight.do, "key", compute) for _ in range(2)]
+        _wait_for(lambda: flight.coalesced == 2)
+        release.set()
+        for future in futures:
+            with pytest.raises(ValueError, match="boom"):
+                future.result()
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_later_calls_and_other_keys_compute_again():
+    flight = SingleFlight("test")
+    assert flight.do("a", lambda: 1) == 1
+    assert flight.do("a", lambda: 2) == 2
+    assert flight.do("b", lambda x: x * 3, 3) == 9
+    assert flight.stats() == {"computed": 3, "coalesced": 0, "in_flight": 0}
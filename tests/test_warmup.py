@@ -0,0 +1,89 @@
+"""Startup warmup and the readiness endpoint."""
+
+import http.server
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+import memory_cache
+import shared_cache
+import warmup
+from memory_cache import BoundedCache, bounded_cache
+
+calls = []
+
+
+@bounded_cache(shared=True)
+def _square(x):
+    calls.append(x)
+    return x * x
+
+
+@pytest.fixture
+def runtime(tmp_path, monkeypatch):
+    """Fresh process and shared caches, and ready.json, under tmp_path."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(memory_cache, "_cache", BoundedCache(1 << 20))
+    monkeypatch.setattr(shared_cache, "_shared", None)
+    calls.clear()
+    return tmp_path
+
+
+def _tasks(*xs):
+    return lambda: [(f"square {x}", lambda x=x: _square(x)) for x in xs]
+
+
+def test_warm_computes_every_task(runtime, monkeypatch):
+    monkeypatch.setattr(warmup, "_tasks", _tasks(2, 3))
+    summary = warmup.warm()
+    assert (summary["tasks"], summary["failed"], summary["skipped"]) == (2, [], 0)
+    assert sorted(calls) == [2, 3]
+
+
+def test_failures_are_recorded_not_raised(runtime, monkeypatch):
+    def broken():
+        raise ValueError("bad group file")
+    monkeypatch.setattr(warmup, "_tasks", lambda: [("good", lambda: _square(2)), ("bad", broken)])
+    assert warmup.warm()["failed"] == ["bad"]
+
+    monkeypatch.setattr(warmup, "_tasks", broken)
+    assert warmup.warm()["failed"] == ["tasks"]
+
+
+def test_shared_only_warm_never_computes(runtime, monkeypatch):
+    # Published by the warmup command (another process, another memory cache)
+    monkeypatch.setattr(warmup, "_tasks", _tasks(2))
+    warmup.warm()
+    monkeypatch.setattr(memory_cache, "_cache", BoundedCache(1 << 20))
+    calls.clear()
+
+    monkeypatch.setattr(warmup, "_tasks", _tasks(2, 3))
+    summary = warmup.warm(shared_only=True)
+    assert (summary["failed"], summary["skipped"]) == ([], 1)
+    assert calls == []
+    assert memory_cache.get_cache().get(f"{__name__}._square", ((2,), ()))[0]
+    # Outside the warmup the function computes as usual
+    assert _square(3) == 9 and calls == [3]
+
+
+def test_ready_endpoint_follows_the_warmup(runtime):
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), warmup._ReadyHandler)
+    warmup._ReadyHandler.app_url = ""
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/ready"
+    try:
+        with pytest.raises(urllib.error.HTTPError) as e:
+            urllib.request.urlopen(url, timeout=5)
+        assert e.value.code == 503
+
+        warmup.mark_ready({"tasks": 3, "failed": []})
+        with urllib.request.urlopen(url, timeout=5) as resp:
+            assert resp.status == 200
+            assert json.load(resp) == {"ready": True, "warmup": {"tasks": 3, "failed": []}}
+    finally:
+        server.shutdown()
+        server.server_close()
+        warmup._ReadyHandler.app_url = warmup.APP_HEALTH_URL
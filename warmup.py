@@ -0,0 +1,260 @@
+"""Startup cache warmer and readiness signal.
+
+Preloads what the first visitors would otherwise pay for after a
+restart:
+- the country registry, the REST Countries facts and the Factbook
+  profile table;
+- the group aggregates behind GROUP_INDICATORS and HEADLINE_INDICATORS
+  for every group, and those of every published story;
+- the PROFILE_INDICATORS country slices of every group member.
+
+Two ways to run it:
+- Separate command, ``python warmup.py``. Suited to
+  ``ExecStartPre=`` in landlinked.service: it extracts changed Factbook
+  files (factbook.build_profiles) and fills the shared result cache
+  (shared_cache.py) before the app starts, so each replica reads the
+  results instead of computing them. When it finishes it writes
+  ``cache/runtime/ready.json``.
+- In process, ``warmup.start()``, called by every page. In a
+  background thread it copies into the worker's memory the results
+  already in the shared cache, and computes nothing itself (see
+  memory_cache.shared_only), so it never competes with the worker's
+  first visitors. ``is_ready()`` reports when it is done.
+
+Warmup is best effort: a task that fails, or a failure to list the
+tasks, is recorded in the ``failed`` list of ready.json and the command
+still exits 0, so a broken story or group file cannot keep the app from
+starting.
+
+Readiness checks:
+- ``python warmup.py serve`` answers ``GET /ready`` over HTTP (port
+  READY_PORT): 200 with the ready.json summary once the host is warmed
+  and the app answers its own health endpoint, 503 until then. This is
+  what nginx or a load balancer probes (see landlinked-ready.service);
+- ``python warmup.py check`` exits 0 once the ready marker exists, and
+  ``python warmup.py wait`` blocks until then, for scripts and systemd.
+"""
+
+import argparse
+import concurrent.futures
+import http.server
+import json
+import os
+import sys
+import threading
+import time
+import urllib.request
+
+import memory_cache
+from indicators_data import GROUP_INDICATORS, HEADLINE_INDICATORS, PROFILE_INDICATORS
+
+RUNTIME_DIR = "./cache/runtime"
+READY_PATH = os.path.join(RUNTIME_DIR, "ready.json")
+WARMUP_WORKERS = 4
+READY_PORT = 8503
+APP_HEALTH_URL = "http://127.0.0.1:8501/_stcore/health"
+
+_ready = threading.Event()
+_started = False
+_start_lock = threading.Lock()
+
+
+def _tasks():
+    """(label, callable) pairs covering everything warm() preloads."""
+    from aggregates import group_ids
+    from country_facts import get_facts
+    from country_registry import get_registry
+    from data_ops import compute_group_aggregates, load_country_indicators
+    from factbook import load_profiles
+    from story_rendering import list_stories, story_requirements
+
+    registry = get_registry()
+    tasks = [
+        ("registry", get_registry),
+        ("country facts", get_facts),
+        ("factbook profiles", load_profiles),
+    ]
+
+    groups = group_ids()
+    page_codes = list(dict.fromkeys(code for code, *_ in HEADLINE_INDICATORS + GROUP_INDICATORS))
+    for group in groups:
+        tasks.append((f"aggregates {group}",
+                      lambda g=group: compute_group_aggregates(page_codes, [g])))
+
+    for story in list_stories():
+        if story.get("published", False):
+            codes, story_groups = story_requirements(story)
+            tasks.append((f"story {story.get('slug', '')}",
+                          lambda c=codes, g=story_groups: compute_group_aggregates(c, g)))
+
+    members = sorted({iso3 for g in groups for iso3 in registry.group(g).iso3s})
+    for iso3 in members:
+        tasks.append((f"profile {iso3}",
+                      lambda i=iso3: load_country_indicators(i, PROFILE_INDICATORS)))
+    return tasks
+
+
+def _run_task(fn, shared_only):
+    if not shared_only:
+        return fn()
+    with memory_cache.shared_only():
+        return fn()
+
+
+def warm(workers=WARMUP_WORKERS, shared_only=False):
+    """Run every warmup task on a thread pool and return a summary dict.
+
+    With ``shared_only`` a task stops at the first result no worker has
+    published, and is counted as skipped rather than failed.
+    """
+    started = time.time()
+    failed, skipped = [], []
+    try:
+        tasks = _tasks()
+    except Exception as e:
+        tasks = []
+        failed.append("tasks")
+        print(f"Warmup could not list its tasks: {e}")
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_run_task, fn, shared_only): label for label, fn in tasks}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                future.result()
+            except memory_cache.NotShared:
+                skipped.append(futures[future])
+            except Exception as e:
+                failed.append(futures[future])
+                print(f"Warmup of {futures[future]} failed: {e}")
+    summary = {
+        "pid": os.getpid(),
+        "finished": time.time(),
+        "seconds": round(time.time() - started, 2),
+        "tasks": len(tasks),
+        "failed": failed,
+        "skipped": len(skipped),
+    }
+    n_done = len(tasks) - len([label for label, _ in tasks if label in failed]) - len(skipped)
+    print(f"Warmup: {n_done}/{len(tasks)} tasks in {summary['seconds']}s"
+          + (f", {len(skipped)} not in the shared cache" if skipped else ""))
+    return summary
+
+
+def mark_ready(summary):
+    os.makedirs(RUNTIME_DIR, exist_ok=True)
+    tmp = f"{READY_PATH}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(summary, f)
+    os.replace(tmp, READY_PATH)
+
+
+def clear_ready():
+    try:
+        os.remove(READY_PATH)
+    except FileNotFoundError:
+        pass
+
+
+def host_ready():
+    """True once a warmup run has completed on this host (see ``python warmup.py``)."""
+    return os.path.exists(READY_PATH)
+
+
+def _app_healthy(url):
+    try:
+        with urllib.request.urlopen(url, timeout=2) as resp:
+            return resp.status == 200
+    except OSError:
+        return False
+
+
+class _ReadyHandler(http.server.BaseHTTPRequestHandler):
+    app_url = APP_HEALTH_URL
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/ready":
+            self.send_error(404)
+            return
+        summary = None
+        if host_ready():
+            try:
+                with open(READY_PATH) as f:
+                    summary = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                summary = {}
+        ready = summary is not None and (not self.app_url or _app_healthy(self.app_url))
+        body = json.dumps({"ready": ready, "warmup": summary}).encode()
+        self.send_response(200 if ready else 503)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port=READY_PORT, app_url=APP_HEALTH_URL):
+    """Answer ``GET /ready`` on 127.0.0.1:``port`` until interrupted."""
+    _ReadyHandler.app_url = app_url
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", port), _ReadyHandler)
+    print(f"Readiness on http://127.0.0.1:{port}/ready")
+    server.serve_forever()
+
+
+def _run_in_background():
+    try:
+        warm(workers=1, shared_only=True)
+    finally:
+        _ready.set()
+
+
+def start():
+    """Fill this worker's memory from the shared cache in a background
+    thread; later calls are no-ops."""
+    global _started
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+    threading.Thread(target=_run_in_background, name="warmup", daemon=True).start()
+
+
+def is_ready():
+    """True once this worker's warmup has finished."""
+    return _ready.is_set()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cache warmer and readiness check")
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("check", help="Exit 0 if the host has been warmed")
+    wait = sub.add_parser("wait", help="Block until the host has been warmed")
+    wait.add_argument("--timeout", type=float, default=300.0)
+    serve_cmd = sub.add_parser("serve", help="Serve GET /ready over HTTP")
+    serve_cmd.add_argument("--port", type=int, default=READY_PORT)
+    serve_cmd.add_argument("--app-url", default=APP_HEALTH_URL,
+                           help="App health URL that must answer 200 too ('' to skip)")
+    parser.add_argument("--workers", type=int, default=WARMUP_WORKERS)
+    args = parser.parse_args()
+
+    if args.command == "check":
+        sys.exit(0 if host_ready() else 1)
+    elif args.command == "wait":
+        deadline = time.time() + args.timeout
+        while not host_ready():
+            if time.time() > deadline:
+                sys.exit(1)
+            time.sleep(1)
+        sys.exit(0)
+    elif args.command == "serve":
+        serve(args.port, args.app_url)
+    else:
+        clear_ready()
+        # Extract changed Factbook files here, where forking a process
+        # pool is safe, so the app's workers only load the table
+        from factbook import build_profiles
+        try:
+            build_profiles()
+        except Exception as e:
+            print(f"Factbook profile build failed: {e}")
+        mark_ready(warm(args.workers))